@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""The benchmarked hot paths of py_swf.
+
+Every case is a function that does its setup and returns a zero argument callable, which is what gets timed.
+Histories are produced by driving a :class:`~py_swf.fake_swf.FakeSWFClient` through real workflow steps, so
+they have the same shape as the ones SWF returns.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import itertools
+from collections import OrderedDict
+from datetime import datetime
+
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.decision import build_activity_task
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.decision import nametuplefy
+from py_swf.clients.workflow import _build_time_filter_dict
+from py_swf.clients.workflow import _build_workflow_filter_dict
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.fake_swf import FakeSWFClient
+
+
+DOMAIN = 'benchmark_domain'
+TASK_LIST = 'benchmark_task_list'
+
+DECISION_CONFIG = DecisionConfig(
+    domain=DOMAIN,
+    task_list=TASK_LIST,
+    schedule_to_close_timeout=600,
+    schedule_to_start_timeout=300,
+    start_to_close_timeout=300,
+    heartbeat_timeout=60,
+)
+
+CASES = OrderedDict()
+
+
+def case(name):
+    def register(func):
+        CASES[name] = func
+        return func
+    return register
+
+
+def build_history(num_events, boto_client=None):
+    """Runs a workflow that schedules activities one after another until its history has ``num_events`` events.
+
+    :return: The boto client holding the run, the run id, and the raw events in reverse order.
+    """
+    boto_client = boto_client or FakeSWFClient(poll_timeout=0)
+    task_list = {'name': TASK_LIST}
+    run_id = boto_client.start_workflow_execution(
+        domain=DOMAIN,
+        workflowId='history_{0}'.format(num_events),
+        workflowType={'name': 'benchmark_workflow', 'version': '1.0'},
+        taskList=task_list,
+        input='{"customer_id": 1234, "order_ids": [1, 2, 3]}',
+        executionStartToCloseTimeout='86400',
+        taskStartToCloseTimeout='60',
+        childPolicy='TERMINATE',
+    )['runId']
+    execution = {'workflowId': 'history_{0}'.format(num_events), 'runId': run_id}
+
+    # Each round trip adds 6 events: decision started and completed, activity scheduled, started and completed,
+    # and the next decision scheduled.
+    for activity_number in itertools.count():
+        events = boto_client.get_workflow_execution_history(
+            domain=DOMAIN,
+            execution=execution,
+            maximumPageSize=1,
+            reverseOrder=True,
+        )['events']
+        if events[0]['eventId'] + 6 > num_events:
+            break
+        decision_task = boto_client.poll_for_decision_task(domain=DOMAIN, taskList=task_list, maximumPageSize=1)
+        boto_client.respond_decision_task_completed(
+            taskToken=decision_task['taskToken'],
+            decisions=[build_activity_task(
+                'activity_{0}'.format(activity_number),
+                'resize_image',
+                '1.0',
+                '{"image_id": %d, "sizes": [64, 128, 256]}' % activity_number,
+                DECISION_CONFIG,
+                None,
+                None,
+                None,
+                None,
+            )],
+        )
+        activity_task = boto_client.poll_for_activity_task(domain=DOMAIN, taskList=task_list, identity='worker-1')
+        boto_client.respond_activity_task_completed(
+            taskToken=activity_task['taskToken'],
+            result='{"status": "ok", "bytes_written": 48213}',
+        )
+
+    events = boto_client.get_workflow_execution_history(
+        domain=DOMAIN,
+        execution=execution,
+        maximumPageSize=num_events,
+        reverseOrder=True,
+    )['events']
+    return boto_client, run_id, events
+
+
+def _nametuplefy_case(num_events):
+    def setup():
+        _, _, events = build_history(num_events)
+        return lambda: nametuplefy(events)
+    return setup
+
+
+for _num_events in (100, 1000, 10000):
+    case('nametuplefy_{0}_events'.format(_num_events))(_nametuplefy_case(_num_events))
+
+
+def _walk_case(num_events, page_size, use_raw_event_history):
+    def setup():
+        boto_client, run_id, _ = build_history(num_events)
+        decision_client = DecisionClient(DECISION_CONFIG, boto_client)
+
+        def walk():
+            for _ in decision_client.walk_execution_history(
+                'history_{0}'.format(num_events),
+                run_id,
+                use_raw_event_history=use_raw_event_history,
+                maximum_page_size=page_size,
+            ):
+                pass
+        return walk
+    return setup
+
+
+case('walk_execution_history_1000_events_raw')(_walk_case(1000, 100, True))
+case('walk_execution_history_1000_events')(_walk_case(1000, 100, False))
+case('walk_execution_history_10000_events')(_walk_case(10000, 1000, False))
+
+
+@case('build_activity_task')
+def build_activity_task_case():
+    return lambda: build_activity_task(
+        'activity_id',
+        'resize_image',
+        '1.0',
+        '{"image_id": 1}',
+        DECISION_CONFIG,
+        None,
+        120,
+        None,
+        None,
+    )
+
+
+@case('build_workflow_filter_dict')
+def build_workflow_filter_dict_case():
+    return lambda: _build_workflow_filter_dict(workflow_name='benchmark_workflow', version='1.0')
+
+
+@case('build_time_filter_dict')
+def build_time_filter_dict_case():
+    oldest, latest = datetime(2016, 11, 11), datetime(2016, 11, 12)
+    return lambda: _build_time_filter_dict(oldest_close_date=oldest, latest_close_date=latest)
+
+
+@case('poll_decide_respond_workflow')
+def poll_decide_respond_case():
+    """One complete workflow per call: start, decide an activity, run it, decide to complete."""
+    boto_client = FakeSWFClient(poll_timeout=0)
+    workflow_client = WorkflowClient(
+        WorkflowClientConfig(
+            domain=DOMAIN,
+            task_list=TASK_LIST,
+            execution_start_to_close_timeout=3600,
+            task_start_to_close_timeout=60,
+        ),
+        boto_client,
+    )
+    decision_client = DecisionClient(DECISION_CONFIG, boto_client)
+    activity_task_client = ActivityTaskClient(ActivityTaskConfig(domain=DOMAIN, task_list=TASK_LIST), boto_client)
+    workflow_ids = itertools.count()
+
+    def run_workflow():
+        workflow_client.start_workflow('{}', str(next(workflow_ids)), 'benchmark_workflow', '1.0')
+        decision_task = decision_client.poll()
+        decision_client.finish_decision_with_activity(decision_task.task_token, 'activity', 'resize_image', '1.0', '{}')
+        activity_task = activity_task_client.poll()
+        activity_task_client.finish(activity_task.task_token, '{}')
+        decision_task = decision_client.poll()
+        decision_client.finish_workflow(decision_task.task_token, '{}')
+    return run_workflow
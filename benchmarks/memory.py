@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Measures the memory held by decoded histories, in bytes per event, for each way of decoding them::
+
+    python -m benchmarks.memory
+    python -m benchmarks.memory --events 1000 --page-size 100
+
+Histories are serialized to JSON a page at a time and decoded back before being measured, like botocore decodes SWF
+responses, so that every page holds its own copies of the strings it repeats. Needs tracemalloc, so Python 3.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import gc
+import json
+import sys
+from collections import OrderedDict
+
+from benchmarks.cases import build_history
+from py_swf._encoding import decode_datetime
+from py_swf._encoding import encode_datetime
+from py_swf.clients.decision import _decode
+
+
+MODES = OrderedDict([
+    ('raw', dict(use_raw_event_history=True, intern_strings=False)),
+    ('raw_interned', dict(use_raw_event_history=True, intern_strings=True)),
+    ('namedtuples', dict(use_raw_event_history=False, intern_strings=False)),
+    ('namedtuples_interned', dict(use_raw_event_history=False, intern_strings=True)),
+])
+
+
+def _pages(events, page_size):
+    return [
+        json.dumps(events[offset:offset + page_size], default=encode_datetime)
+        for offset in range(0, len(events), page_size)
+    ]
+
+
+def _decode_pages(pages, use_raw_event_history, intern_strings):
+    events = []
+    for page in pages:
+        events.extend(_decode(json.loads(page, object_hook=decode_datetime), use_raw_event_history, intern_strings))
+    return events
+
+
+def retained_bytes(func):
+    """Returns how many bytes are still allocated by ``func`` once it returns, held by what it returned."""
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def measure(num_events=10000, page_size=1000):
+    """Decodes a history of ``num_events`` events in every mode.
+
+    :return: The bytes per event held by the decoded events of each mode.
+    :rtype: collections.OrderedDict
+    """
+    _, _, events = build_history(num_events)
+    pages = _pages(events, page_size)
+    results = OrderedDict()
+    for name, options in MODES.items():
+        # Once first, so that the namedtuple classes and the interned strings aren't counted: they are shared by every
+        # history decoded by the process.
+        _decode_pages(pages, **options)
+        results[name] = retained_bytes(lambda: _decode_pages(pages, **options)) / len(events)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000, help='Events in the history. Default: 10000')
+    parser.add_argument('--page-size', type=int, default=1000, help='Events per page. Default: 1000')
+    args = parser.parse_args(argv)
+
+    try:
+        import tracemalloc  # noqa: F401
+    except ImportError:
+        print('tracemalloc is not available on this Python', file=sys.stderr)
+        return 1
+
+    results = measure(args.events, args.page_size)
+    baseline = results['raw']
+    for name, bytes_per_event in results.items():
+        print('{0:<25} {1:>8.0f} bytes/event {2:>7.2f}x'.format(name, bytes_per_event, bytes_per_event / baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
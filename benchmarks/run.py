@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Runs the py_swf benchmarks and compares them against a baseline.
+
+Record a baseline on main, then compare a branch against it::
+
+    git checkout main
+    python -m benchmarks.run --save .benchmarks/main.json
+    git checkout my-branch
+    python -m benchmarks.run --compare .benchmarks/main.json
+
+Results are JSON, with the fastest and median time per operation of every case. ``--compare`` exits with a
+non-zero status when a case is slower than the baseline by more than ``--threshold``.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+
+import py_swf
+from benchmarks.cases import CASES
+
+
+TARGET_SECONDS_PER_REPEAT = 0.2
+
+
+def measure(setup, repeat=5):
+    """Times a case.
+
+    :return: A dict of the number of operations per repeat and the min and median seconds per operation.
+    """
+    func = setup()
+    timer = timeit.Timer(func)
+
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= TARGET_SECONDS_PER_REPEAT / 10 or number >= 10 ** 6:
+            break
+        number *= 10
+    number = max(1, int(number * TARGET_SECONDS_PER_REPEAT / max(elapsed, 1e-9)))
+
+    per_op = sorted(elapsed / number for elapsed in timer.repeat(repeat=repeat, number=number))
+    return dict(
+        number=number,
+        min=per_op[0],
+        median=per_op[len(per_op) // 2],
+    )
+
+
+def run(names=None, repeat=5):
+    results = {}
+    for name, setup in CASES.items():
+        if names and not any(pattern in name for pattern in names):
+            continue
+        results[name] = measure(setup, repeat=repeat)
+    return dict(
+        meta=dict(
+            py_swf_version=py_swf.__version__,
+            python=platform.python_version(),
+            implementation=platform.python_implementation(),
+            machine=platform.machine(),
+        ),
+        results=results,
+    )
+
+
+def compare(baseline, current, threshold):
+    """Compares the fastest time per operation of the cases present in both results.
+
+    :return: A list of ``(name, baseline seconds, current seconds, ratio, regressed)`` tuples.
+    """
+    rows = []
+    for name, result in sorted(current['results'].items()):
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['min']
+        after = result['min']
+        ratio = after / before if before else float('inf')
+        rows.append((name, before, after, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '{0:.2f}{1}'.format(seconds / scale, unit)
+    return '{0:.0f}ns'.format(seconds / 1e-9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('names', nargs='*', help='Only run cases whose name contains one of these.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', metavar='PATH', help='Write the results as JSON to this file.')
+    parser.add_argument('--compare', metavar='PATH', help='Compare the results with a baseline written by --save.')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Tolerated slowdown, as a fraction. Default: 0.1')
+    args = parser.parse_args(argv)
+
+    results = run(args.names, repeat=args.repeat)
+    for name, result in results['results'].items():
+        print('{0:<45} {1:>10} {2:>10}'.format(name, _format_seconds(result['min']), _format_seconds(result['median'])))
+
+    if args.save:
+        directory = os.path.dirname(args.save)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with io.open(args.save, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.compare:
+        with io.open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(baseline, results, args.threshold)
+        print()
+        for name, before, after, ratio, regressed in rows:
+            print('{0:<45} {1:>10} -> {2:>10} {3:>7.2f}x{4}'.format(
+                name,
+                _format_seconds(before),
+                _format_seconds(after),
+                ratio,
+                '  REGRESSION' if regressed else '',
+            ))
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
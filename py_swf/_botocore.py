@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Deferred access to botocore exception classes.
+
+Importing botocore takes tens of milliseconds, which short-lived processes importing py_swf should not pay for
+unless they actually talk to SWF. These helpers import botocore on first use; afterwards they are a
+``sys.modules`` lookup. They are meant to be called in ``except`` clauses, which are only evaluated once an
+exception has been raised.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+
+def read_timeout():
+    """The exception raised by botocore when a long-poll returns nothing in time."""
+    from botocore.vendored.requests.exceptions import ReadTimeout
+    return ReadTimeout
+
+
+def client_error():
+    """The exception raised by botocore for errors returned by SWF."""
+    from botocore.exceptions import ClientError
+    return ClientError
+
+
+def connection_errors():
+    """The exceptions raised by botocore when a connection to SWF could not be made or was lost."""
+    from botocore.exceptions import ConnectionClosedError
+    from botocore.exceptions import ConnectionError
+    return (ConnectionError, ConnectionClosedError)
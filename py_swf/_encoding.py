@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Helpers shared by the modules that read, write and convert SWF payloads and histories."""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import calendar
+import datetime
+import gzip
+import io
+
+
+class UTC(datetime.tzinfo):
+
+    def utcoffset(self, dt):
+        return datetime.timedelta(0)
+
+    def tzname(self, dt):
+        return 'UTC'
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+
+utc = UTC()
+"""The UTC timezone, which botocore gives the datetimes of SWF responses."""
+
+
+def to_timestamp(date):
+    """Converts a datetime, naive ones being in UTC, or epoch seconds into epoch seconds."""
+    if isinstance(date, datetime.datetime):
+        return calendar.timegm(date.utctimetuple()) + date.microsecond / 1e6
+    return float(date)
+
+
+def get_field(value, key):
+    """Returns a field of a raw event, a dict, or of a namedtuple event, or None if it has no such field."""
+    if isinstance(value, dict):
+        return value.get(key)
+    return getattr(value, key, None)
+
+
+def attributes_key(type_name, suffix='EventAttributes'):
+    """The key of the attributes of an event or decision type, e.g. ``timerFiredEventAttributes``."""
+    return type_name[0].lower() + type_name[1:] + suffix
+
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=utc)
+
+
+def encode_datetime(value):
+    """The ``default`` of :func:`json.dumps`: encodes datetimes as ``{"$dt": epoch_seconds}``."""
+    if isinstance(value, datetime.datetime):
+        return {'$dt': to_timestamp(value)}
+    raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+def decode_datetime(obj):
+    """The ``object_hook`` of :func:`json.loads`: decodes the datetimes encoded by :func:`encode_datetime`, in UTC."""
+    if len(obj) == 1 and '$dt' in obj:
+        return _EPOCH + datetime.timedelta(seconds=obj['$dt'])
+    return obj
+
+
+def open_text(path, mode):
+    """Opens a UTF-8 text file, compressed with gzip if its name ends in ``.gz``."""
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, mode + 'b'), encoding='utf-8')
+    return io.open(path, mode, encoding='utf-8')
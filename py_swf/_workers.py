@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Helpers shared by the thread pools of :class:`~py_swf.decider.Decider` and
+:class:`~py_swf.multiplex.MultiplexedPoller`."""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+from collections import defaultdict
+
+
+class Counters(object):
+    """Thread-safe counters, by key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def increment(self, key, value=1):
+        with self._lock:
+            self._counts[key] += value
+
+    def get(self, key):
+        with self._lock:
+            return self._counts.get(key, 0)
+
+    def snapshot(self):
+        """Returns a copy of every counter as a dict."""
+        with self._lock:
+            return dict(self._counts)
+
+
+class WorkerPool(object):
+    """Daemon threads running ``target`` until :attr:`stopping` is set.
+
+    :param target: Run by every thread. Returns once ``stopping`` is set.
+    :param name: The prefix of the thread names.
+    :type name: string
+
+    :ivar stopping: Set to stop the threads. Shared with the :class:`~py_swf.interruptible.InterruptiblePoller` of
+                    the pool's owner, so that their polls are interrupted too.
+    """
+
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+        self.stopping = threading.Event()
+        self._threads = []
+
+    def start(self, num_threads):
+        self.stopping.clear()
+        self._threads = [
+            threading.Thread(target=self.target, name='{0}-{1}'.format(self.name, i))
+            for i in range(num_threads)
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def join(self, timeout=None, pollers=()):
+        """Waits for the threads to stop, then for the abandoned polls of ``pollers`` to complete.
+
+        :param timeout: Optional. Seconds to wait for, overall.
+        :param pollers: The :class:`~py_swf.interruptible.InterruptiblePoller` whose abandoned polls to wait for.
+        :return: Whether every thread stopped and every abandoned poll completed.
+        :rtype: bool
+        """
+        end = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            thread.join(None if end is None else max(end - time.time(), 0))
+        if any(thread.is_alive() for thread in self._threads):
+            return False
+        for poller in pollers:
+            if not poller.wait_for_abandoned_polls(None if end is None else max(end - time.time(), 0)):
+                return False
+        return True
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Activity latency distributions over many workflow histories, computed with numpy.
+
+Histories are exported into :class:`~py_swf.columnar.EventColumns`, then the events of every activity are joined by
+event id with precomputed index arrays, and percentiles computed per activity type without a Python loop per event::
+
+    latencies = history_latencies(decision_client, [(workflow_id, run_id), ...], percentiles=(50, 99))
+    latencies[('resize_image', '1.0')].schedule_to_start[99]
+
+The latencies, in seconds, are:
+
+* ``schedule_to_start``: from ``ActivityTaskScheduled`` to ``ActivityTaskStarted``, the time spent in the task list.
+* ``start_to_close``: from ``ActivityTaskStarted`` to ``ActivityTaskCompleted``, the time spent working.
+* ``queue_wait``: from the ``DecisionTaskScheduled`` that led to scheduling the activity to ``ActivityTaskStarted``,
+  i.e. the schedule-to-start latency plus the time the decision took to be polled and responded to.
+
+This module requires numpy, which py_swf doesn't depend on: install ``py-swf[analytics]``.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from collections import namedtuple
+
+from py_swf.columnar import EVENT_TYPE_CODES
+from py_swf.columnar import export_history
+
+
+__all__ = ['ActivityLatencies', 'activity_latencies', 'history_latencies']
+
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
+ActivityLatencies = namedtuple('ActivityLatencies', 'started completed schedule_to_start start_to_close queue_wait')
+"""The latency distributions of an activity type.
+
+started (int) -- How many of its tasks were started.
+completed (int) -- How many of its tasks were completed.
+schedule_to_start (dict) -- Seconds by percentile, for started tasks. Empty when there are none.
+start_to_close (dict) -- Seconds by percentile, for completed tasks. Empty when there are none.
+queue_wait (dict) -- Seconds by percentile, for started tasks. Empty when there are none.
+"""
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('py_swf.analytics requires numpy, install it with `pip install py-swf[analytics]`')
+    return numpy
+
+
+class _EventIndex(object):
+    """Finds the rows of events by ``(run, event id)``, for whole arrays of ids at once."""
+
+    def __init__(self, numpy, run, event_id):
+        self.numpy = numpy
+        keys = self._keys(run, event_id)
+        self.order = numpy.argsort(keys, kind='mergesort')
+        self.sorted_keys = keys[self.order]
+
+    def _keys(self, run, event_id):
+        # Event ids are far below 2 ** 32 (SWF caps histories at 25,000 events).
+        return (run.astype(self.numpy.int64) << 32) | event_id.astype(self.numpy.int64)
+
+    def rows(self, run, event_id):
+        """Returns the rows of the events, and a mask of those found. Rows of events not found are meaningless."""
+        if not len(self.sorted_keys):
+            return self.numpy.zeros(len(event_id), dtype=self.numpy.int64), self.numpy.zeros(len(event_id), dtype=bool)
+        keys = self._keys(run, event_id)
+        positions = self.numpy.minimum(self.numpy.searchsorted(self.sorted_keys, keys), len(self.sorted_keys) - 1)
+        found = (self.sorted_keys[positions] == keys) & (event_id > 0)
+        return self.order[positions], found
+
+
+def _percentiles(numpy, values, percentiles):
+    if not len(values):
+        return {}
+    return dict(zip(percentiles, (float(value) for value in numpy.percentile(values, percentiles))))
+
+
+def _by_type(numpy, activity_type, values, percentiles, num_types):
+    """Splits ``values`` by activity type with a single sort, and computes the percentiles of each type."""
+    order = numpy.argsort(activity_type, kind='mergesort')
+    bounds = numpy.searchsorted(activity_type[order], numpy.arange(num_types + 1))
+    sorted_values = values[order]
+    return [
+        _percentiles(numpy, sorted_values[bounds[index]:bounds[index + 1]], percentiles)
+        for index in range(num_types)
+    ]
+
+
+def activity_latencies(columns, percentiles=DEFAULT_PERCENTILES):
+    """Computes the latency distributions of every activity type in ``columns``.
+
+    Activities whose ``ActivityTaskScheduled`` event isn't in ``columns``, e.g. because only part of a history was
+    exported, are left out.
+
+    :param columns: The histories to look at.
+    :type columns: :class:`~py_swf.columnar.EventColumns`
+    :param percentiles: The percentiles to compute, between 0 and 100.
+    :type percentiles: tuple of float
+    :return: A dict of ``(name, version)`` activity type to :class:`ActivityLatencies`.
+    :rtype: dict
+    """
+    numpy = _import_numpy()
+    arrays = columns.to_numpy()
+    run = arrays['run']
+    event_type = arrays['event_type']
+    timestamp = arrays['timestamp']
+    activity_type = arrays['activity_type']
+    index = _EventIndex(numpy, run, arrays['event_id'])
+
+    started = numpy.flatnonzero(event_type == EVENT_TYPE_CODES['ActivityTaskStarted'])
+    scheduled, found = index.rows(run[started], arrays['scheduled_event_id'][started])
+    found &= activity_type[scheduled] >= 0
+    started, scheduled = started[found], scheduled[found]
+    started_types = activity_type[scheduled]
+
+    decision_completed, found = index.rows(run[scheduled], arrays['decision_task_completed_event_id'][scheduled])
+    decision_scheduled, found_scheduled = index.rows(
+        run[decision_completed],
+        arrays['scheduled_event_id'][decision_completed],
+    )
+    waited = found & found_scheduled
+
+    completed = numpy.flatnonzero(event_type == EVENT_TYPE_CODES['ActivityTaskCompleted'])
+    completed_started, found = index.rows(run[completed], arrays['started_event_id'][completed])
+    completed_scheduled, found_scheduled = index.rows(run[completed], arrays['scheduled_event_id'][completed])
+    found &= found_scheduled & (activity_type[completed_scheduled] >= 0)
+    completed, completed_started = completed[found], completed_started[found]
+    completed_types = activity_type[completed_scheduled[found]]
+
+    num_types = len(columns.activity_types)
+    schedule_to_start = _by_type(
+        numpy,
+        started_types,
+        (timestamp[started] - timestamp[scheduled]) / 1000.0,
+        percentiles,
+        num_types,
+    )
+    queue_wait = _by_type(
+        numpy,
+        started_types[waited],
+        (timestamp[started[waited]] - timestamp[decision_scheduled[waited]]) / 1000.0,
+        percentiles,
+        num_types,
+    )
+    start_to_close = _by_type(
+        numpy,
+        completed_types,
+        (timestamp[completed] - timestamp[completed_started]) / 1000.0,
+        percentiles,
+        num_types,
+    )
+    started_counts = numpy.bincount(started_types, minlength=num_types)
+    completed_counts = numpy.bincount(completed_types, minlength=num_types)
+
+    return dict(
+        (
+            columns.activity_types[type_index],
+            ActivityLatencies(
+                started=int(started_counts[type_index]),
+                completed=int(completed_counts[type_index]),
+                schedule_to_start=schedule_to_start[type_index],
+                start_to_close=start_to_close[type_index],
+                queue_wait=queue_wait[type_index],
+            ),
+        )
+        for type_index in range(num_types)
+    )
+
+
+def history_latencies(decision_client, executions, percentiles=DEFAULT_PERCENTILES, maximum_page_size=1000):
+    """Exports the histories of ``executions`` and computes the latency distributions of their activities.
+
+    See :func:`~py_swf.columnar.export_history` and :func:`activity_latencies`.
+
+    :param decision_client: Fetches the histories.
+    :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+    :param executions: The ``(workflow_id, run_id)`` of the executions to look at.
+    :type executions: iterable of tuple
+    :param percentiles: The percentiles to compute, between 0 and 100.
+    :type percentiles: tuple of float
+    :param maximum_page_size: Passthru for maximumPageSize to :meth:`~SWF.Client.get_workflow_execution_history`
+    :type maximum_page_size: int
+    :return: A dict of ``(name, version)`` activity type to :class:`ActivityLatencies`.
+    :rtype: dict
+    """
+    columns = export_history(decision_client, executions, maximum_page_size=maximum_page_size)
+    return activity_latencies(columns, percentiles=percentiles)
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Download the histories of many executions concurrently, for audits and backfills.
+
+:class:`BulkHistoryFetcher` fetches histories on a pool of threads, with every page request going through a shared
+:class:`RateLimiter`, and yields each history as soon as all of its pages arrived::
+
+    fetcher = BulkHistoryFetcher(decision_client, num_workers=16, rate_limiter=RateLimiter(rate=20))
+    for history in fetcher.fetch([(workflow_id, run_id), ...]):
+        ...
+
+:func:`export_histories` writes the histories to NDJSON shards in a directory, one history per line, and records
+every complete shard in a checkpoint file. Running it again with the same directory skips the executions already
+exported, so an interrupted export resumes where it stopped::
+
+    export_histories(fetcher, executions, '/tmp/histories')
+    for history in read_histories('/tmp/histories'):
+        ...
+
+Events are written raw, oldest first, with datetimes as ``{"$dt": epoch_seconds}`` like
+:mod:`py_swf.recording`.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from py_swf._encoding import encode_datetime
+from py_swf._encoding import open_text
+from py_swf.recording import read_recording
+
+try:
+    import queue
+except ImportError:  # py2
+    import Queue as queue
+
+
+__all__ = ['ExecutionHistory', 'RateLimiter', 'BulkHistoryFetcher', 'export_histories', 'read_histories']
+
+
+log = logging.getLogger(__name__)
+
+
+CHECKPOINT_FILE = 'checkpoint.ndjson'
+
+
+ExecutionHistory = namedtuple('ExecutionHistory', 'workflow_id run_id events')
+"""The complete history of an execution.
+
+workflow_id (string) -- The workflow id of the execution.
+run_id (string) -- The run id of the execution.
+events (list of dict) -- The raw events of the execution, oldest first.
+"""
+
+
+class RateLimiter(object):
+    """A token bucket, shared by every thread that acquires from it.
+
+    Callers reserve a token each, and sleep until it is due, so that calls are spread evenly at ``rate`` per second
+    once the initial burst is spent.
+
+    :param rate: Calls allowed per second.
+    :type rate: float
+    :param burst: How many calls may be made at once after being idle. Defaults to ``rate``, and at least 1.
+    :type burst: float
+    :param clock: Returns the current time in seconds. For tests.
+    :param sleep: Sleeps for the given seconds. For tests.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = None
+
+    def acquire(self):
+        """Blocks until the caller may make a call."""
+        with self._lock:
+            now = self.clock()
+            if self._updated is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            self.sleep(wait)
+
+
+class BulkHistoryFetcher(object):
+    """Fetches the complete histories of many executions on a pool of threads.
+
+    :param decision_client: Fetches the pages of every history. Its retry policy applies to each page.
+    :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+    :param num_workers: How many histories are fetched concurrently.
+    :type num_workers: int
+    :param rate_limiter: Optional. Acquired before every page request. Share one between fetchers to share its rate.
+    :type rate_limiter: :class:`RateLimiter`
+    :param maximum_page_size: Passthru for maximumPageSize to :meth:`~SWF.Client.get_workflow_execution_history`
+    :type maximum_page_size: int
+    :param on_error: Optional. Called with the ``(workflow_id, run_id)`` and the exception when fetching a history
+                     fails. Failed histories are skipped. Errors it raises are logged.
+
+    :ivar fetched: How many histories were fetched.
+    :ivar failed: How many histories failed to be fetched.
+    :ivar pages: How many pages were fetched.
+    """
+
+    def __init__(self, decision_client, num_workers=8, rate_limiter=None, maximum_page_size=1000, on_error=None):
+        self.decision_client = decision_client
+        self.num_workers = num_workers
+        self.rate_limiter = rate_limiter
+        self.maximum_page_size = maximum_page_size
+        self.on_error = on_error
+        self.fetched = 0
+        self.failed = 0
+        self.pages = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, executions):
+        """Fetches the history of every execution, yielding them in the order they complete.
+
+        ``executions`` is consumed lazily, a few executions ahead of the workers, so it may be a long generator.
+        Closing the returned generator stops the workers after the pages in progress.
+
+        :param executions: The ``(workflow_id, run_id)`` of the executions to fetch.
+        :type executions: iterable of tuple
+        :return: A generator of :class:`ExecutionHistory`.
+        :rtype: collections.Iterable
+        """
+        executions = iter(executions)
+        pending = queue.Queue()
+        results = queue.Queue()
+        stopping = threading.Event()
+        threads = [
+            threading.Thread(target=self._work, args=(pending, results, stopping), name='py_swf-history-{0}'.format(i))
+            for i in range(self.num_workers)
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        in_flight = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and in_flight < 2 * self.num_workers:
+                    try:
+                        pending.put(next(executions))
+                    except StopIteration:
+                        exhausted = True
+                    else:
+                        in_flight += 1
+                if not in_flight:
+                    break
+                history = results.get()
+                in_flight -= 1
+                if history is not None:
+                    yield history
+        finally:
+            stopping.set()
+            for _ in threads:
+                pending.put(None)
+
+    def _work(self, pending, results, stopping):
+        while True:
+            execution = pending.get()
+            if execution is None:
+                return
+            history = None
+            try:
+                if not stopping.is_set():
+                    history = self._fetch_one(*execution)
+                    self._increment('fetched')
+            except Exception as e:
+                self._increment('failed')
+                self._report(execution, e)
+            finally:
+                # Always answers, or fetch() would wait for this execution forever.
+                results.put(history)
+
+    def _report(self, execution, error):
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(execution, error)
+        except Exception:
+            log.exception('on_error failed for %s', execution)
+
+    def _fetch_one(self, workflow_id, run_id):
+        events = []
+        next_page_token = None
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            page, next_page_token = self.decision_client.get_execution_history_page(
+                workflow_id,
+                run_id,
+                next_page_token=next_page_token,
+                reverse_order=False,
+                use_raw_event_history=True,
+                maximum_page_size=self.maximum_page_size,
+            )
+            self._increment('pages')
+            events.extend(page)
+            if next_page_token is None:
+                return ExecutionHistory(workflow_id, run_id, events)
+
+    def _increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+def _read_checkpoint(directory):
+    """Returns the shards recorded in the checkpoint, as a list of ``(shard name, executions)``, and the size of the
+    checkpoint up to the last complete entry.
+    """
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return [], 0
+    shards = []
+    size = 0
+    with io.open(path, 'rb') as f:
+        for line in f:
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('Incomplete entry')
+                entry = json.loads(line.decode('utf-8'))
+            except ValueError:
+                # The process was interrupted while writing this entry: its shard gets exported again.
+                break
+            shards.append((entry['shard'], [tuple(execution) for execution in entry['executions']]))
+            size += len(line)
+    return shards, size
+
+
+def _write_shard(directory, number, histories, compress):
+    name = 'histories-{0:05d}.ndjson{1}'.format(number, '.gz' if compress else '')
+    path = os.path.join(directory, name)
+    # Keeps the extension, which tells open_text whether to compress.
+    partial_path = os.path.join(directory, 'partial-' + name)
+    with open_text(partial_path, 'w') as f:
+        for history in histories:
+            line = json.dumps(
+                dict(workflowId=history.workflow_id, runId=history.run_id, events=history.events),
+                default=encode_datetime,
+                separators=(',', ':'),
+            )
+            f.write(line + '\n')
+    os.rename(partial_path, path)
+
+    entry = dict(shard=name, executions=[[history.workflow_id, history.run_id] for history in histories])
+    with open_text(os.path.join(directory, CHECKPOINT_FILE), 'a') as f:
+        f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def export_histories(fetcher, executions, directory, shard_size=1000, compress=False):
+    """Fetches the histories of ``executions`` and writes them to NDJSON shards in ``directory``.
+
+    A shard is recorded in the checkpoint file once all of its histories are written. Executions recorded in the
+    checkpoint are skipped, so calling this again after an interruption only exports the rest.
+
+    :param fetcher: Fetches the histories.
+    :type fetcher: :class:`BulkHistoryFetcher`
+    :param executions: The ``(workflow_id, run_id)`` of the executions to export.
+    :type executions: iterable of tuple
+    :param directory: Where to write the shards and the checkpoint. Created if missing.
+    :type directory: string
+    :param shard_size: How many histories are written to each shard.
+    :type shard_size: int
+    :param compress: Whether to compress shards with gzip.
+    :type compress: bool
+    :return: How many histories were exported by this call.
+    :rtype: int
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    shards, size = _read_checkpoint(directory)
+    checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+    if os.path.exists(checkpoint_path) and os.path.getsize(checkpoint_path) > size:
+        with io.open(checkpoint_path, 'r+b') as f:
+            f.truncate(size)
+    exported = set(execution for _, shard_executions in shards for execution in shard_executions)
+    number = len(shards)
+
+    count = 0
+    shard = []
+    for history in fetcher.fetch(tuple(execution) for execution in executions if tuple(execution) not in exported):
+        shard.append(history)
+        if len(shard) == shard_size:
+            _write_shard(directory, number, shard, compress)
+            number += 1
+            count += len(shard)
+            shard = []
+    if shard:
+        _write_shard(directory, number, shard, compress)
+        count += len(shard)
+    return count
+
+
+def read_histories(directory):
+    """Yields the histories exported to ``directory`` by :func:`export_histories`, shard by shard.
+
+    Only shards recorded in the checkpoint are read.
+
+    :type directory: string
+    :return: A generator of :class:`ExecutionHistory`.
+    :rtype: collections.Iterable
+    """
+    for name, _ in _read_checkpoint(directory)[0]:
+        for entry in read_recording(os.path.join(directory, name)):
+            yield ExecutionHistory(entry['workflowId'], entry['runId'], entry['events'])
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""Checkpoints of a workflow's state in its own history, so that deciders only replay the events since the last one.
+
+A decider responds with a checkpoint of the state it rebuilt, either as a marker or as the execution context::
+
+    decision_client.finish_decision(task.task_token, decisions + [build_checkpoint_marker(state)])
+    # or
+    decision_client.finish_decision(task.task_token, decisions, execution_context=checkpoint_execution_context(state))
+
+On the next decision task, :func:`load_checkpoint` walks the history backwards, stops at the latest checkpoint, and
+returns its state with only the events recorded since the decision that made it started::
+
+    checkpoint, events = load_checkpoint(decision_client, task)
+    state = checkpoint.state if checkpoint is not None else initial_state()
+    for event in events:
+        state = apply(state, event)
+
+States are serialized as compact JSON, compressed with zlib when that makes them smaller. Markers hold at most
+32768 characters of details, and execution contexts 32768 characters.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import base64
+import json
+import zlib
+from collections import namedtuple
+
+from py_swf._encoding import get_field
+from py_swf.clients.decision import build_record_marker
+
+
+__all__ = [
+    'Checkpoint',
+    'build_checkpoint_marker',
+    'checkpoint_execution_context',
+    'find_checkpoint',
+    'load_checkpoint',
+]
+
+
+CHECKPOINT_MARKER = 'py_swf.checkpoint'
+"""The default name of checkpoint markers."""
+
+CONTEXT_PREFIX = 'py_swf.checkpoint\n'
+"""Starts execution contexts holding a checkpoint."""
+
+_ZLIB_PREFIX = 'zlib:'
+
+
+Checkpoint = namedtuple('Checkpoint', 'state event_id')
+"""A checkpoint found in a history.
+
+state -- The state checkpointed.
+event_id (int) -- The id of the MarkerRecorded or DecisionTaskCompleted event holding the checkpoint.
+"""
+
+
+def encode_state(state):
+    """Serializes a JSON serializable state into a string, compressed if that makes it smaller."""
+    text = json.dumps(state, separators=(',', ':'), sort_keys=True)
+    compressed = _ZLIB_PREFIX + base64.b64encode(zlib.compress(text.encode('utf-8'), 9)).decode('ascii')
+    return compressed if len(compressed) < len(text) else text
+
+
+def decode_state(text):
+    """Deserializes a string built by :func:`encode_state`."""
+    if text.startswith(_ZLIB_PREFIX):
+        text = zlib.decompress(base64.b64decode(text[len(_ZLIB_PREFIX):].encode('ascii'))).decode('utf-8')
+    return json.loads(text)
+
+
+def build_checkpoint_marker(state, marker_name=CHECKPOINT_MARKER):
+    """Builds a RecordMarker decision checkpointing ``state``.
+
+    :param state: Any JSON serializable value.
+    :param marker_name: The name of the marker. Use a different name for each kind of checkpoint.
+    :type marker_name: string
+    """
+    return build_record_marker(marker_name, encode_state(state))
+
+
+def checkpoint_execution_context(state):
+    """Returns an execution context checkpointing ``state``, to respond to a decision task with.
+
+    :param state: Any JSON serializable value.
+    :rtype: string
+    """
+    return CONTEXT_PREFIX + encode_state(state)
+
+
+def _encoded_checkpoint(event, marker_name):
+    """Returns the encoded state checkpointed by an event, or None."""
+    event_type = get_field(event, 'eventType')
+    if event_type == 'MarkerRecorded':
+        attributes = get_field(event, 'markerRecordedEventAttributes')
+        if get_field(attributes, 'markerName') == marker_name:
+            return get_field(attributes, 'details')
+    elif event_type == 'DecisionTaskCompleted':
+        context = get_field(get_field(event, 'decisionTaskCompletedEventAttributes'), 'executionContext')
+        if context and context.startswith(CONTEXT_PREFIX):
+            return context[len(CONTEXT_PREFIX):]
+    return None
+
+
+def find_checkpoint(events, marker_name=CHECKPOINT_MARKER):
+    """Finds the latest checkpoint in events, most recent first, consuming no more events than needed.
+
+    A checkpoint holds the state rebuilt from the events up to the DecisionTaskStarted event of the decision that
+    recorded it, so every later event but the checkpoint itself is replayed: those recorded while the decision was
+    being made, e.g. an activity completing, and those of the decision. Checkpoints that can't be traced back to
+    their decision are only followed by the events after them.
+
+    :param events: Raw or namedtuple events, most recent first. May be a lazy walk of the history.
+    :type events: iterable
+    :param marker_name: The name of checkpoint markers.
+    :type marker_name: string
+    :return: The latest :class:`Checkpoint`, or None, and the events to replay, oldest first.
+    :rtype: tuple
+    """
+    events = iter(events)
+    newer_events = []
+    for event in events:
+        encoded = _encoded_checkpoint(event, marker_name)
+        if encoded is not None:
+            break
+        newer_events.append(event)
+    else:
+        return None, newer_events[::-1]
+
+    checkpoint = Checkpoint(decode_state(encoded), get_field(event, 'eventId'))
+    if get_field(event, 'eventType') == 'DecisionTaskCompleted':
+        completed_event_id = checkpoint.event_id
+        started_event_id = get_field(get_field(event, 'decisionTaskCompletedEventAttributes'), 'startedEventId')
+    else:
+        completed_event_id = get_field(get_field(event, 'markerRecordedEventAttributes'), 'decisionTaskCompletedEventId')
+        started_event_id = None
+    if completed_event_id is None:
+        return checkpoint, newer_events[::-1]
+
+    # Events older than the checkpoint, down to the DecisionTaskStarted event of its decision.
+    older_events = []
+    last_event_id = checkpoint.event_id
+    while started_event_id is None or last_event_id > started_event_id + 1:
+        event = next(events, None)
+        if event is None:
+            break
+        older_events.append(event)
+        last_event_id = get_field(event, 'eventId')
+        if last_event_id == completed_event_id:
+            started_event_id = get_field(get_field(event, 'decisionTaskCompletedEventAttributes'), 'startedEventId')
+            if started_event_id is None:
+                break
+    return checkpoint, older_events[::-1] + newer_events[::-1]
+
+
+def load_checkpoint(decision_client, task, marker_name=CHECKPOINT_MARKER, use_raw_event_history=False):
+    """Finds the latest checkpoint of a polled decision task's workflow, and the events recorded after it.
+
+    The events of the task are looked at first. Older events are only fetched, backwards with
+    :meth:`~py_swf.clients.decision.DecisionClient.walk_older_events`, and a page at a time, until the checkpoint and
+    the DecisionTaskStarted event of its decision are found, see :func:`find_checkpoint`. Without a checkpoint, the
+    whole history is replayed.
+
+    :param decision_client: Fetches older events.
+    :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+    :param task: A task returned by :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+    :type task: :class:`~py_swf.clients.decision.DecisionTask`
+    :param marker_name: The name of checkpoint markers.
+    :type marker_name: string
+    :param use_raw_event_history: Whether the task was polled with ``use_raw_event_history``. Older events are
+                                  fetched in the same form.
+    :type use_raw_event_history: bool
+    :return: The latest :class:`Checkpoint`, or None, and the events to replay, oldest first.
+    :rtype: tuple
+    """
+    return find_checkpoint(_walk_back(decision_client, task, use_raw_event_history), marker_name=marker_name)
+
+
+def _walk_back(decision_client, task, use_raw_event_history):
+    """Yields the events of a task, then its older events, fetched only as they are consumed."""
+    for event in task.events:
+        yield event
+    for event in decision_client.walk_older_events(task, use_raw_event_history=use_raw_event_history):
+        yield event
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""Fan out work to many child workflows, and fan their results back in.
+
+SWF accepts at most 100 decisions per decision task response, and 1000 open child executions per workflow.
+:class:`FanOut` starts children in batches within both limits. Every child that starts or fails to start schedules
+a new decision task, which starts the next batch. :class:`ChildWorkflows` indexes the child workflow events of a
+history, so each decision task finds out which children closed in one pass over the history, however many children
+closed since the previous one::
+
+    fan_out = FanOut([
+        build_start_child_workflow('job-{0}'.format(i), 'map', '1.0', json.dumps(chunk))
+        for i, chunk in enumerate(chunks)
+    ])
+    children = load_children(decision_client, task)
+    if fan_out.done(children):
+        decision_client.finish_workflow(task.task_token, json.dumps(fan_out.results(children)))
+    else:
+        decision_client.finish_decision(task.task_token, fan_out.decisions(children))
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from collections import namedtuple
+from collections import OrderedDict
+
+from py_swf._encoding import attributes_key
+from py_swf._encoding import get_field
+from py_swf.clients.decision import event_types
+
+
+__all__ = ['Child', 'ChildWorkflows', 'FanOut', 'load_children']
+
+
+MAX_DECISIONS_PER_RESPONSE = 100
+"""The most decisions SWF accepts in a single decision task response."""
+
+MAX_OPEN_CHILDREN = 1000
+"""The most child executions a workflow execution may have open at once."""
+
+CHILD_WORKFLOW_EVENT_TYPES = (
+    'StartChildWorkflowExecutionInitiated',
+    'StartChildWorkflowExecutionFailed',
+    'ChildWorkflowExecutionStarted',
+    'ChildWorkflowExecutionCompleted',
+    'ChildWorkflowExecutionFailed',
+    'ChildWorkflowExecutionTimedOut',
+    'ChildWorkflowExecutionCanceled',
+    'ChildWorkflowExecutionTerminated',
+)
+
+OPEN_STATUSES = frozenset(['INITIATED', 'STARTED'])
+
+# The status of a child after each of its events, and the fields of the event that are kept.
+_TRANSITIONS = {
+    'StartChildWorkflowExecutionInitiated': ('INITIATED', ()),
+    'StartChildWorkflowExecutionFailed': ('START_FAILED', ('cause',)),
+    'ChildWorkflowExecutionStarted': ('STARTED', ()),
+    'ChildWorkflowExecutionCompleted': ('COMPLETED', ('result',)),
+    'ChildWorkflowExecutionFailed': ('FAILED', ('reason', 'details')),
+    'ChildWorkflowExecutionTimedOut': ('TIMED_OUT', ('timeoutType',)),
+    'ChildWorkflowExecutionCanceled': ('CANCELED', ('details',)),
+    'ChildWorkflowExecutionTerminated': ('TERMINATED', ()),
+}
+
+
+Child = namedtuple('Child', 'workflow_id run_id status result reason details control')
+"""The latest state of a child workflow execution, as recorded in its parent's history.
+
+workflow_id (string) -- The workflow id of the child.
+run_id (string) -- The run id of the child, or None until it started.
+status (string) -- One of INITIATED, STARTED, COMPLETED, FAILED, TIMED_OUT, CANCELED, TERMINATED or START_FAILED.
+result (string) -- The result of a COMPLETED child.
+reason (string) -- Why the child FAILED, or the cause of START_FAILED.
+details (string) -- The details of a FAILED or CANCELED child.
+control (string) -- The control of the decision that started the child.
+"""
+
+
+class ChildWorkflows(object):
+    """An index of the child workflow executions of a workflow, built from its history.
+
+    Events may be raw or namedtuples, in any order. Only events newer than those already indexed are applied, so the
+    index can be kept up to date by updating it with the events of each decision task.
+
+    :param events: Optional. Events to index.
+    :type events: iterable
+    """
+
+    def __init__(self, events=()):
+        self.children = OrderedDict()
+        self.last_event_id = 0
+        self.update(events)
+
+    def update(self, events):
+        """Applies the child workflow events newer than those already indexed.
+
+        :param events: Raw or namedtuple events, in any order.
+        :type events: iterable
+        """
+        newest_event_id = self.last_event_id
+        child_events = []
+        for event in events:
+            event_id = get_field(event, 'eventId')
+            if event_id > self.last_event_id:
+                newest_event_id = max(newest_event_id, event_id)
+                if get_field(event, 'eventType') in _TRANSITIONS:
+                    child_events.append(event)
+        child_events.sort(key=lambda event: get_field(event, 'eventId'))
+        for event in child_events:
+            self._apply(event)
+        self.last_event_id = newest_event_id
+
+    def _apply(self, event):
+        event_type = get_field(event, 'eventType')
+        attributes = get_field(event, attributes_key(event_type))
+        status, fields = _TRANSITIONS[event_type]
+        execution = get_field(attributes, 'workflowExecution')
+        workflow_id = get_field(execution, 'workflowId') if execution is not None else get_field(attributes, 'workflowId')
+
+        if event_type == 'StartChildWorkflowExecutionInitiated':
+            # A workflow id may be reused once its previous execution closed.
+            self.children.pop(workflow_id, None)
+            child = Child(workflow_id, None, status, None, None, None, get_field(attributes, 'control'))
+        else:
+            child = self.children.get(workflow_id)
+            if child is None:
+                return
+            child = child._replace(status=status)
+            if execution is not None:
+                child = child._replace(run_id=get_field(execution, 'runId'))
+            if 'result' in fields:
+                child = child._replace(result=get_field(attributes, 'result'))
+            if 'reason' in fields or 'cause' in fields:
+                child = child._replace(reason=get_field(attributes, 'reason') or get_field(attributes, 'cause'))
+            if 'details' in fields:
+                child = child._replace(details=get_field(attributes, 'details'))
+        self.children[workflow_id] = child
+
+    def get(self, workflow_id):
+        """Returns the :class:`Child` with ``workflow_id``, or None if it was never initiated."""
+        return self.children.get(workflow_id)
+
+    @property
+    def open(self):
+        """The children initiated or started, but not closed yet, in the order they were initiated."""
+        return [child for child in self.children.values() if child.status in OPEN_STATUSES]
+
+    @property
+    def closed(self):
+        """The children that closed or failed to start, in the order they were initiated."""
+        return [child for child in self.children.values() if child.status not in OPEN_STATUSES]
+
+    def __len__(self):
+        return len(self.children)
+
+    def __iter__(self):
+        return iter(self.children.values())
+
+
+def load_children(decision_client, task, children=None):
+    """Indexes the child workflows of a polled decision task's workflow.
+
+    The events of the task are enough when they reach back to the start of the workflow, or to the events already
+    indexed by ``children``. Otherwise the history is walked backwards, as raw events, down to those.
+
+    :param decision_client: Fetches the history.
+    :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+    :param task: A task returned by :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+    :type task: :class:`~py_swf.clients.decision.DecisionTask`
+    :param children: Optional. An index of an earlier task of the same workflow run, which is updated.
+    :type children: :class:`ChildWorkflows`
+    :rtype: :class:`ChildWorkflows`
+    """
+    if children is None:
+        children = ChildWorkflows()
+    if task.events and min(get_field(event, 'eventId') for event in task.events) <= children.last_event_id + 1:
+        children.update(task.events)
+        return children
+
+    last_event_id = children.last_event_id
+    children.update(decision_client.walk_execution_history(
+        task.workflow_id,
+        task.workflow_run_id,
+        reverse_order=True,
+        use_raw_event_history=True,
+        predicate=event_types(*CHILD_WORKFLOW_EVENT_TYPES),
+        stop=lambda event: event['eventId'] <= last_event_id + 1,
+    ))
+    children.update(task.events)
+    return children
+
+
+class FanOut(object):
+    """Starts child workflows in batches, and tells once they all closed.
+
+    Children are started in the order given. Each call to :meth:`decisions` starts those not initiated yet, as many
+    as fit in a decision task response and under the limit of open children.
+
+    :param decisions: StartChildWorkflowExecution decisions, as built by
+                      :func:`~py_swf.clients.decision.build_start_child_workflow`. Workflow ids must be unique.
+    :type decisions: list of dict
+    :param max_decisions: The most decisions per response.
+    :type max_decisions: int
+    :param max_open: The most children open at once, counting children started by anything else.
+    :type max_open: int
+    """
+
+    def __init__(self, decisions, max_decisions=MAX_DECISIONS_PER_RESPONSE, max_open=MAX_OPEN_CHILDREN):
+        self._decisions = list(decisions)
+        self.workflow_ids = [
+            decision['startChildWorkflowExecutionDecisionAttributes']['workflowId'] for decision in self._decisions
+        ]
+        self.max_decisions = max_decisions
+        self.max_open = max_open
+
+    def decisions(self, children, reserved=0):
+        """Returns the decisions starting the next batch of children.
+
+        Children starting, or failing to start, schedule the next decision task, so a batch always leads to the next.
+        When no child may start because too many are open, the next decision task comes once one of them closes.
+
+        :param children: The children of the workflow.
+        :type children: :class:`ChildWorkflows`
+        :param reserved: How many decisions of the response are taken by others.
+        :type reserved: int
+        :rtype: list of dict
+        """
+        room = min(self.max_decisions - reserved, self.max_open - len(children.open))
+        if room <= 0:
+            return []
+        batch = []
+        for workflow_id, decision in zip(self.workflow_ids, self._decisions):
+            if children.get(workflow_id) is None:
+                batch.append(decision)
+                if len(batch) == room:
+                    break
+        return batch
+
+    def pending(self, children):
+        """Returns the workflow ids of the children not closed yet, including those not started."""
+        pending = []
+        for workflow_id in self.workflow_ids:
+            child = children.get(workflow_id)
+            if child is None or child.status in OPEN_STATUSES:
+                pending.append(workflow_id)
+        return pending
+
+    def done(self, children):
+        """Whether every child closed or failed to start.
+
+        :type children: :class:`ChildWorkflows`
+        :rtype: bool
+        """
+        return not self.pending(children)
+
+    def results(self, children):
+        """Returns the results of the completed children, by workflow id, in the order given.
+
+        :type children: :class:`ChildWorkflows`
+        :rtype: collections.OrderedDict
+        """
+        results = OrderedDict()
+        for workflow_id in self.workflow_ids:
+            child = children.get(workflow_id)
+            if child is not None and child.status == 'COMPLETED':
+                results[workflow_id] = child.result
+        return results
+
+    def failures(self, children):
+        """Returns the children that closed without completing, or failed to start, in the order given.
+
+        :type children: :class:`ChildWorkflows`
+        :rtype: list of :class:`Child`
+        """
+        failures = []
+        for workflow_id in self.workflow_ids:
+            child = children.get(workflow_id)
+            if child is not None and child.status not in OPEN_STATUSES and child.status != 'COMPLETED':
+                failures.append(child)
+        return failures
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Builds one SWF boto3 client per process, with a connection pool sized for its workers.
+
+botocore keeps at most ``max_pool_connections`` (10 by default) connections open per client. Long-polls hold a
+connection for up to a minute, so a worker with more concurrent polls and responses than that keeps opening and
+discarding connections, paying a TLS handshake every time. A factory builds a single client with enough
+connections for the declared concurrency, and shares it with every py_swf client it creates::
+
+    factory = BotoClientFactory(max_concurrency=60, region_name='us-west-2', warm=True)
+    decision_client = factory.decision_client(decision_config)
+    activity_task_client = factory.activity_task_client(activity_task_config)
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+import threading
+import warnings
+
+
+__all__ = ['BotoClientFactory', 'build_boto_client', 'warm_connections']
+
+
+LONG_POLL_SECONDS = 60
+"""How long SWF holds a poll open before returning an empty response."""
+
+DEFAULT_READ_TIMEOUT = LONG_POLL_SECONDS + 10
+"""Long enough for a long-poll to complete, rather than be cut short by the client."""
+
+POOL_HEADROOM = 2
+"""Connections kept on top of the declared concurrency, for calls made outside of workers, e.g. counts."""
+
+
+def build_boto_client(
+    max_concurrency=10,
+    region_name=None,
+    session=None,
+    read_timeout=DEFAULT_READ_TIMEOUT,
+    connect_timeout=10,
+    **config_kwargs
+):
+    """Builds an SWF boto3 client able to serve ``max_concurrency`` simultaneous calls without opening new connections.
+
+    :param max_concurrency: How many calls may be in flight at once: pollers plus threads responding to tasks.
+    :type max_concurrency: int
+    :param region_name: Optional. The AWS region of SWF.
+    :type region_name: string
+    :param session: Optional. The boto3 session to create the client from. Defaults to a new session.
+    :type session: :class:`boto3.session.Session`
+    :param read_timeout: Seconds to wait for a response. Should exceed the 60 second long-poll.
+    :type read_timeout: float
+    :param connect_timeout: Seconds to wait for a connection to be established.
+    :type connect_timeout: float
+    :param config_kwargs: Any other :class:`botocore.config.Config` parameters.
+    :rtype: :class:`~SWF.Client`
+    """
+    import boto3
+    from botocore.config import Config
+
+    if read_timeout <= LONG_POLL_SECONDS:
+        warnings.warn(
+            'read_timeout={0} cuts long-polls short, which makes empty polls more frequent'.format(read_timeout),
+        )
+
+    config = Config(
+        read_timeout=read_timeout,
+        connect_timeout=connect_timeout,
+        max_pool_connections=max_concurrency + POOL_HEADROOM,
+        **config_kwargs
+    )
+    session = session if session is not None else boto3.session.Session()
+    return session.client('swf', region_name=region_name, config=config)
+
+
+def warm_connections(boto_client, count):
+    """Opens up to ``count`` pooled connections ahead of time by making that many cheap calls concurrently.
+
+    Errors are ignored: a connection that fails to warm up is simply opened on first use instead.
+
+    :param boto_client: The client whose connection pool to fill.
+    :type boto_client: :class:`~SWF.Client`
+    :param count: How many connections to open.
+    :type count: int
+    """
+    start = threading.Event()
+
+    def warm():
+        start.wait()
+        try:
+            boto_client.list_domains(registrationStatus='REGISTERED', maximumPageSize=1)
+        except Exception:
+            pass
+
+    threads = [threading.Thread(target=warm) for _ in range(count)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    # Releasing every thread at once makes the calls overlap, so that each of them needs its own connection.
+    start.set()
+    for thread in threads:
+        thread.join()
+
+
+class BotoClientFactory(object):
+    """Lazily builds one shared SWF boto3 client per process, and the py_swf clients using it.
+
+    The client is rebuilt in a forked child, since connections must not be shared across processes.
+
+    :param max_concurrency: How many calls may be in flight at once, across every py_swf client of the process.
+    :type max_concurrency: int
+    :param warm: Whether to open every pooled connection when the client is built.
+    :type warm: bool
+    :param client_kwargs: Passed on to :func:`build_boto_client`, e.g. ``region_name`` or ``session``.
+    """
+
+    def __init__(self, max_concurrency=10, warm=False, **client_kwargs):
+        self.max_concurrency = max_concurrency
+        self.warm = warm
+        self.client_kwargs = client_kwargs
+        self._lock = threading.Lock()
+        self._boto_client = None
+        self._pid = None
+
+    def get(self):
+        """Returns the shared SWF boto3 client, building it on first use in this process.
+
+        :rtype: :class:`~SWF.Client`
+        """
+        pid = os.getpid()
+        if self._boto_client is not None and self._pid == pid:
+            return self._boto_client
+        with self._lock:
+            if self._boto_client is None or self._pid != pid:
+                boto_client = build_boto_client(max_concurrency=self.max_concurrency, **self.client_kwargs)
+                if self.warm:
+                    warm_connections(boto_client, self.max_concurrency)
+                self._boto_client, self._pid = boto_client, pid
+            return self._boto_client
+
+    def decision_client(self, decision_config, **kwargs):
+        """Builds a :class:`~py_swf.clients.decision.DecisionClient` using the shared client.
+
+        :param kwargs: Passed on to the client, e.g. ``retry_policy``.
+        """
+        from py_swf.clients.decision import DecisionClient
+        return DecisionClient(decision_config, self.get(), **kwargs)
+
+    def activity_task_client(self, activity_task_config, **kwargs):
+        """Builds an :class:`~py_swf.clients.activity_task.ActivityTaskClient` using the shared client."""
+        from py_swf.clients.activity_task import ActivityTaskClient
+        return ActivityTaskClient(activity_task_config, self.get(), **kwargs)
+
+    def workflow_client(self, workflow_client_config, **kwargs):
+        """Builds a :class:`~py_swf.clients.workflow.WorkflowClient` using the shared client."""
+        from py_swf.clients.workflow import WorkflowClient
+        return WorkflowClient(workflow_client_config, self.get(), **kwargs)
+
+    def workflow_registrar(self, **kwargs):
+        """Builds a :class:`~py_swf.clients.admin.WorkflowRegistrar` using the shared client."""
+        from py_swf.clients.admin import WorkflowRegistrar
+        return WorkflowRegistrar(self.get(), **kwargs)
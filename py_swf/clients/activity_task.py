@@ -2,35 +2,75 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import time
 from collections import namedtuple
 
-from botocore.vendored.requests.exceptions import ReadTimeout
-
+from py_swf import tracing
+from py_swf._botocore import read_timeout
+from py_swf.clients.base import BaseClient
+from py_swf.clients.base import PollStats
+from py_swf.deadline import Deadline
 from py_swf.errors import NoTaskFound
+from py_swf.sharding import polled_task_lists
+from py_swf.sharding import poller_task_list
+from py_swf.sharding import report_poll
+
+
+__all__ = ['ActivityTaskClient', 'ActivityTask', 'HAND_BACK_REASON']
 
 
-__all__ = ['ActivityTaskClient', 'ActivityTask']
+class ActivityTask(namedtuple('ActivityTask', 'activity_id type version input task_token workflow_id workflow_run_id')):
+    """Contains the metadata to execute an activity task.
 
+    See the response syntax in :meth:`~SWF.Client.poll_for_activity_task`.
+
+    :ivar deadline: When the task times out, or None if it wasn't polled. Not one of the tuple's fields.
+    :vartype deadline: :class:`~py_swf.deadline.Deadline`
+    """
 
-ActivityTask = namedtuple('ActivityTask', 'activity_id type version input task_token workflow_id workflow_run_id')
-"""Contains the metadata to execute an activity task.
+    deadline = None
 
-See the response syntax in :meth:`~SWF.Client.poll_for_activity_task`.
+
+HAND_BACK_REASON = 'py_swf.hand_back'
+"""The failure reason of activity tasks handed back by :meth:`ActivityTaskClient.hand_back`. Deciders seeing it
+should schedule the activity again: it was never started.
 """
 
 
-class ActivityTaskClient(object):
+class ActivityTaskClient(BaseClient):
     """A client that provides a pythonic API for polling and responding to activity tasks through an SWF boto3 client.
 
     :param activity_task_config: Contains SWF values commonly used when making SWF api calls.
     :type activity_task_config: :class:`~py_swf.config_definitions.ActivityTaskConfig`
     :param boto_client: A raw SWF boto3 client.
     :type boto_client: :class:`~SWF.Client`
+    :param retry_policy: Optional. Retries calls that fail because of throttling or transient errors.
+    :type retry_policy: :class:`~py_swf.retry.RetryPolicy`
+    :param instrumentation: Optional. Receives the latency and outcome of every SWF call.
+    :type instrumentation: :class:`~py_swf.instrumentation.Instrumentation`
+    :param tracer: Optional. Propagates trace context through task payloads and records spans of SWF calls.
+    :type tracer: :class:`~py_swf.tracing.Tracer`
+    :param start_to_close_timeout: Optional. Seconds. The start-to-close timeout the activities polled are scheduled
+                                   with, which SWF doesn't send with the task. Sets the ``deadline`` of every task.
+    :type start_to_close_timeout: float
     """
 
-    def __init__(self, activity_task_config, boto_client):
+    def __init__(
+        self,
+        activity_task_config,
+        boto_client,
+        retry_policy=None,
+        instrumentation=None,
+        tracer=None,
+        start_to_close_timeout=None,
+    ):
         self.activity_task_config = activity_task_config
         self.boto_client = boto_client
+        self.retry_policy = retry_policy
+        self.instrumentation = instrumentation
+        self.tracer = tracer
+        self.start_to_close_timeout = start_to_close_timeout
+        self.poll_stats = PollStats()
 
     def poll(self, identity=None):
         """Opens a connection to AWS and long-polls for activity tasks.
@@ -44,38 +84,104 @@ class ActivityTaskClient(object):
         :rtype: ActivityTask
         :raises py_swf.errors.NoTaskFound: Raised when polling for an activity times out without receiving any tasks.
         """
+        task = self._poll_once(identity=identity)
+        if task is None:
+            raise NoTaskFound('Received no activity task')
+        return task
+
+    def iter_tasks(self, identity=None, shutdown=None, max_polls=None):
+        """Long-polls for activity tasks in a loop, and yields each one received.
+
+        Polls that time out or receive an incomplete response are skipped, and counted in :attr:`poll_stats`.
+
+        :param identity: A freeform text that identifies the client that performed the longpoll. Useful for debugging history.
+        :type identity: string
+        :param shutdown: Optional. Stops the iteration once set, after the poll in progress.
+        :type shutdown: :class:`threading.Event`
+        :param max_polls: Optional. Stops the iteration after this many polls, whether they received tasks or not.
+        :type max_polls: int
+        :return: A generator of activity tasks.
+        :rtype: collections.Iterable
+        """
+        return self._iter_tasks(shutdown, max_polls, identity=identity)
+
+    def poll_forever(self, identity=None, shutdown=None):
+        """Yields activity tasks as they are received, until ``shutdown`` is set. See :meth:`iter_tasks`."""
+        return self.iter_tasks(identity=identity, shutdown=shutdown)
+
+    def _poll_once(self, identity=None):
+        task_list = poller_task_list(self.activity_task_config.task_list)
         kwargs = dict(
             domain=self.activity_task_config.domain,
             taskList={
-                'name': self.activity_task_config.task_list,
+                'name': task_list,
             },
         )
 
         if identity is not None:
             kwargs['identity'] = identity
 
+        start = time.time()
         try:
-            results = self.boto_client.poll_for_activity_task(
+            results = self._call(
+                'poll_for_activity_task',
                 **kwargs
             )
-        except ReadTimeout as e:
-            raise NoTaskFound(e)
+        except read_timeout():
+            report_poll(self.activity_task_config.task_list, task_list, False)
+            self.poll_stats.increment('timed_out_polls')
+            return None
 
         # Sometimes SWF gives us an incomplete response, ignore these.
-        if not results.get('taskToken', None):
-            raise NoTaskFound('Received results with no taskToken')
+        got_task = bool(results.get('taskToken', None))
+        report_poll(self.activity_task_config.task_list, task_list, got_task)
+        if not got_task:
+            self.poll_stats.increment('empty_polls')
+            return None
+        self.poll_stats.increment('tasks')
+
+        deadline = Deadline(self.start_to_close_timeout)
+        parent, input = tracing.extract(results['input'])
+        if self.tracer is not None:
+            self._received_task(
+                'poll_for_activity_task',
+                results['taskToken'],
+                parent,
+                start,
+                dict(activity_id=results['activityId'], activity_type=results['activityType']['name']),
+            )
 
-        return ActivityTask(
+        task = ActivityTask(
             activity_id=results['activityId'],
             type=results['activityType']['name'],
             version=results['activityType']['version'],
-            input=results['input'],
+            input=input,
             task_token=results['taskToken'],
             workflow_id=results['workflowExecution']['workflowId'],
             workflow_run_id=results['workflowExecution']['runId'],
         )
+        task.deadline = deadline
+        return task
+
+    def count_pending(self):
+        """Returns how many activity tasks are waiting to be polled, summed over every shard of the task list.
+
+        Passthrough to :meth:`~SWF.Client.count_pending_activity_tasks`. The count is approximate.
 
-    def finish(self, task_token, result):
+        :rtype: int
+        """
+        return sum(
+            self._call(
+                'count_pending_activity_tasks',
+                domain=self.activity_task_config.domain,
+                taskList={
+                    'name': task_list,
+                },
+            )['count']
+            for task_list in polled_task_lists(self.activity_task_config.task_list)
+        )
+
+    def finish(self, task_token, result, deadline=None):
         """Responds to an activity task with a success.
 
         Passthrough to :meth:`~SWF.Client.respond_activity_task_completed`.
@@ -84,15 +190,36 @@ class ActivityTaskClient(object):
         :type task_token: string
         :param result: The result of the executed activity task.
         :type result: string
+        :param deadline: Optional. Epoch seconds after which the response is no longer retried,
+                         e.g. when the task's start-to-close timeout elapses.
+        :type deadline: float
         :return: None
         :rtype: NoneType
         """
-        self.boto_client.respond_activity_task_completed(
-            result=result,
-            taskToken=task_token,
-        )
+        with self._span('respond_activity_task_completed', parent=self._task_context(task_token)) as span:
+            if span is not None:
+                result = tracing.inject(result, span.context)
+            self._call(
+                'respond_activity_task_completed',
+                deadline=deadline,
+                result=result,
+                taskToken=task_token,
+            )
+
+    def hand_back(self, task_token, details=None):
+        """Gives back an activity task that was received but won't be worked on, e.g. because the worker is
+        shutting down, by failing it with :data:`HAND_BACK_REASON`.
+
+        :param task_token: The task_token returned from :meth:`~py_swf.clients.activity_task.ActivityTaskClient.poll`.
+        :type task_token: string
+        :param details: Optional. Why the task was handed back.
+        :type details: string
+        :return: None
+        :rtype: NoneType
+        """
+        self.fail(task_token, HAND_BACK_REASON, details=details)
 
-    def fail(self, task_token, reason, details=None):
+    def fail(self, task_token, reason, details=None, deadline=None):
         """Responds to an activity task with a failure.
 
         Passthrough to :meth:`~SWF.Client.respond_activity_task_failed`.
@@ -103,6 +230,9 @@ class ActivityTaskClient(object):
         :type reason: string
         :param details: Optional. Detailed information about the failure
         :type details: string
+        :param deadline: Optional. Epoch seconds after which the response is no longer retried,
+                         e.g. when the task's start-to-close timeout elapses.
+        :type deadline: float
         :return: None
         :rtype: NoneType
         """
@@ -112,7 +242,10 @@ class ActivityTaskClient(object):
         if details is not None:
             kwargs["details"] = details
 
-        self.boto_client.respond_activity_task_failed(
-            taskToken=task_token,
-            **kwargs
-        )
+        with self._span('respond_activity_task_failed', parent=self._task_context(task_token)):
+            self._call(
+                'respond_activity_task_failed',
+                deadline=deadline,
+                taskToken=task_token,
+                **kwargs
+            )
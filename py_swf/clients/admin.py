@@ -3,11 +3,29 @@ from __future__ import absolute_import
 from __future__ import unicode_literals
 
 import functools
+import io
+import json
+import os
+from collections import namedtuple
 
-from botocore.exceptions import ClientError
+from py_swf._botocore import client_error
+from py_swf.clients.base import BaseClient
 
 
-__all__ = ['WorkflowRegistrar']
+__all__ = ['WorkflowRegistrar', 'RegistrationResult']
+
+
+RegistrationResult = namedtuple('RegistrationResult', 'registered already_registered deprecated')
+"""The outcome of :meth:`~py_swf.clients.admin.WorkflowRegistrar.register_manifest`.
+
+registered (list) -- Keys of the domains and types that were registered by this call.
+already_registered (list) -- Keys of the domains and types that were found in the cache or in SWF.
+deprecated (list) -- Keys of the domains and types that were found deprecated in SWF. They can't be registered again,
+                     nor used to start anything.
+
+Keys are tuples of ``('domain', name)``, ``('activity_type', domain, name, version)``
+or ``('workflow_type', domain, name, version)``.
+"""
 
 
 def idempotent_create(func):
@@ -15,7 +33,7 @@ def idempotent_create(func):
     def wrapped(*args, **kwargs):
         try:
             func(*args, **kwargs)
-        except ClientError as e:
+        except client_error() as e:
             if e.response['Error']['Code'] not in set([
                 'DomainAlreadyExistsFault',
                 'TypeAlreadyExistsFault',
@@ -24,16 +42,22 @@ def idempotent_create(func):
     return wrapped
 
 
-class WorkflowRegistrar(object):
+class WorkflowRegistrar(BaseClient):
     """A client that allows creation of SWF environments.
     Allows you to create domains, task lists, workflow types, and activity types.
 
     :param boto_client: A raw SWF boto3 client.
     :type boto_client: :class:`~SWF.Client`
+    :param retry_policy: Optional. Retries calls that fail because of throttling or transient errors.
+    :type retry_policy: :class:`~py_swf.retry.RetryPolicy`
+    :param instrumentation: Optional. Receives the latency and outcome of every SWF call.
+    :type instrumentation: :class:`~py_swf.instrumentation.Instrumentation`
     """
 
-    def __init__(self, boto_client):
+    def __init__(self, boto_client, retry_policy=None, instrumentation=None):
         self.boto_client = boto_client
+        self.retry_policy = retry_policy
+        self.instrumentation = instrumentation
 
     @idempotent_create
     def register_domain(self, name, description=None, retention=90):
@@ -62,7 +86,8 @@ class WorkflowRegistrar(object):
         if description is not None:
             kwargs['description'] = description
 
-        self.boto_client.register_domain(
+        self._call(
+            'register_domain',
             **kwargs
         )
 
@@ -134,7 +159,8 @@ class WorkflowRegistrar(object):
         if description is not None:
             kwargs['description'] = description
 
-        self.boto_client.register_activity_type(
+        self._call(
+            'register_activity_type',
             **kwargs
         )
 
@@ -204,6 +230,199 @@ class WorkflowRegistrar(object):
         if description is not None:
             kwargs["description"] = description
 
-        self.boto_client.register_workflow_type(
+        self._call(
+            'register_workflow_type',
             **kwargs
         )
+
+    def register_manifest(self, manifest, cache_path=None, max_workers=8):
+        """Registers every domain, activity type and workflow type declared in a manifest.
+
+        Existing types are listed once per domain and only the missing ones are registered, concurrently.
+        Deprecated domains and types are reported apart, since SWF won't register them again.
+        When ``cache_path`` is given, everything known to be registered is remembered there, so that
+        a later call with the same manifest makes no SWF calls at all.
+
+        The manifest is a dict (or the path to a JSON file containing one) of the form::
+
+            {
+                "domains": [{"name": "my_domain", "retention": 30}],
+                "activity_types": [{"domain": "my_domain", "name": "resize", "version": "1.0"}],
+                "workflow_types": [{"domain": "my_domain", "name": "thumbnails", "version": "1.0"}]
+            }
+
+        Each entry takes the keyword arguments of :meth:`register_domain`, :meth:`register_activity_type` or
+        :meth:`register_workflow_type` respectively.
+
+        :param manifest: The declared domains and types, or the path to a JSON file containing them.
+        :type manifest: dict or string
+        :param cache_path: Optional. A local file remembering what has already been registered.
+        :type cache_path: string
+        :param max_workers: The maximum number of concurrent registration calls.
+        :type max_workers: int
+        :return: What was registered, what already existed and what is deprecated.
+        :rtype: RegistrationResult
+        """
+        if not isinstance(manifest, dict):
+            with io.open(manifest, encoding='utf-8') as f:
+                manifest = json.load(f)
+
+        cached = _load_registration_cache(cache_path)
+
+        entries = []
+        for kind, key_fields in _MANIFEST_SECTIONS:
+            for kwargs in manifest.get(kind + 's', ()):
+                key = (kind,) + tuple(kwargs[field] for field in key_fields)
+                entries.append((key, kwargs))
+
+        already_registered = [key for key, _ in entries if key in cached]
+        missing = [(key, kwargs) for key, kwargs in entries if key not in cached]
+        deprecated = []
+
+        if missing:
+            scopes = set(_listing_scope(key) for key, _ in missing)
+            existing = self._list_existing(scopes & set([_DOMAINS_SCOPE]))
+            # SWF can't list the types of a domain that doesn't exist yet: they are all missing.
+            new_domains = set(key[1] for key, _ in missing if key[0] == 'domain' and key not in existing)
+            existing.update(self._list_existing(
+                set(scope for scope in scopes if scope != _DOMAINS_SCOPE and scope[1] not in new_domains),
+            ))
+            already_registered.extend(key for key, _ in missing if existing.get(key) == 'REGISTERED')
+            deprecated = [key for key, _ in missing if existing.get(key) == 'DEPRECATED']
+            missing = [(key, kwargs) for key, kwargs in missing if key not in existing]
+
+        # Types can only be registered once their domain exists.
+        domains = [entry for entry in missing if entry[0][0] == 'domain']
+        types = [entry for entry in missing if entry[0][0] != 'domain']
+        registered = []
+        error = None
+        for batch in (domains, types):
+            if batch and error is None:
+                succeeded, error = self._register_concurrently(batch, max_workers)
+                registered.extend(succeeded)
+
+        # Even when some registrations failed, the others needn't be made again.
+        if cache_path is not None:
+            _save_registration_cache(cache_path, cached.union(already_registered, registered))
+
+        if error is not None:
+            raise error
+
+        return RegistrationResult(registered=registered, already_registered=already_registered, deprecated=deprecated)
+
+    def _list_existing(self, scopes):
+        """Lists the domains, and the types of the given domains, that exist in SWF.
+
+        :param scopes: ``('domain',)`` to list domains, and ``(kind, domain)`` to list the types of a domain.
+        :return: A dict of registration keys to their registration status, ``'REGISTERED'`` or ``'DEPRECATED'``.
+        """
+        existing = {}
+        for scope in scopes:
+            for status in _REGISTRATION_STATUSES:
+                if scope == _DOMAINS_SCOPE:
+                    for info in self._paginate('list_domains', 'domainInfos', registrationStatus=status):
+                        existing[('domain', info['name'])] = status
+                else:
+                    kind, domain = scope
+                    for key in self._list_types(kind, domain, status):
+                        existing[key] = status
+        return existing
+
+    def _list_types(self, kind, domain, status):
+        type_field = _TYPE_INFO_FIELDS[kind]
+        try:
+            return [
+                (kind, domain, info[type_field]['name'], info[type_field]['version'])
+                for info in self._paginate('list_{0}s'.format(kind), 'typeInfos', domain=domain, registrationStatus=status)
+            ]
+        except client_error() as e:
+            # A domain in neither the manifest nor SWF has no types. Registering them raises the fault instead.
+            if e.response['Error']['Code'] != 'UnknownResourceFault':
+                raise
+            return []
+
+    def _paginate(self, api_name, items_field, **kwargs):
+        while True:
+            results = self._call(api_name, maximumPageSize=1000, **kwargs)
+            for item in results[items_field]:
+                yield item
+            next_page_token = results.get('nextPageToken', None)
+            if next_page_token is None:
+                break
+            kwargs['nextPageToken'] = next_page_token
+
+    def _register_concurrently(self, entries, max_workers):
+        """Registers every entry, even when some of them fail.
+
+        :return: The keys that were registered, and the first error raised, or None.
+        """
+        from multiprocessing.pool import ThreadPool
+
+        register_by_kind = dict(
+            domain=self.register_domain,
+            activity_type=self.register_activity_type,
+            workflow_type=self.register_workflow_type,
+        )
+
+        def register(entry):
+            key, kwargs = entry
+            register_by_kind[key[0]](**kwargs)
+            return key
+
+        pool = ThreadPool(max(1, min(max_workers, len(entries))))
+        try:
+            results = [pool.apply_async(register, (entry,)) for entry in entries]
+            registered = []
+            error = None
+            for result in results:
+                try:
+                    registered.append(result.get())
+                except Exception as e:
+                    if error is None:
+                        error = e
+            return registered, error
+        finally:
+            pool.close()
+            pool.join()
+
+
+_MANIFEST_SECTIONS = (
+    ('domain', ('name',)),
+    ('activity_type', ('domain', 'name', 'version')),
+    ('workflow_type', ('domain', 'name', 'version')),
+)
+
+_DOMAINS_SCOPE = ('domain',)
+
+_REGISTRATION_STATUSES = ('REGISTERED', 'DEPRECATED')
+
+_TYPE_INFO_FIELDS = dict(
+    activity_type='activityType',
+    workflow_type='workflowType',
+)
+
+
+def _listing_scope(key):
+    """Domains are listed globally while types are listed per domain."""
+    kind = key[0]
+    if kind == 'domain':
+        return _DOMAINS_SCOPE
+    return (kind, key[1])
+
+
+def _load_registration_cache(cache_path):
+    if cache_path is None or not os.path.exists(cache_path):
+        return set()
+    try:
+        with io.open(cache_path, encoding='utf-8') as f:
+            return set(tuple(key) for key in json.load(f))
+    except ValueError:
+        # A corrupt cache only costs us the registration calls it would have saved.
+        return set()
+
+
+def _save_registration_cache(cache_path, keys):
+    temporary_path = '{0}.{1}.tmp'.format(cache_path, os.getpid())
+    with io.open(temporary_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(sorted(list(key) for key in keys)))
+    os.rename(temporary_path, cache_path)
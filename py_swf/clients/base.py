@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import contextlib
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from py_swf import instrumentation as instr
+from py_swf._botocore import client_error
+from py_swf._botocore import read_timeout
+from py_swf.retry import THROTTLING_ERROR_CODES
+
+
+log = logging.getLogger(__name__)
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+class BaseClient(object):
+    """Plumbing shared by the py_swf clients for making calls through an SWF boto3 client.
+
+    Subclasses set ``boto_client``, ``retry_policy``, ``instrumentation`` and ``tracer``, and make every SWF call
+    through :meth:`_call`.
+    """
+
+    boto_client = None
+    retry_policy = None
+    instrumentation = None
+    tracer = None
+
+    def _call(self, api_name, deadline=None, **kwargs):
+        """Calls ``api_name`` on the boto3 client, applying the retry policy and instrumentation if there are any.
+
+        :param api_name: Name of the :class:`~SWF.Client` method to call.
+        :type api_name: string
+        :param deadline: Optional. Epoch seconds after which the call is no longer retried.
+        :type deadline: float
+        """
+        if self.instrumentation is None:
+            return self._call_with_retries(api_name, deadline, kwargs)
+
+        start = _timer()
+        try:
+            response = self._call_with_retries(api_name, deadline, kwargs)
+        except Exception as e:
+            self._record(api_name, kwargs, _timer() - start, None, _outcome_of_error(e))
+            raise
+
+        if api_name.startswith('poll_for_') and not response.get('taskToken'):
+            outcome = instr.OUTCOME_NO_TASK
+        else:
+            outcome = instr.OUTCOME_OK
+        self._record(api_name, kwargs, _timer() - start, response, outcome)
+        return response
+
+    @contextlib.contextmanager
+    def _span(self, name, parent=None, attributes=None):
+        """Runs a block in a span if the client has a tracer. Yields the span, or None without a tracer."""
+        if self.tracer is None:
+            yield None
+            return
+        with self.tracer.span(name, parent=parent, attributes=attributes) as span:
+            yield span
+
+    def _received_task(self, name, task_token, parent, start, attributes):
+        """Records the span of a poll that received a task, and remembers it as the parent of the task's work."""
+        span = self.tracer.start_span(name, parent=parent, attributes=attributes, start=start)
+        span.finish()
+        self.tracer.track(task_token, span.context)
+
+    def _task_context(self, task_token):
+        """Forgets and returns the trace context of a task being responded to."""
+        if self.tracer is None:
+            return None
+        return self.tracer.untrack(task_token)
+
+    def _iter_tasks(self, shutdown, max_polls, **poll_kwargs):
+        """Yields the tasks returned by ``_poll_once``, skipping polls that returned None."""
+        polls = 0
+        while (shutdown is None or not shutdown.is_set()) and (max_polls is None or polls < max_polls):
+            polls += 1
+            task = self._poll_once(**poll_kwargs)
+            if task is not None:
+                yield task
+
+    def _call_with_retries(self, api_name, deadline, kwargs):
+        func = getattr(self.boto_client, api_name)
+        if self.retry_policy is None:
+            return func(**kwargs)
+        return self.retry_policy.call(func, api_name, deadline=deadline, **kwargs)
+
+    def _record(self, api_name, kwargs, duration, response, outcome):
+        """Records a call with the instrumentation. Errors are logged: they never change what the call returns."""
+        try:
+            task_list = kwargs.get('taskList')
+            events = response.get('events') if response is not None else None
+            self.instrumentation.record(instr.CallRecord(
+                api_name=api_name,
+                domain=kwargs.get('domain'),
+                task_list=task_list['name'] if task_list else None,
+                duration=duration,
+                request_bytes=instr.request_size(kwargs),
+                response_bytes=instr.response_size(response),
+                event_count=len(events) if events is not None else None,
+                outcome=outcome,
+            ))
+        except Exception:
+            log.exception('Failed to record a call to %s', api_name)
+
+
+class PollStats(object):
+    """Thread-safe counters of the polls made by a client.
+
+    The counters are:
+
+    * ``tasks``: polls that received a task.
+    * ``empty_polls``: polls that received a response without a task, e.g. because the long-poll expired.
+    * ``timed_out_polls``: polls that timed out on the client side before SWF responded.
+    * ``handed_back``: tasks received by a helper poll once no caller was waiting for them, handed back to SWF.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def increment(self, counter, value=1):
+        with self._lock:
+            self._counts[counter] += value
+
+    def get(self, counter):
+        with self._lock:
+            return self._counts.get(counter, 0)
+
+    def snapshot(self):
+        """Returns a copy of every counter as a dict."""
+        with self._lock:
+            return dict(self._counts)
+
+
+def _outcome_of_error(error):
+    if isinstance(error, read_timeout()):
+        return instr.OUTCOME_NO_TASK
+    if isinstance(error, client_error()) and error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+        return instr.OUTCOME_THROTTLED
+    return instr.OUTCOME_ERROR
@@ -2,55 +2,167 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
 from collections import namedtuple
+from collections import OrderedDict
 
-from botocore.vendored.requests.exceptions import ReadTimeout
-
+from py_swf import tracing
+from py_swf._encoding import attributes_key
+from py_swf._encoding import get_field
+from py_swf._botocore import read_timeout
+from py_swf.clients.base import BaseClient
+from py_swf.clients.base import PollStats
+from py_swf.deadline import Deadline
+from py_swf.deadline import task_start_to_close_timeout
 from py_swf.errors import NoTaskFound
+from py_swf.interning import default_string_table
+from py_swf.sharding import home_task_list
+from py_swf.sharding import polled_task_lists
+from py_swf.sharding import poller_task_list
+from py_swf.sharding import producer_task_list
+from py_swf.sharding import report_poll
+
+
+__all__ = ['DecisionClient', 'DecisionTask', 'host_task_list']
+
+
+log = logging.getLogger(__name__)
+
+
+# How many tasks polled from retired shards are remembered until they are responded to.
+_MAX_TRACKED_HOMES = 10000
+
+# Marks the activities routed to a sticky task list, so that they can be scheduled again on the shared one.
+_STICKY_ACTIVITY_CONTROL = 'py_swf.sticky_activity'
+
+
+class DecisionTask(namedtuple('DecisionTask', 'events task_token workflow_id workflow_run_id workflow_type')):
+    """Contains the metadata to execute a decision task.
+
+    See the response syntax in :meth:`~SWF.Client.poll_for_decision_task`.
+
+    :ivar deadline: When the task times out, or None if it wasn't polled. Not one of the tuple's fields.
+    :vartype deadline: :class:`~py_swf.deadline.Deadline`
+    :ivar polled_from: The task list the task was polled from, or None if it wasn't polled. Not one of the tuple's
+                       fields.
+    :vartype polled_from: string
+    :ivar next_page_token: Continues the poll that received the task with its older events, or None if the task
+                           came with the whole history. Not one of the tuple's fields.
+    :vartype next_page_token: string
+    """
 
+    deadline = None
+    polled_from = None
+    next_page_token = None
 
-__all__ = ['DecisionClient', 'DecisionTask']
 
+# The namedtuple classes of nametuplefy, by field names. Sharing them saves building a class per dict, and lets
+# pickle rebuild events by their field names, since the classes can't be imported.
+_dict_classes = {}
 
-DecisionTask = namedtuple('DecisionTask', 'events task_token workflow_id workflow_run_id workflow_type')
-"""Contains the metadata to execute a decision task.
 
-See the response syntax in :meth:`~SWF.Client.poll_for_decision_task`.
-"""
+def _dict_class(fields):
+    Dict = _dict_classes.get(fields)
+    if Dict is None:
+        Dict = namedtuple('Dict', fields)
+        Dict.__reduce__ = _reduce_dict
+        Dict = _dict_classes.setdefault(fields, Dict)
+    return Dict
 
 
-def nametuplefy(thing):
-    """Recursively turns a dict into namedtuples."""
+def _reduce_dict(self):
+    return _rebuild_dict, (self._fields, tuple(self))
+
+
+def _rebuild_dict(fields, values):
+    return _dict_class(fields)(*values)
+
+
+def nametuplefy(thing, string_table=None):
+    """Recursively turns a dict into namedtuples. The namedtuples can be pickled.
+
+    :param string_table: Optional. Interns the strings of ``thing``.
+    :type string_table: :class:`~py_swf.interning.StringTable`
+    """
     if type(thing) == dict:
         # Only supports string keys
-        Dict = namedtuple('Dict', ' '.join(thing.keys()))
+        Dict = _dict_class(tuple(thing.keys()))
 
         nametuplefied_children = {}
 
         for k, v in thing.items():
-            nametuplefied_children[k] = nametuplefy(v)
+            nametuplefied_children[k] = nametuplefy(v, string_table)
 
         return Dict(**nametuplefied_children)
     if type(thing) == list:
-        return list(map(nametuplefy, thing))
+        return [nametuplefy(value, string_table) for value in thing]
+    if string_table is not None:
+        return string_table.intern(thing)
     else:
         return thing
 
 
-class DecisionClient(object):
+def _decode(thing, use_raw_event_history, intern_strings):
+    """Decodes raw events, or a single raw event, the way a poll or a walk was asked to."""
+    string_table = default_string_table if intern_strings else None
+    if use_raw_event_history:
+        return thing if string_table is None else string_table.intern_raw(thing)
+    return nametuplefy(thing, string_table)
+
+
+class DecisionClient(BaseClient):
     """A client that provides a pythonic API for polling and responding to decision tasks through an SWF boto3 client.
 
     :param decision_config: Contains SWF values commonly used when making SWF api calls.
     :type decision_config: :class:`~py_swf.config_definitions.DecisionConfig`
     :param boto_client: A raw SWF boto3 client.
     :type boto_client: :class:`~SWF.Client`
+    :param retry_policy: Optional. Retries calls that fail because of throttling or transient errors.
+    :type retry_policy: :class:`~py_swf.retry.RetryPolicy`
+    :param instrumentation: Optional. Receives the latency and outcome of every SWF call.
+    :type instrumentation: :class:`~py_swf.instrumentation.Instrumentation`
+    :param tracer: Optional. Propagates trace context through task payloads and records spans of SWF calls.
+    :type tracer: :class:`~py_swf.tracing.Tracer`
+    :param sticky_config: Optional. Routes the next decision tasks of the runs this client decides back to it, so
+                          that state it keeps about them is reused. Polls then wait on both the sticky task list and
+                          the decision config's, on helper threads, and return the first task received. Activities
+                          it routes are scheduled again by :func:`sticky_activity_fallbacks` if they aren't started.
+    :type sticky_config: :class:`~py_swf.config_definitions.StickyConfig`
     """
 
-    def __init__(self, decision_config, boto_client):
+    def __init__(
+        self,
+        decision_config,
+        boto_client,
+        retry_policy=None,
+        instrumentation=None,
+        tracer=None,
+        sticky_config=None,
+    ):
         self.decision_config = decision_config
         self.boto_client = boto_client
+        self.retry_policy = retry_policy
+        self.instrumentation = instrumentation
+        self.tracer = tracer
+        self.sticky_config = sticky_config
+        self.poll_stats = PollStats()
+        # Sticky polling: callers waiting for a task, responses not taken yet, and the helper threads polling.
+        self._poll_condition = threading.Condition()
+        self._waiting = 0
+        self._responses = deque()
+        self._sticky_polling = False
+        self._shared_polls = 0
+        self._homes_lock = threading.Lock()
+        # Task token -> the shard its workflow moves to, for tasks polled from a retired shard.
+        self._homes = OrderedDict()
 
-    def poll(self, identity=None, use_raw_event_history=False):
+    def poll(self, identity=None, use_raw_event_history=False, intern_strings=False):
         """Opens a connection to AWS and long-polls for decision tasks.
         When a decision is available, this function will return with exactly one decision task to execute.
         Only returns a contiguous subset of the most recent events.
@@ -63,15 +175,80 @@ class DecisionClient(object):
         :param use_raw_event_history: Whether to use the raw dictionary event history returned from AWS.
                                       Otherwise attempts to turn dictionaries into namedtuples recursively.
         :type use_raw_event_history: bool
+        :param intern_strings: Whether events share a single copy of their repeated strings, to hold large histories
+                               in less memory. See :mod:`py_swf.interning`.
+        :type intern_strings: bool
         :return: A decision task to execute.
         :rtype: DecisionTask
         :raises py_swf.errors.NoTaskFound: Raised when polling for a decision task times out without receiving any tasks.
         """
+        task = self._poll_once(
+            identity=identity,
+            use_raw_event_history=use_raw_event_history,
+            intern_strings=intern_strings,
+        )
+        if task is None:
+            raise NoTaskFound('Received no decision task')
+        return task
+
+    def iter_tasks(self, identity=None, use_raw_event_history=False, shutdown=None, max_polls=None, intern_strings=False):
+        """Long-polls for decision tasks in a loop, and yields each one received.
+
+        Polls that time out or receive an incomplete response are skipped, and counted in :attr:`poll_stats`.
+
+        :param identity: A freeform text that identifies the client that performed the longpoll. Useful for debugging history.
+        :type identity: string
+        :param use_raw_event_history: Whether to use the raw dictionary event history returned from AWS.
+                                      Otherwise attempts to turn dictionaries into namedtuples recursively.
+        :type use_raw_event_history: bool
+        :param shutdown: Optional. Stops the iteration once set, after the poll in progress.
+        :type shutdown: :class:`threading.Event`
+        :param max_polls: Optional. Stops the iteration after this many polls, whether they received tasks or not.
+        :type max_polls: int
+        :param intern_strings: Whether events share a single copy of their repeated strings, to hold large histories
+                               in less memory. See :mod:`py_swf.interning`.
+        :type intern_strings: bool
+        :return: A generator of decision tasks.
+        :rtype: collections.Iterable
+        """
+        return self._iter_tasks(
+            shutdown,
+            max_polls,
+            identity=identity,
+            use_raw_event_history=use_raw_event_history,
+            intern_strings=intern_strings,
+        )
+
+    def poll_forever(self, identity=None, use_raw_event_history=False, shutdown=None, intern_strings=False):
+        """Yields decision tasks as they are received, until ``shutdown`` is set. See :meth:`iter_tasks`."""
+        return self.iter_tasks(
+            identity=identity,
+            use_raw_event_history=use_raw_event_history,
+            shutdown=shutdown,
+            intern_strings=intern_strings,
+        )
+
+    def _poll_once(self, identity=None, use_raw_event_history=False, intern_strings=False):
+        if self.sticky_config is not None:
+            task_list, sticky, start, results = self._poll_sticky_and_shared(identity)
+        else:
+            task_list = poller_task_list(self.decision_config.task_list)
+            sticky = False
+            start = time.time()
+            results = self._poll_task_list(task_list, identity)
+        if results is None:
+            report_poll(self.decision_config.task_list, task_list, False)
+            self.poll_stats.increment('timed_out_polls')
+            return None
+        return self._received(task_list, sticky, start, results, use_raw_event_history, intern_strings)
+
+    def _poll_task_list(self, task_list, identity):
+        """Long-polls one task list. Returns the response, or None if the poll timed out on the client side."""
         kwargs = dict(
             domain=self.decision_config.domain,
             reverseOrder=True,
             taskList={
-                'name': self.decision_config.task_list,
+                'name': task_list,
             },
         )
 
@@ -80,27 +257,163 @@ class DecisionClient(object):
             kwargs['identity'] = identity
 
         try:
-            results = self.boto_client.poll_for_decision_task(
+            return self._call(
+                'poll_for_decision_task',
                 **kwargs
             )
-        except ReadTimeout as e:
-            raise NoTaskFound(e)
+        except read_timeout():
+            return None
+
+    def _poll_sticky_and_shared(self, identity):
+        """Waits for a task from the sticky task list or the shared one, whichever comes first.
+
+        Helper threads long-poll the sticky task list, once, and the shared one, once per caller waiting, so that a
+        sticky task doesn't wait for a shared long-poll to expire. They keep polling as long as callers wait, rather
+        than a thread being started per call. A task received once no caller is left waiting for it is handed back.
+
+        :return: The task list polled, whether it is the sticky one, when the poll started, and the response or None.
+        """
+        with self._poll_condition:
+            self._waiting += 1
+            try:
+                while not self._responses:
+                    if not self._sticky_polling:
+                        self._sticky_polling = True
+                        self._start_poll_thread(True, identity)
+                    while self._shared_polls < self._unanswered():
+                        self._shared_polls += 1
+                        self._start_poll_thread(False, identity)
+                    self._poll_condition.wait()
+                response = self._responses.popleft()
+            finally:
+                self._waiting -= 1
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def _unanswered(self):
+        """Returns how many callers wait for a response that isn't queued yet. Called holding the condition."""
+        return self._waiting - len(self._responses)
+
+    def _start_poll_thread(self, sticky, identity):
+        thread = threading.Thread(target=self._poll_for_callers, args=(sticky, identity), name='py_swf-decision-poll')
+        thread.daemon = True
+        thread.start()
+
+    def _poll_for_callers(self, sticky, identity):
+        """Long-polls the sticky or the shared task list while callers wait, and queues the responses for them.
+
+        Empty sticky polls aren't queued: a caller waiting gets the task or the empty response of a shared poll.
+        """
+        while True:
+            if sticky:
+                task_list = self.sticky_config.task_list
+            else:
+                task_list = poller_task_list(self.decision_config.task_list)
+            start = time.time()
+            results = None
+            try:
+                results = self._poll_task_list(task_list, identity)
+                response = (task_list, sticky, start, results)
+            except Exception as e:
+                response = e
+            got_task = bool(results and results.get('taskToken'))
+            if sticky and not isinstance(response, Exception) and not got_task:
+                self.poll_stats.increment('empty_polls' if results is not None else 'timed_out_polls')
+                response = None
+
+            leftover = None
+            with self._poll_condition:
+                if response is not None:
+                    if self._unanswered() > 0:
+                        self._responses.append(response)
+                        self._poll_condition.notify()
+                    elif got_task:
+                        leftover = results['taskToken']
+                if sticky:
+                    done = self._unanswered() <= 0
+                    if done:
+                        self._sticky_polling = False
+                else:
+                    # This poll is still counted: the others in flight are enough once there are as many as callers.
+                    done = self._shared_polls > self._unanswered()
+                    if done:
+                        self._shared_polls -= 1
+            if leftover is not None:
+                self._hand_back_leftover(leftover)
+            if done:
+                return
+
+    def _hand_back_leftover(self, task_token):
+        """Hands back a task received once no caller was left waiting, e.g. after shutting down."""
+        self.poll_stats.increment('handed_back')
+        try:
+            self.hand_back(task_token)
+        except Exception:
+            log.exception('Failed to hand back a decision task received once no caller was waiting')
 
+    def _received(self, task_list, sticky, start, results, use_raw_event_history, intern_strings):
+        """Turns a poll response into a task, or returns None if the poll received nothing."""
         # Sometimes SWF gives us an incomplete response, ignore these.
-        if not results.get('taskToken', None):
-            raise NoTaskFound('Received results with no taskToken')
+        got_task = bool(results.get('taskToken', None))
+        report_poll(self.decision_config.task_list, task_list, got_task)
+        if not got_task:
+            self.poll_stats.increment('empty_polls')
+            return None
+        self.poll_stats.increment('tasks')
 
         events = results['events']
-        if not use_raw_event_history:
-            events = nametuplefy(events)
+        deadline = Deadline(task_start_to_close_timeout(events))
+        parent, events = tracing.extract_from_events(events)
+        if self.tracer is not None:
+            self._received_task(
+                'poll_for_decision_task',
+                results['taskToken'],
+                parent,
+                start,
+                dict(workflow_id=results['workflowExecution']['workflowId'], event_count=len(events)),
+            )
+        events = _decode(events, use_raw_event_history, intern_strings)
 
-        return DecisionTask(
+        task = DecisionTask(
             events=events,
             task_token=results['taskToken'],
             workflow_id=results['workflowExecution']['workflowId'],
             workflow_run_id=results['workflowExecution']['runId'],
             workflow_type=results['workflowType'],
         )
+        task.deadline = deadline
+        task.polled_from = task_list
+        task.next_page_token = results.get('nextPageToken')
+        home = None if sticky else home_task_list(self.decision_config.task_list, task_list, task.workflow_id)
+        if home is not None:
+            with self._homes_lock:
+                self._homes[task.task_token] = home
+                while len(self._homes) > _MAX_TRACKED_HOMES:
+                    self._homes.popitem(last=False)
+        return task
+
+    def count_pending(self):
+        """Returns how many decision tasks are waiting to be polled, summed over every shard of the task list and
+        the sticky task list, if any.
+
+        Passthrough to :meth:`~SWF.Client.count_pending_decision_tasks`. The count is approximate.
+
+        :rtype: int
+        """
+        task_lists = polled_task_lists(self.decision_config.task_list)
+        if self.sticky_config is not None:
+            task_lists.append(self.sticky_config.task_list)
+        return sum(
+            self._call(
+                'count_pending_decision_tasks',
+                domain=self.decision_config.domain,
+                taskList={
+                    'name': task_list,
+                },
+            )['count']
+            for task_list in task_lists
+        )
 
     def walk_execution_history(
         self,
@@ -109,12 +422,25 @@ class DecisionClient(object):
         reverse_order=True,
         use_raw_event_history=False,
         maximum_page_size=1000,
+        predicate=None,
+        stop=None,
+        intern_strings=False,
     ):
         """Lazily walks through the entire workflow history for a given workflow_id. This will make successive calls
         to SWF on demand when pagination is needed.
 
         See :meth:`~SWF.Client.get_workflow_execution_history` for more information.
 
+        ``predicate`` and ``stop`` are called with raw dictionary events, before they are turned into namedtuples, so
+        that events filtered out are never converted, and no page is requested past the stop condition::
+
+            decision_client.walk_execution_history(
+                workflow_id,
+                workflow_run_id,
+                predicate=event_types('ActivityTaskCompleted', 'ActivityTaskFailed'),
+                stop=stop_at_event_types('DecisionTaskCompleted'),
+            )
+
         :param workflow_id: The workflow_id returned from :meth:`~py_swf.clients.decision.DecisionClient.poll`.
         :type identity: string
         :param workflow_run_id: The workflow_run_id returned from :meth:`~py_swf.clients.decision.DecisionClient.poll`.
@@ -126,10 +452,126 @@ class DecisionClient(object):
         :type use_raw_event_history: bool
         :param maximum_page_size: Passthru for maximumPageSize to :meth:`~SWF.Client.get_workflow_execution_history`
         :type identity: int
+        :param predicate: Optional. Called with each raw event. Only events it returns True for are yielded.
+        :param stop: Optional. Called with each raw event, filtered out or not. The walk ends after the first event it
+                     returns True for, which is yielded if it passes ``predicate``.
+        :param intern_strings: Whether events share a single copy of their repeated strings, to hold large histories
+                               in less memory. See :mod:`py_swf.interning`.
+        :type intern_strings: bool
 
         :return: A generator that returns successive elements in the workflow execution history.
         :rtype: collections.Iterable
         """
+        next_page_token = None
+        while True:
+            events, next_page_token = self.get_execution_history_page(
+                workflow_id,
+                workflow_run_id,
+                next_page_token=next_page_token,
+                reverse_order=reverse_order,
+                use_raw_event_history=True,
+                maximum_page_size=maximum_page_size,
+            )
+            for event in events:
+                if predicate is None or predicate(event):
+                    yield _decode(event, use_raw_event_history, intern_strings)
+                if stop is not None and stop(event):
+                    return
+
+            if next_page_token is None:
+                break
+
+    def walk_older_events(self, task, use_raw_event_history=False, predicate=None, stop=None, intern_strings=False):
+        """Lazily walks the events of a task's history older than the task's own, most recent first.
+
+        Pages are fetched by continuing the poll that received the task, so that none of the task's events are
+        fetched again, and nothing is fetched if the task came with the whole history. The history of tasks that
+        weren't polled, e.g. read back from a file, is walked with :meth:`walk_execution_history` instead.
+
+        :param task: A task returned by :meth:`poll`.
+        :type task: :class:`DecisionTask`
+        :param use_raw_event_history: Whether to use the raw dictionary event history returned from AWS.
+                                      Otherwise attempts to turn dictionaries into namedtuples recursively.
+        :type use_raw_event_history: bool
+        :param predicate: Optional. As for :meth:`walk_execution_history`.
+        :param stop: Optional. As for :meth:`walk_execution_history`.
+        :param intern_strings: Whether events share a single copy of their repeated strings. See
+                               :mod:`py_swf.interning`.
+        :type intern_strings: bool
+        :return: A generator of the older events.
+        :rtype: collections.Iterable
+        """
+        if task.polled_from is None:
+            if not task.events:
+                return
+            oldest_event_id = min(get_field(event, 'eventId') for event in task.events)
+            if oldest_event_id <= 1:
+                return
+            for event in self.walk_execution_history(
+                task.workflow_id,
+                task.workflow_run_id,
+                reverse_order=True,
+                use_raw_event_history=use_raw_event_history,
+                predicate=lambda event: event['eventId'] < oldest_event_id and (predicate is None or predicate(event)),
+                stop=stop,
+                intern_strings=intern_strings,
+            ):
+                yield event
+            return
+
+        next_page_token = task.next_page_token
+        while next_page_token is not None:
+            results = self._call(
+                'poll_for_decision_task',
+                domain=self.decision_config.domain,
+                taskList={
+                    'name': task.polled_from,
+                },
+                reverseOrder=True,
+                nextPageToken=next_page_token,
+            )
+            _, events = tracing.extract_from_events(results['events'])
+            for event in events:
+                if predicate is None or predicate(event):
+                    yield _decode(event, use_raw_event_history, intern_strings)
+                if stop is not None and stop(event):
+                    return
+            next_page_token = results.get('nextPageToken')
+
+    def get_execution_history_page(
+        self,
+        workflow_id,
+        workflow_run_id,
+        next_page_token=None,
+        reverse_order=True,
+        use_raw_event_history=False,
+        maximum_page_size=1000,
+        intern_strings=False,
+    ):
+        """Fetches a single page of the workflow history for a given workflow_id.
+
+        See :meth:`walk_execution_history`, which fetches every page in turn.
+
+        :param workflow_id: The workflow_id returned from :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+        :type workflow_id: string
+        :param workflow_run_id: The workflow_run_id returned from :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+        :type workflow_run_id: string
+        :param next_page_token: The token returned with the previous page, or None for the first page.
+        :type next_page_token: string
+        :param reverse_order: Passthru for reverseOrder to :meth:`~SWF.Client.get_workflow_execution_history`
+        :type reverse_order: bool
+        :param use_raw_event_history: Whether to use the raw dictionary event history returned from AWS.
+                                      Otherwise attempts to turn dictionaries into namedtuples recursively.
+        :type use_raw_event_history: bool
+        :param maximum_page_size: Passthru for maximumPageSize to :meth:`~SWF.Client.get_workflow_execution_history`
+        :type maximum_page_size: int
+        :param intern_strings: Whether events share a single copy of their repeated strings, to hold large histories
+                               in less memory. See :mod:`py_swf.interning`.
+        :type intern_strings: bool
+
+        :return: The events of the page, and the token of the next page, or None if it was the last one.
+        :rtype: tuple
+        """
         kwargs = dict(
             domain=self.decision_config.domain,
             reverseOrder=reverse_order,
@@ -139,24 +581,17 @@ class DecisionClient(object):
             ),
             maximumPageSize=maximum_page_size,
         )
-
-        while True:
-            results = self.boto_client.get_workflow_execution_history(
-                **kwargs
-            )
-            next_page_token = results.get('nextPageToken', None)
-            events = results['events']
-
-            for event in events:
-                if not use_raw_event_history:
-                    event = nametuplefy(event)
-                yield event
-
-            if next_page_token is None:
-                break
-
+        if next_page_token is not None:
             kwargs['nextPageToken'] = next_page_token
 
+        results = self._call(
+            'get_workflow_execution_history',
+            **kwargs
+        )
+        _, events = tracing.extract_from_events(results['events'])
+        events = _decode(events, use_raw_event_history, intern_strings)
+        return events, results.get('nextPageToken', None)
+
     def finish_decision_with_activity(
         self,
         task_token,
@@ -168,6 +603,8 @@ class DecisionClient(object):
         schedule_to_start_timeout=None,
         start_to_close_timeout=None,
         heartbeat_timeout=None,
+        deadline=None,
+        task_list=None,
     ):
         """Responds to a given decision task's task_token to schedule an activity task to run.
 
@@ -192,27 +629,80 @@ class DecisionClient(object):
         :param start_to_close_timeout: Override default timeout for activity from start to finish
         More info: http://docs.aws.amazon.com/amazonswf/latest/apireference/API_ScheduleActivityTaskDecisionAttributes.html
         :type identity: int
+        :param deadline: Optional. Epoch seconds after which the response is no longer retried,
+                         e.g. when the decision task's start-to-close timeout elapses.
+        :type deadline: float
+        :param task_list: Optional. The task list to schedule the activity on, instead of the decision config's, or
+                          the sticky task list if the sticky config routes activities. Activities routed there wait
+                          at most the sticky config's schedule-to-start timeout, see :func:`sticky_activity_fallbacks`.
+        :type task_list: string
         :return: None
         :rtype: NoneType
         """
-        activity_task = build_activity_task(
-            activity_id,
-            activity_name,
-            activity_version,
-            activity_input,
-            self.decision_config,
-            schedule_to_close_timeout,
-            schedule_to_start_timeout,
-            start_to_close_timeout,
-            heartbeat_timeout,
-        )
+        sticky = task_list is None and self.sticky_config is not None and self.sticky_config.route_activities
+        if sticky:
+            task_list = self.sticky_config.task_list
+            if schedule_to_start_timeout is None:
+                schedule_to_start_timeout = self.sticky_config.schedule_to_start_timeout
+            else:
+                schedule_to_start_timeout = min(schedule_to_start_timeout, self.sticky_config.schedule_to_start_timeout)
+        with self._span('respond_decision_task_completed', parent=self._task_context(task_token)) as span:
+            if span is not None:
+                activity_input = tracing.inject(activity_input, span.context)
+            activity_task = build_activity_task(
+                activity_id,
+                activity_name,
+                activity_version,
+                activity_input,
+                self.decision_config,
+                schedule_to_close_timeout,
+                schedule_to_start_timeout,
+                start_to_close_timeout,
+                heartbeat_timeout,
+                task_list=task_list,
+            )
+            if sticky:
+                activity_task['scheduleActivityTaskDecisionAttributes']['control'] = _STICKY_ACTIVITY_CONTROL
+
+            self._respond(
+                deadline,
+                taskToken=task_token,
+                decisions=[activity_task],
+            )
+
+    def finish_decision(self, task_token, decisions, execution_context=None, deadline=None):
+        """Responds to a given decision task's task_token with any list of decisions.
+
+        Passthrough to :meth:`~SWF.Client.respond_decision_task_completed`.
 
-        self.boto_client.respond_decision_task_completed(
+        :param task_token: The task_token returned from :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+        :type task_token: string
+        :param decisions: The decisions to make, e.g. built with :func:`build_activity_task`. May be empty.
+        :type decisions: list of dict
+        :param execution_context: Optional. Freeform text recorded in the DecisionTaskCompleted event.
+        :type execution_context: string
+        :param deadline: Optional. Epoch seconds after which the response is no longer retried,
+                         e.g. when the decision task's start-to-close timeout elapses.
+        :type deadline: float
+        :return: None
+        :rtype: NoneType
+        """
+        kwargs = dict(
             taskToken=task_token,
-            decisions=[activity_task],
+            decisions=decisions,
         )
+        if execution_context is not None:
+            kwargs['executionContext'] = execution_context
 
-    def finish_workflow(self, task_token, result):
+        with self._span('respond_decision_task_completed', parent=self._task_context(task_token)) as span:
+            if span is not None:
+                kwargs['decisions'] = [_inject_into_decision(decision, span.context) for decision in decisions]
+            self._respond(
+                deadline,
+                **kwargs
+            )
+
+    def finish_workflow(self, task_token, result, deadline=None):
         """Responds to a given decision task's task_token to finish and terminate the workflow.
 
         Passthrough to :meth:`~SWF.Client.respond_decision_task_completed`.
@@ -221,16 +711,266 @@ class DecisionClient(object):
         :type identity: string
         :param result: Freeform text that represents the final result of the workflow.
         :type identity: string
+        :param deadline: Optional. Epoch seconds after which the response is no longer retried,
+                         e.g. when the decision task's start-to-close timeout elapses.
+        :type deadline: float
         :return: None
         :rtype: NoneType
         """
         workflow_complete = build_workflow_complete(result)
-        self.boto_client.respond_decision_task_completed(
-            taskToken=task_token,
-            decisions=[workflow_complete],
+        with self._span('respond_decision_task_completed', parent=self._task_context(task_token)):
+            self._respond(
+                deadline,
+                taskToken=task_token,
+                decisions=[workflow_complete],
+            )
+
+    def continue_as_new(
+        self,
+        task_token,
+        input,
+        task_list=None,
+        execution_start_to_close_timeout=None,
+        task_start_to_close_timeout=None,
+        workflow_type_version=None,
+        tag_list=None,
+        deadline=None,
+    ):
+        """Responds to a given decision task's task_token to close the workflow and start a new run of it right away,
+        with the same workflow_id and an empty history.
+
+        Passthrough to :meth:`~SWF.Client.respond_decision_task_completed`. Activities and timers still open in the
+        closed run are abandoned.
+
+        :param task_token: The task_token returned from :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+        :type task_token: string
+        :param input: Freeform text given to the new run, e.g. the state carried over from the closed run.
+        :type input: string
+        :param task_list: Optional. The task list of the new run. Defaults to the task list of the closed run.
+        :type task_list: string
+        :param execution_start_to_close_timeout: Optional. Seconds. Defaults to the closed run's.
+        :type execution_start_to_close_timeout: int
+        :param task_start_to_close_timeout: Optional. Seconds. Defaults to the closed run's.
+        :type task_start_to_close_timeout: int
+        :param workflow_type_version: Optional. The version of the new run's workflow type. Defaults to the closed
+                                      run's.
+        :type workflow_type_version: string
+        :param tag_list: Optional. Defaults to the closed run's.
+        :type tag_list: list of string
+        :param deadline: Optional. Epoch seconds after which the response is no longer retried,
+                         e.g. when the decision task's start-to-close timeout elapses.
+        :type deadline: float
+        :return: None
+        :rtype: NoneType
+        """
+        decision = build_continue_as_new(
+            input,
+            task_list=task_list,
+            execution_start_to_close_timeout=execution_start_to_close_timeout,
+            task_start_to_close_timeout=task_start_to_close_timeout,
+            workflow_type_version=workflow_type_version,
+            tag_list=tag_list,
+        )
+        self.finish_decision(task_token, [decision], deadline=deadline)
+
+    def hand_back(self, task_token):
+        """Gives back a decision task that was received but won't be decided, e.g. because the decider is shutting
+        down, by starting a timer that fires immediately. SWF then schedules a new decision task on the workflow's
+        task list.
+
+        Passthrough to :meth:`~SWF.Client.respond_decision_task_completed`.
+
+        :param task_token: The task_token returned from :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+        :type task_token: string
+        :return: None
+        :rtype: NoneType
+        """
+        timer = build_start_timer('py_swf.hand_back.{0}'.format(uuid.uuid4().hex), 0)
+        with self._span('respond_decision_task_completed', parent=self._task_context(task_token)):
+            # Not sticky: the new decision task must go to a decider that isn't shutting down.
+            self._respond(None, sticky=False, taskToken=task_token, decisions=[timer])
+
+    def _respond(self, deadline, sticky=True, **kwargs):
+        with self._homes_lock:
+            home = self._homes.pop(kwargs['taskToken'], None)
+        if home is not None:
+            # Moves the workflow off a retired shard for good. Not sticky: once a sticky override times out, the
+            # decision task would go back to the retired shard.
+            kwargs['taskList'] = {'name': home}
+        elif sticky and self.sticky_config is not None:
+            kwargs['taskList'] = {'name': self.sticky_config.task_list}
+            kwargs['taskListScheduleToStartTimeout'] = str(self.sticky_config.schedule_to_start_timeout)
+        self._call(
+            'respond_decision_task_completed',
+            deadline=deadline,
+            **kwargs
         )
 
 
+def host_task_list(task_list, host=None):
+    """Names a task list only polled by this process, for :class:`~py_swf.config_definitions.StickyConfig`.
+
+    :param task_list: The shared task list to derive the name from.
+    :type task_list: string
+    :param host: Optional. Identifies the process. Defaults to the host name and process id.
+    :type host: string
+    """
+    if host is None:
+        host = '{0}-{1}'.format(socket.gethostname(), os.getpid())
+    return '{0}-{1}'.format(task_list, host)
+
+
+_TRACED_DECISION_TYPES = frozenset([
+    'ScheduleActivityTask',
+    'ContinueAsNewWorkflowExecution',
+    'StartChildWorkflowExecution',
+])
+
+
+def _inject_into_decision(decision, context):
+    """Returns a copy of a decision starting an activity or a workflow execution, whose input carries the trace
+    context.
+    """
+    if decision.get('decisionType') not in _TRACED_DECISION_TYPES:
+        return decision
+    key = attributes_key(decision['decisionType'], 'DecisionAttributes')
+    attributes = dict(decision[key])
+    attributes['input'] = tracing.inject(attributes.get('input'), context)
+    decision = dict(decision)
+    decision[key] = attributes
+    return decision
+
+
+def build_start_timer(timer_id, start_to_fire_timeout, control=None):
+    """Builds a decision starting a timer. A TimerFired event schedules a new decision task once it elapses.
+
+    :param timer_id: Unique among the workflow's open timers.
+    :type timer_id: string
+    :param start_to_fire_timeout: Seconds until the timer fires. May be 0.
+    :type start_to_fire_timeout: int
+    :param control: Optional. Freeform data recorded in the TimerStarted event.
+    :type control: string
+    """
+    attributes = {
+        'timerId': timer_id,
+        'startToFireTimeout': str(start_to_fire_timeout),
+    }
+    if control is not None:
+        attributes['control'] = control
+    return {
+        'decisionType': 'StartTimer',
+        'startTimerDecisionAttributes': attributes,
+    }
+
+
+def event_types(*types):
+    """Returns a predicate for :meth:`DecisionClient.walk_execution_history` keeping events of the given types."""
+    types = frozenset(types)
+    return lambda event: event['eventType'] in types
+
+
+def stop_at_event_types(*types):
+    """Returns a stop condition for :meth:`DecisionClient.walk_execution_history` ending the walk at the first event
+    of the given types, e.g. the latest DecisionTaskCompleted when walking in reverse order.
+    """
+    return event_types(*types)
+
+
+def stop_at_event_id(event_id):
+    """Returns a stop condition for :meth:`DecisionClient.walk_execution_history` ending the walk at the event with
+    the given id.
+    """
+    return lambda event: event['eventId'] == event_id
+
+
+def sticky_activity_fallbacks(decision_client, task):
+    """Builds decisions scheduling again, on the decision config's task list, the activities routed to a sticky task
+    list that timed out before starting since the last decision, e.g. because the host polling it is gone.
+
+    Only activities scheduled by :meth:`DecisionClient.finish_decision_with_activity` with a
+    :class:`~py_swf.config_definitions.StickyConfig` routing activities are scheduled again, with the same id, type,
+    input and timeouts, but the decision config's schedule-to-start timeout. Their ActivityTaskScheduled events are
+    looked up in the events of the task, or else in the history, walked backwards as raw events. Nothing is looked up
+    unless the client's sticky config routes activities, since no other client schedules them.
+
+    :param decision_client: Fetches the history.
+    :type decision_client: :class:`DecisionClient`
+    :param task: A task returned by :meth:`DecisionClient.poll`.
+    :type task: :class:`DecisionTask`
+    :rtype: list of dict
+    """
+    sticky_config = getattr(decision_client, 'sticky_config', None)
+    if sticky_config is None or not sticky_config.route_activities:
+        return []
+
+    timed_out = []
+    for event in task.events:
+        event_type = get_field(event, 'eventType')
+        if event_type == 'DecisionTaskCompleted':
+            break
+        if event_type == 'ActivityTaskTimedOut':
+            attributes = get_field(event, 'activityTaskTimedOutEventAttributes')
+            if get_field(attributes, 'timeoutType') == 'SCHEDULE_TO_START':
+                timed_out.append(get_field(attributes, 'scheduledEventId'))
+    if not timed_out:
+        return []
+
+    scheduled = {}
+    for event in task.events:
+        if get_field(event, 'eventType') == 'ActivityTaskScheduled' and get_field(event, 'eventId') in timed_out:
+            scheduled[get_field(event, 'eventId')] = event
+    missing = frozenset(timed_out) - frozenset(scheduled)
+    if missing:
+        oldest = min(missing)
+        for event in decision_client.walk_execution_history(
+            task.workflow_id,
+            task.workflow_run_id,
+            reverse_order=True,
+            use_raw_event_history=True,
+            predicate=lambda event: event['eventId'] in missing,
+            stop=stop_at_event_id(oldest),
+        ):
+            scheduled[event['eventId']] = event
+
+    decisions = []
+    for event_id in sorted(timed_out):
+        attributes = get_field(scheduled.get(event_id), 'activityTaskScheduledEventAttributes')
+        if get_field(attributes, 'control') != _STICKY_ACTIVITY_CONTROL:
+            continue
+        activity_type = get_field(attributes, 'activityType')
+        decisions.append(build_activity_task(
+            get_field(attributes, 'activityId'),
+            get_field(activity_type, 'name'),
+            get_field(activity_type, 'version'),
+            get_field(attributes, 'input'),
+            decision_client.decision_config,
+            get_field(attributes, 'scheduleToCloseTimeout'),
+            None,
+            get_field(attributes, 'startToCloseTimeout'),
+            get_field(attributes, 'heartbeatTimeout'),
+        ))
+    return decisions
+
+
+def build_record_marker(marker_name, details=None):
+    """Builds a decision recording a MarkerRecorded event in the history, without scheduling anything.
+
+    :param marker_name: Identifies the marker.
+    :type marker_name: string
+    :param details: Optional. Freeform data recorded with the marker, at most 32768 characters.
+    :type details: string
+    """
+    attributes = {
+        'markerName': marker_name,
+    }
+    if details is not None:
+        attributes['details'] = details
+    return {
+        'decisionType': 'RecordMarker',
+        'recordMarkerDecisionAttributes': attributes,
+    }
+
+
 def build_workflow_complete(result):
     return {
         'decisionType': 'CompleteWorkflowExecution',
@@ -240,6 +980,100 @@ def build_workflow_complete(result):
     }
 
 
+def build_continue_as_new(
+    input,
+    task_list=None,
+    execution_start_to_close_timeout=None,
+    task_start_to_close_timeout=None,
+    workflow_type_version=None,
+    tag_list=None,
+):
+    """Builds a ContinueAsNewWorkflowExecution decision. See :meth:`DecisionClient.continue_as_new`."""
+    attributes = {
+        'input': input,
+    }
+    # boto doesn't like None values for optional kwargs
+    if task_list is not None:
+        attributes['taskList'] = {'name': task_list}
+    if execution_start_to_close_timeout is not None:
+        attributes['executionStartToCloseTimeout'] = str(execution_start_to_close_timeout)
+    if task_start_to_close_timeout is not None:
+        attributes['taskStartToCloseTimeout'] = str(task_start_to_close_timeout)
+    if workflow_type_version is not None:
+        attributes['workflowTypeVersion'] = workflow_type_version
+    if tag_list is not None:
+        attributes['tagList'] = list(tag_list)
+    return {
+        'decisionType': 'ContinueAsNewWorkflowExecution',
+        'continueAsNewWorkflowExecutionDecisionAttributes': attributes,
+    }
+
+
+def build_start_child_workflow(
+    workflow_id,
+    workflow_name,
+    workflow_version,
+    input,
+    task_list=None,
+    execution_start_to_close_timeout=None,
+    task_start_to_close_timeout=None,
+    child_policy=None,
+    tag_list=None,
+    control=None,
+):
+    """Builds a decision starting a child workflow execution. Its progress is recorded in the parent's history, see
+    :class:`~py_swf.children.ChildWorkflows`.
+
+    Optional values that are None default to those registered with the workflow type.
+
+    :param workflow_id: Unique among the open workflow executions of the domain.
+    :type workflow_id: string
+    :param workflow_name: The name of the child's workflow type.
+    :type workflow_name: string
+    :param workflow_version: The version of the child's workflow type.
+    :type workflow_version: string
+    :param input: Freeform input of the child.
+    :type input: string
+    :param task_list: Where the child's decision tasks are scheduled.
+    :type task_list: string
+    :param execution_start_to_close_timeout: Maximum duration of the child. Measured in seconds.
+    :type execution_start_to_close_timeout: int
+    :param task_start_to_close_timeout: Maximum duration of the child's decision tasks. Measured in seconds.
+    :type task_start_to_close_timeout: int
+    :param child_policy: What happens to the child's own children when it is closed, e.g. TERMINATE or ABANDON.
+    :type child_policy: string
+    :param tag_list: Tags of the child, at most 5.
+    :type tag_list: list of string
+    :param control: Freeform data recorded in the parent's child workflow events, not sent to the child.
+    :type control: string
+    """
+    attributes = {
+        'workflowId': workflow_id,
+        'workflowType': {
+            'name': workflow_name,
+            'version': workflow_version,
+        },
+        'input': input,
+    }
+    # boto doesn't like None values for optional kwargs
+    if task_list is not None:
+        attributes['taskList'] = {'name': task_list}
+    if execution_start_to_close_timeout is not None:
+        attributes['executionStartToCloseTimeout'] = str(execution_start_to_close_timeout)
+    if task_start_to_close_timeout is not None:
+        attributes['taskStartToCloseTimeout'] = str(task_start_to_close_timeout)
+    if child_policy is not None:
+        attributes['childPolicy'] = child_policy
+    if tag_list is not None:
+        attributes['tagList'] = list(tag_list)
+    if control is not None:
+        attributes['control'] = control
+    return {
+        'decisionType': 'StartChildWorkflowExecution',
+        'startChildWorkflowExecutionDecisionAttributes': attributes,
+    }
+
+
 def build_activity_task(
     activity_id,
     activity_name,
@@ -250,7 +1084,15 @@ def build_activity_task(
     schedule_to_start_timeout,
     start_to_close_timeout,
     heartbeat_timeout,
+    task_list=None,
 ):
+    """Builds a decision scheduling an activity task.
+
+    Timeouts that are None default to the decision config's. The task list defaults to the decision config's, and to
+    one of its shards, picked by ``activity_id``, if it is a :class:`~py_swf.sharding.ShardedTaskList`.
+    """
+    if task_list is None:
+        task_list = producer_task_list(decision_config.task_list, key=activity_id)
     if schedule_to_close_timeout is None:
         schedule_to_close_timeout = decision_config.schedule_to_close_timeout
     if schedule_to_start_timeout is None:
@@ -269,7 +1111,7 @@ def build_activity_task(
             'activityId': activity_id,
             'input': input,
             'taskList': {
-                'name': decision_config.task_list,
+                'name': task_list,
             },
             'scheduleToCloseTimeout': str(schedule_to_close_timeout),
             'scheduleToStartTimeout': str(schedule_to_start_timeout),
@@ -4,6 +4,10 @@ from __future__ import unicode_literals
 
 from collections import namedtuple
 
+from py_swf import tracing
+from py_swf.clients.base import BaseClient
+from py_swf.sharding import producer_task_list
+
 __all__ = ['WorkflowClient']
 
 CountWorkflowsResult = namedtuple(
@@ -20,20 +24,29 @@ truncated (boolean) -- If set to true, indicates that the actual count was more
 """
 
 
-class WorkflowClient(object):
+class WorkflowClient(BaseClient):
     """A client that provides a pythonic API for starting and terminating workflows through an SWF boto3 client.
 
     :param workflow_client_config: Contains SWF values commonly used when making SWF api calls.
     :type workflow_client_config: :class:`~py_swf.config_definitions.WorkflowClientConfig`
     :param boto_client: A raw SWF boto3 client.
     :type boto_client: :class:`~SWF.Client`
+    :param retry_policy: Optional. Retries calls that fail because of throttling or transient errors.
+    :type retry_policy: :class:`~py_swf.retry.RetryPolicy`
+    :param instrumentation: Optional. Receives the latency and outcome of every SWF call.
+    :type instrumentation: :class:`~py_swf.instrumentation.Instrumentation`
+    :param tracer: Optional. Propagates trace context through task payloads and records spans of SWF calls.
+    :type tracer: :class:`~py_swf.tracing.Tracer`
     """
 
-    def __init__(self, workflow_client_config, boto_client):
+    def __init__(self, workflow_client_config, boto_client, retry_policy=None, instrumentation=None, tracer=None):
         self.workflow_client_config = workflow_client_config
         self.boto_client = boto_client
+        self.retry_policy = retry_policy
+        self.instrumentation = instrumentation
+        self.tracer = tracer
 
-    def start_workflow(self, input, id, workflow_name, version, workflow_start_to_close_timeout=None):
+    def start_workflow(self, input, id, workflow_name, version, workflow_start_to_close_timeout=None, task_list=None):
         """Enqueues and starts a workflow to SWF.
 
         Passthrough to :meth:`~SWF.Client.start_workflow_execution`.
@@ -47,26 +60,35 @@ class WorkflowClient(object):
         :type workflow_name: string
         :param version: The version of the workflow type.
         :type version: string
+        :param task_list: Optional. The task list of the workflow's decision tasks, instead of the config's. Defaults
+            to one of the config's shards, picked by ``id``, if it is a :class:`~py_swf.sharding.ShardedTaskList`.
+        :type task_list: string
         :returns: An AWS generated uuid that represents a unique identifier for the run of this workflow.
         :rtype: string
         """
         if workflow_start_to_close_timeout is None:
             workflow_start_to_close_timeout = self.workflow_client_config.execution_start_to_close_timeout
-        return self.boto_client.start_workflow_execution(
-            domain=self.workflow_client_config.domain,
-            childPolicy='TERMINATE',
-            workflowId=id,
-            input=input,
-            workflowType={
-                'name': workflow_name,
-                'version': version,
-            },
-            taskList={
-                'name': self.workflow_client_config.task_list,
-            },
-            executionStartToCloseTimeout=str(workflow_start_to_close_timeout),
-            taskStartToCloseTimeout=str(self.workflow_client_config.task_start_to_close_timeout),
-        )['runId']
+        if task_list is None:
+            task_list = producer_task_list(self.workflow_client_config.task_list, key=id)
+        with self._span('start_workflow_execution', attributes=dict(workflow_id=id)) as span:
+            if span is not None:
+                input = tracing.inject(input, span.context)
+            return self._call(
+                'start_workflow_execution',
+                domain=self.workflow_client_config.domain,
+                childPolicy='TERMINATE',
+                workflowId=id,
+                input=input,
+                workflowType={
+                    'name': workflow_name,
+                    'version': version,
+                },
+                taskList={
+                    'name': task_list,
+                },
+                executionStartToCloseTimeout=str(workflow_start_to_close_timeout),
+                taskStartToCloseTimeout=str(self.workflow_client_config.task_start_to_close_timeout),
+            )['runId']
 
     def terminate_workflow(self, workflow_id, reason):
         """Forcefully terminates a workflow by preventing further responding and executions of
@@ -81,7 +103,8 @@ class WorkflowClient(object):
         :returns: None.
         :rtype: NoneType
         """
-        self.boto_client.terminate_workflow_execution(
+        self._call(
+            'terminate_workflow_execution',
             domain=self.workflow_client_config.domain,
             workflowId=workflow_id,
             reason=reason,
@@ -126,7 +149,8 @@ class WorkflowClient(object):
             latest_start_date=latest_start_date,
         )
 
-        response = self.boto_client.count_open_workflow_executions(
+        response = self._call(
+            'count_open_workflow_executions',
             domain=self.workflow_client_config.domain,
             startTimeFilter=start_time_filter_dict['startTimeFilter'],
             **workflow_filter_dict
@@ -186,7 +210,8 @@ class WorkflowClient(object):
         )
         workflow_filter_dict.update(time_filter_dict)
 
-        response = self.boto_client.count_closed_workflow_executions(
+        response = self._call(
+            'count_closed_workflow_executions',
             domain=self.workflow_client_config.domain,
             **workflow_filter_dict
         )
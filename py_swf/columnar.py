@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""Export workflow histories into columns of numbers, for analytics over many executions.
+
+Walking histories one namedtuple per event is too slow and memory-hungry for millions of executions.
+:func:`export_history` pages through the raw events instead, and appends each one as a row of
+:class:`EventColumns`, stored in :class:`array.array` columns::
+
+    columns = export_history(decision_client, [(workflow_id, run_id), ...])
+    columns.save('/tmp/histories.cols')
+    ...
+    arrays = EventColumns.load('/tmp/histories.cols').to_numpy()
+    completed = arrays['event_type'] == EVENT_TYPE_CODES['ActivityTaskCompleted']
+
+The columns are:
+
+* ``run``: the index of the execution in :attr:`EventColumns.runs`.
+* ``event_id``: the event id within its execution.
+* ``event_type``: the index of the event type in :data:`EVENT_TYPES`, or :data:`UNKNOWN_EVENT_TYPE`.
+* ``timestamp``: the event timestamp in epoch milliseconds.
+* ``activity_id``: the index of the activity id in :attr:`EventColumns.activity_ids`, or -1.
+* ``activity_type``: the index of the ``(name, version)`` activity type in :attr:`EventColumns.activity_types`, or
+  -1. Only ``ActivityTaskScheduled`` events have one.
+* ``scheduled_event_id``, ``started_event_id`` and ``decision_task_completed_event_id``: the ids of the events an
+  event refers to, or 0.
+
+:meth:`EventColumns.to_numpy` requires numpy, which py_swf doesn't depend on: install ``py-swf[analytics]``.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import array
+import json
+import sys
+
+from py_swf._encoding import attributes_key
+from py_swf._encoding import to_timestamp
+
+
+__all__ = ['EVENT_TYPES', 'EVENT_TYPE_CODES', 'UNKNOWN_EVENT_TYPE', 'EventColumns', 'export_history']
+
+
+EVENT_TYPES = (
+    'WorkflowExecutionStarted',
+    'WorkflowExecutionCancelRequested',
+    'WorkflowExecutionCompleted',
+    'CompleteWorkflowExecutionFailed',
+    'WorkflowExecutionFailed',
+    'FailWorkflowExecutionFailed',
+    'WorkflowExecutionTimedOut',
+    'WorkflowExecutionCanceled',
+    'CancelWorkflowExecutionFailed',
+    'WorkflowExecutionContinuedAsNew',
+    'ContinueAsNewWorkflowExecutionFailed',
+    'WorkflowExecutionTerminated',
+    'DecisionTaskScheduled',
+    'DecisionTaskStarted',
+    'DecisionTaskCompleted',
+    'DecisionTaskTimedOut',
+    'ActivityTaskScheduled',
+    'ScheduleActivityTaskFailed',
+    'ActivityTaskStarted',
+    'ActivityTaskCompleted',
+    'ActivityTaskFailed',
+    'ActivityTaskTimedOut',
+    'ActivityTaskCanceled',
+    'ActivityTaskCancelRequested',
+    'RequestCancelActivityTaskFailed',
+    'WorkflowExecutionSignaled',
+    'MarkerRecorded',
+    'RecordMarkerFailed',
+    'TimerStarted',
+    'StartTimerFailed',
+    'TimerFired',
+    'TimerCanceled',
+    'CancelTimerFailed',
+    'StartChildWorkflowExecutionInitiated',
+    'StartChildWorkflowExecutionFailed',
+    'ChildWorkflowExecutionStarted',
+    'ChildWorkflowExecutionCompleted',
+    'ChildWorkflowExecutionFailed',
+    'ChildWorkflowExecutionTimedOut',
+    'ChildWorkflowExecutionCanceled',
+    'ChildWorkflowExecutionTerminated',
+    'SignalExternalWorkflowExecutionInitiated',
+    'SignalExternalWorkflowExecutionFailed',
+    'ExternalWorkflowExecutionSignaled',
+    'RequestCancelExternalWorkflowExecutionInitiated',
+    'RequestCancelExternalWorkflowExecutionFailed',
+    'ExternalWorkflowExecutionCancelRequested',
+    'LambdaFunctionScheduled',
+    'LambdaFunctionStarted',
+    'LambdaFunctionCompleted',
+    'LambdaFunctionFailed',
+    'LambdaFunctionTimedOut',
+    'ScheduleLambdaFunctionFailed',
+    'StartLambdaFunctionFailed',
+)
+"""Every SWF event type. The code of an event type is its index, so new types are only ever appended."""
+
+EVENT_TYPE_CODES = dict((event_type, code) for code, event_type in enumerate(EVENT_TYPES))
+
+UNKNOWN_EVENT_TYPE = 255
+"""The code of event types missing from :data:`EVENT_TYPES`."""
+
+_MAGIC = b'py_swf-columns-1\n'
+
+# Python 2 arrays have no 'q' typecode, but 'l' is 64 bits wide on the platforms it runs on.
+_INT64 = 'q' if 'q' in getattr(array, 'typecodes', '') else 'l'
+
+_COLUMNS = (
+    ('run', 'i'),
+    ('event_id', _INT64),
+    ('event_type', 'B'),
+    ('timestamp', _INT64),
+    ('activity_id', 'i'),
+    ('activity_type', 'i'),
+    ('scheduled_event_id', _INT64),
+    ('started_event_id', _INT64),
+    ('decision_task_completed_event_id', _INT64),
+)
+
+_attribute_keys = dict((event_type, attributes_key(event_type)) for event_type in EVENT_TYPES)
+
+
+class EventColumns(object):
+    """Workflow history events stored column by column, one row per event.
+
+    Strings are stored once, in :attr:`runs`, :attr:`activity_ids` and :attr:`activity_types`, and referred to by
+    index from the columns.
+
+    :ivar runs: The ``(workflow_id, run_id)`` of every execution exported.
+    :ivar activity_ids: Every activity id seen.
+    :ivar activity_types: Every ``(name, version)`` activity type seen.
+    """
+
+    def __init__(self):
+        for name, typecode in _COLUMNS:
+            setattr(self, name, array.array(str(typecode)))
+        self.runs = []
+        self.activity_ids = []
+        self.activity_types = []
+        self._activity_id_indexes = {}
+        self._activity_type_indexes = {}
+
+    def __len__(self):
+        return len(self.event_id)
+
+    @property
+    def columns(self):
+        """The names of the columns, in the order they are stored."""
+        return [name for name, _ in _COLUMNS]
+
+    def add_run(self, workflow_id, run_id):
+        """Adds an execution, and returns its index for the ``run`` column.
+
+        :rtype: int
+        """
+        self.runs.append((workflow_id, run_id))
+        return len(self.runs) - 1
+
+    def append(self, run, event):
+        """Appends a raw event, as returned by :meth:`~SWF.Client.get_workflow_execution_history`.
+
+        :param run: The index returned by :meth:`add_run`.
+        :type run: int
+        :param event: The raw event.
+        :type event: dict
+        """
+        event_type = event['eventType']
+        attributes = event.get(_attribute_keys.get(event_type) or attributes_key(event_type), {})
+        activity_type = attributes.get('activityType')
+
+        self.run.append(run)
+        self.event_id.append(event['eventId'])
+        self.event_type.append(EVENT_TYPE_CODES.get(event_type, UNKNOWN_EVENT_TYPE))
+        self.timestamp.append(int(round(to_timestamp(event['eventTimestamp']) * 1000)))
+        self.activity_id.append(self._intern_activity_id(attributes.get('activityId')))
+        self.activity_type.append(
+            -1 if activity_type is None else self._intern_activity_type(activity_type['name'], activity_type['version'])
+        )
+        self.scheduled_event_id.append(attributes.get('scheduledEventId', 0))
+        self.started_event_id.append(attributes.get('startedEventId', 0))
+        self.decision_task_completed_event_id.append(attributes.get('decisionTaskCompletedEventId', 0))
+
+    def extend(self, run, events):
+        """Appends every raw event of ``events``. See :meth:`append`."""
+        for event in events:
+            self.append(run, event)
+
+    def to_numpy(self):
+        """Returns the columns as numpy arrays, sharing memory with the columns.
+
+        :return: A dict of column name to :class:`numpy.ndarray`.
+        :raises ImportError: Raised when numpy isn't installed.
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('EventColumns.to_numpy requires numpy, install it with `pip install numpy`')
+        return dict(
+            (name, numpy.frombuffer(getattr(self, name), dtype=typecode) if len(self) else numpy.array([], typecode))
+            for name, typecode in _COLUMNS
+        )
+
+    def save(self, path):
+        """Writes the columns to ``path``: a line of JSON describing them, followed by the raw column data.
+
+        :type path: string
+        """
+        header = dict(
+            byteorder=sys.byteorder,
+            length=len(self),
+            columns=[[name, typecode, getattr(self, name).itemsize] for name, typecode in _COLUMNS],
+            runs=self.runs,
+            activity_ids=self.activity_ids,
+            activity_types=self.activity_types,
+        )
+        with open(path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            for name, _ in _COLUMNS:
+                getattr(self, name).tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """Reads columns written by :meth:`save`.
+
+        :type path: string
+        :rtype: :class:`EventColumns`
+        :raises ValueError: Raised when ``path`` wasn't written by :meth:`save`, or on a platform with other integer
+                            sizes.
+        """
+        columns = cls()
+        with open(path, 'rb') as f:
+            if f.readline() != _MAGIC:
+                raise ValueError('{0} is not an EventColumns file'.format(path))
+            header = json.loads(f.readline().decode('utf-8'))
+            for name, typecode, itemsize in header['columns']:
+                column = getattr(columns, name)
+                if column.itemsize != itemsize:
+                    raise ValueError('Column {0} has {1} byte items, expected {2}'.format(name, itemsize, column.itemsize))
+                column.fromfile(f, header['length'])
+                if header['byteorder'] != sys.byteorder:
+                    column.byteswap()
+
+        columns.runs = [tuple(run) for run in header['runs']]
+        columns.activity_ids = header['activity_ids']
+        columns.activity_types = [tuple(activity_type) for activity_type in header['activity_types']]
+        columns._activity_id_indexes = dict((value, index) for index, value in enumerate(columns.activity_ids))
+        columns._activity_type_indexes = dict((value, index) for index, value in enumerate(columns.activity_types))
+        return columns
+
+    def _intern_activity_id(self, activity_id):
+        if activity_id is None:
+            return -1
+        index = self._activity_id_indexes.get(activity_id)
+        if index is None:
+            index = self._activity_id_indexes[activity_id] = len(self.activity_ids)
+            self.activity_ids.append(activity_id)
+        return index
+
+    def _intern_activity_type(self, name, version):
+        key = (name, version)
+        index = self._activity_type_indexes.get(key)
+        if index is None:
+            index = self._activity_type_indexes[key] = len(self.activity_types)
+            self.activity_types.append(key)
+        return index
+
+
+def export_history(decision_client, executions, columns=None, maximum_page_size=1000):
+    """Pages through the history of every execution, appending its raw events to columns.
+
+    Events are appended oldest first, without ever building namedtuples.
+
+    :param decision_client: Fetches the histories, through
+                            :meth:`~py_swf.clients.decision.DecisionClient.walk_execution_history`.
+    :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+    :param executions: The ``(workflow_id, run_id)`` of the executions to export.
+    :type executions: iterable of tuple
+    :param columns: Optional. The columns to append to. Defaults to new columns.
+    :type columns: :class:`EventColumns`
+    :param maximum_page_size: Passthru for maximumPageSize to :meth:`~SWF.Client.get_workflow_execution_history`
+    :type maximum_page_size: int
+    :rtype: :class:`EventColumns`
+    """
+    if columns is None:
+        columns = EventColumns()
+    for workflow_id, run_id in executions:
+        columns.extend(
+            columns.add_run(workflow_id, run_id),
+            decision_client.walk_execution_history(
+                workflow_id,
+                run_id,
+                reverse_order=False,
+                use_raw_event_history=True,
+                maximum_page_size=maximum_page_size,
+            ),
+        )
+    return columns
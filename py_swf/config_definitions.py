@@ -25,3 +25,19 @@ ActivityTaskConfig = namedtuple(
 )
 """An immutable object that stores common SWF values. Used by instances of :class:`~py_swf.clients.ActivityTaskClient`.
 """
+
+StickyConfig = namedtuple(
+    'StickyConfig',
+    'task_list schedule_to_start_timeout route_activities',
+)
+"""An immutable object that routes a run's next decision tasks to the decider that made its last decision.
+Used by instances of :class:`~py_swf.clients.decision.DecisionClient`.
+
+task_list (string) -- The task list only this decider polls, e.g. from :func:`~py_swf.clients.decision.host_task_list`.
+schedule_to_start_timeout (int) -- Seconds a decision task waits on ``task_list`` before SWF moves it back to the
+    workflow's task list, e.g. because the decider is gone.
+route_activities (boolean) -- Whether activities scheduled without an explicit task list go to ``task_list`` too,
+    for activity workers running alongside the decider. They wait there at most ``schedule_to_start_timeout``, then
+    :class:`~py_swf.decider.Decider` schedules them again on the workflow's task list, see
+    :func:`~py_swf.clients.decision.sticky_activity_fallbacks`.
+"""
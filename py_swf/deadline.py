@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""How long a polled task may still be worked on before SWF times it out.
+
+Tasks returned by :meth:`~py_swf.clients.decision.DecisionClient.poll` and
+:meth:`~py_swf.clients.activity_task.ActivityTaskClient.poll` carry a :class:`Deadline` as ``task.deadline``, measured
+from when the task was received. Work that can no longer finish in time can be skipped, or aborted::
+
+    def decide_order(task):
+        for event in task.events:
+            task.deadline.check(margin=1)
+            ...
+
+A :class:`~py_swf.decider.Decider` hands tasks whose handler raises :class:`~py_swf.errors.DeadlineExceeded` back to
+SWF, so that a new decision task is scheduled at once rather than after the timeout.
+
+The deadline is slightly later than SWF's, as SWF starts the clock before the task reaches the worker.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import time
+
+from py_swf._encoding import get_field
+from py_swf.errors import DeadlineExceeded
+
+
+__all__ = ['Deadline', 'budget_counter', 'task_start_to_close_timeout']
+
+
+BUDGET_BUCKETS = (0.5, 0.75, 0.9, 1.0)
+"""The fractions of their timeout tasks are counted under by :func:`budget_counter`."""
+
+
+class Deadline(object):
+    """The time by which a task must be responded to.
+
+    :param timeout: Seconds the task may take, or None if it has no timeout.
+    :type timeout: float
+    :param started: Optional. Epoch seconds when the task was received. Defaults to now.
+    :type started: float
+    :param clock: Returns the current epoch seconds. For tests.
+    """
+
+    def __init__(self, timeout, started=None, clock=time.time):
+        self.timeout = timeout
+        self.clock = clock
+        self.started = clock() if started is None else started
+
+    @property
+    def expires_at(self):
+        """Epoch seconds when the task times out, or None if it has no timeout. Pass it as the ``deadline`` of
+        responses, so that they are not retried past it.
+        """
+        if self.timeout is None:
+            return None
+        return self.started + self.timeout
+
+    def elapsed(self):
+        """Seconds since the task was received."""
+        return self.clock() - self.started
+
+    def remaining(self):
+        """Seconds until the task times out, negative once it did, or infinity if it has no timeout."""
+        if self.timeout is None:
+            return float('inf')
+        return self.expires_at - self.clock()
+
+    def used(self):
+        """The fraction of the timeout elapsed, over 1 once the task timed out, or 0 if it has no timeout."""
+        if not self.timeout:
+            return 0.0
+        return self.elapsed() / self.timeout
+
+    def expired(self, margin=0):
+        """Whether less than ``margin`` seconds remain."""
+        return self.remaining() < margin
+
+    def can_finish(self, seconds, margin=0):
+        """Whether work expected to take ``seconds`` would finish at least ``margin`` seconds before the timeout."""
+        return self.remaining() >= seconds + margin
+
+    def check(self, margin=0):
+        """Raises if less than ``margin`` seconds remain.
+
+        :raises py_swf.errors.DeadlineExceeded: Raised when the task can no longer be responded to in time.
+        """
+        remaining = self.remaining()
+        if remaining < margin:
+            raise DeadlineExceeded(
+                '{0:.3f}s left of the {1}s timeout, {2}s needed'.format(remaining, self.timeout, margin),
+            )
+
+    def __repr__(self):
+        return 'Deadline(timeout={0!r}, started={1!r})'.format(self.timeout, self.started)
+
+
+def budget_counter(fraction):
+    """Names the counter of tasks responded to after using ``fraction`` of their timeout: ``budget_under_50``,
+    ``budget_under_75``, ``budget_under_90``, ``budget_under_100``, or ``late``.
+    """
+    for bucket in BUDGET_BUCKETS:
+        if fraction < bucket:
+            return 'budget_under_{0}'.format(int(bucket * 100))
+    return 'late'
+
+
+def task_start_to_close_timeout(events):
+    """Finds the start-to-close timeout of the decision task that was just started, in raw or namedtuple events.
+
+    :param events: The events of a polled decision task, most recent first.
+    :return: Seconds, or None if the events don't say or the timeout is ``NONE``.
+    :rtype: float
+    """
+    scheduled_event_id = None
+    for event in events:
+        event_type = get_field(event, 'eventType')
+        if scheduled_event_id is None and event_type == 'DecisionTaskStarted':
+            scheduled_event_id = get_field(get_field(event, 'decisionTaskStartedEventAttributes'), 'scheduledEventId')
+        elif event_type == 'DecisionTaskScheduled' and get_field(event, 'eventId') == scheduled_event_id:
+            timeout = get_field(get_field(event, 'decisionTaskScheduledEventAttributes'), 'startToCloseTimeout')
+            if timeout is None or timeout == 'NONE':
+                return None
+            return float(timeout)
+    return None
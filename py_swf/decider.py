@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""A runtime that polls for decision tasks on several threads and hands each task to a function by workflow type.
+
+Handlers receive a :class:`~py_swf.clients.decision.DecisionTask` and return the list of decisions to respond
+with, all sent in a single response::
+
+    def decide_order(decision_task):
+        return [build_activity_task(...)]
+
+    decider = Decider(decision_client, num_pollers=8)
+    decider.register('order', '1.0', decide_order)
+    decider.start()
+    ...
+    decider.stop()
+    decider.join()
+
+Handlers run on the poller threads, so ``num_pollers`` is also the number of tasks decided at once.
+
+Handlers can give up on tasks that can no longer be decided in time with ``task.deadline.check()``, see
+:mod:`py_swf.deadline`. Such tasks are handed back to SWF at once, rather than left to time out.
+
+When the client's :class:`~py_swf.config_definitions.StickyConfig` routes activities, those that time out before
+starting, because the host polling the sticky task list is gone, are scheduled again on the workflow's task list ahead
+of the handler's decisions, see :func:`~py_swf.clients.decision.sticky_activity_fallbacks`. Handlers shouldn't
+schedule them again themselves, and every decider of the task list should use the same sticky settings.
+
+Long-running workflows can bound the size of their history, and so the cost of every decision, with a
+:class:`ContinueAsNewPolicy`::
+
+    decider.register('order', '1.0', decide_order, continue_as_new=ContinueAsNewPolicy(carry_over, max_events=5000))
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+from collections import namedtuple
+from collections import OrderedDict
+
+from py_swf._encoding import attributes_key
+from py_swf._encoding import get_field
+from py_swf._workers import Counters
+from py_swf._workers import WorkerPool
+from py_swf.clients.decision import build_continue_as_new
+from py_swf.clients.decision import sticky_activity_fallbacks
+from py_swf.deadline import budget_counter
+from py_swf.deadline import Deadline
+from py_swf.deadline import task_start_to_close_timeout
+from py_swf.errors import DeadlineExceeded
+from py_swf.errors import NoTaskFound
+from py_swf.errors import PollInterrupted
+from py_swf.interruptible import InterruptiblePoller
+from py_swf.tracing import task_span
+
+
+__all__ = ['ContinueAsNewPolicy', 'Decider', 'DeciderStats', 'DecisionResponse']
+
+
+DecisionResponse = namedtuple('DecisionResponse', 'decisions execution_context')
+"""What a handler may return instead of a list of decisions, to also set the execution context.
+
+decisions (list of dict) -- The decisions to respond with.
+execution_context (string) -- Freeform text recorded in the DecisionTaskCompleted event, or None.
+"""
+
+
+_PAYLOAD_FIELDS = ('input', 'result', 'details', 'reason', 'control', 'executionContext')
+
+# How many runs :class:`ContinueAsNewPolicy` remembers the payload bytes of, between their decision tasks.
+_MAX_TRACKED_RUNS = 10000
+
+
+class ContinueAsNewPolicy(object):
+    """Continues a workflow as new once its history grows past a threshold, carrying its state over to the new run.
+
+    When a polled task crosses a threshold, the decider calls ``carry_over`` instead of the workflow's handler. It
+    returns the input of the new run, built from the task, or None to decide as usual, e.g. while activities are
+    still running: they are abandoned once the run is continued as new.
+
+    :param carry_over: Called with the :class:`~py_swf.clients.decision.DecisionTask`. Returns a string or None.
+    :param max_events: Optional. Continues once the history holds more events.
+    :type max_events: int
+    :param max_payload_bytes: Optional. Continues once the inputs, results, details, reasons, controls and execution
+                              contexts of the history add up to more bytes. The history is walked once per run, and
+                              only the events polled since are counted on its next tasks.
+    :type max_payload_bytes: int
+    :param continue_as_new_kwargs: Passed on to :func:`~py_swf.clients.decision.build_continue_as_new`, e.g.
+                                   ``task_start_to_close_timeout``.
+    """
+
+    def __init__(self, carry_over, max_events=None, max_payload_bytes=None, **continue_as_new_kwargs):
+        self.carry_over = carry_over
+        self.max_events = max_events
+        self.max_payload_bytes = max_payload_bytes
+        self.continue_as_new_kwargs = continue_as_new_kwargs
+        # The payload bytes counted so far of recent runs: run id -> (last event id counted, bytes).
+        self._payload_sizes = OrderedDict()
+        self._payload_sizes_lock = threading.Lock()
+
+    def should_continue(self, decision_client, task):
+        """Returns whether the history of a polled task's workflow crossed a threshold.
+
+        :param decision_client: Fetches the events older than the task's, to add up their payloads.
+        :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+        :param task: A task returned by :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+        :type task: :class:`~py_swf.clients.decision.DecisionTask`
+        :rtype: bool
+        """
+        if not task.events:
+            return False
+        if self.max_events is not None and get_field(task.events[0], 'eventId') > self.max_events:
+            return True
+        return self.max_payload_bytes is not None and self.history_payload_bytes(decision_client, task) > self.max_payload_bytes
+
+    def history_payload_bytes(self, decision_client, task):
+        """Adds up the payloads of the history of a polled task's workflow, up to the task's latest event.
+
+        Totals are remembered for the last 10000 runs seen. The history is walked backwards, as raw events, when the
+        task's events don't reach back to the start of the run or to the events counted before.
+
+        :param decision_client: Fetches the events older than the task's.
+        :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+        :param task: A task returned by :meth:`~py_swf.clients.decision.DecisionClient.poll`, with events.
+        :type task: :class:`~py_swf.clients.decision.DecisionTask`
+        :rtype: int
+        """
+        with self._payload_sizes_lock:
+            counted_event_id, total = self._payload_sizes.pop(task.workflow_run_id, (0, 0))
+
+        oldest_event_id = min(get_field(event, 'eventId') for event in task.events)
+        if oldest_event_id > counted_event_id + 1:
+            total += payload_bytes(decision_client.walk_execution_history(
+                task.workflow_id,
+                task.workflow_run_id,
+                reverse_order=True,
+                use_raw_event_history=True,
+                predicate=lambda event: counted_event_id < event['eventId'] < oldest_event_id,
+                stop=lambda event: event['eventId'] <= counted_event_id + 1,
+            ))
+        total += payload_bytes(event for event in task.events if get_field(event, 'eventId') > counted_event_id)
+
+        with self._payload_sizes_lock:
+            self._payload_sizes[task.workflow_run_id] = (get_field(task.events[0], 'eventId'), total)
+            while len(self._payload_sizes) > _MAX_TRACKED_RUNS:
+                self._payload_sizes.popitem(last=False)
+        return total
+
+    def decisions(self, task):
+        """Returns the decisions continuing the task's workflow as new, or None if ``carry_over`` returned None."""
+        new_input = self.carry_over(task)
+        if new_input is None:
+            return None
+        return [build_continue_as_new(new_input, **self.continue_as_new_kwargs)]
+
+
+class DeciderStats(Counters):
+    """Thread-safe counters describing what a :class:`Decider` did.
+
+    The counters are:
+
+    * ``polls``: polls that returned a task.
+    * ``empty_polls``: polls that timed out without a task.
+    * ``poll_errors``: polls that raised an error.
+    * ``decided``: tasks responded to.
+    * ``unhandled``: tasks of a workflow type without a handler, left to time out.
+    * ``handler_errors``: tasks whose handler raised, left to time out.
+    * ``respond_errors``: tasks whose response failed.
+    * ``late``: tasks responded to after their start-to-close timeout elapsed.
+    * ``budget_under_50``, ``budget_under_75``, ``budget_under_90`` and ``budget_under_100``: tasks responded to
+      before using that percentage of their start-to-close timeout, counted in the lowest bucket that applies.
+    * ``deadline_exceeded``: tasks whose handler raised :class:`~py_swf.errors.DeadlineExceeded`, handed back.
+    * ``expired``: tasks received with less than ``min_remaining`` of their timeout left, handed back undecided.
+    * ``continued_as_new``: tasks responded to by continuing their workflow as new.
+
+    :ivar max_budget_used: The largest fraction of a task's start-to-close timeout spent before responding to it.
+    """
+
+    def __init__(self):
+        super(DeciderStats, self).__init__()
+        self.max_budget_used = 0.0
+
+    def observe_budget(self, fraction):
+        with self._lock:
+            if fraction > self.max_budget_used:
+                self.max_budget_used = fraction
+            self._counts[budget_counter(fraction)] += 1
+
+    def snapshot(self):
+        """Returns a copy of every counter as a dict, plus ``max_budget_used``."""
+        with self._lock:
+            snapshot = dict(self._counts)
+            snapshot['max_budget_used'] = self.max_budget_used
+            return snapshot
+
+
+class Decider(object):
+    """Runs concurrent pollers for decision tasks and dispatches each task to the handler of its workflow type.
+
+    Tasks without a handler, or whose handler raises, are not responded to: SWF times them out and schedules a
+    new decision task.
+
+    When the decision client has a tracer, each handler runs in a ``decide`` span, a child of the poll that received
+    the task.
+
+    The start-to-close timeout of each task is read from its DecisionTaskScheduled event, and set as its
+    ``deadline``. Responses are not retried past it, and :attr:`stats` tracks how much of it tasks use.
+
+    :param decision_client: The client to poll and respond with. It is shared by every poller.
+    :type decision_client: :class:`~py_swf.clients.decision.DecisionClient`
+    :param num_pollers: How many threads poll and decide concurrently.
+    :type num_pollers: int
+    :param identity: Optional. Recorded in the history of every task polled.
+    :type identity: string
+    :param use_raw_event_history: Whether handlers receive raw dictionary events instead of namedtuples.
+    :type use_raw_event_history: bool
+    :param default_timeout: Seconds. The start-to-close timeout assumed when it can't be found in the events polled.
+    :type default_timeout: float
+    :param on_error: Optional. Called with the task, or None for poll errors, and the exception, whenever polling,
+                     handling or responding fails.
+    :param poll_error_delay: Seconds to wait before polling again after a poll error.
+    :type poll_error_delay: float
+    :param min_remaining: Optional. Seconds. Tasks with less of their timeout left when they are dispatched are
+                          handed back without calling their handler.
+    :type min_remaining: float
+    :param clock: Returns the current epoch seconds. For tests.
+    """
+
+    def __init__(
+        self,
+        decision_client,
+        num_pollers=4,
+        identity=None,
+        use_raw_event_history=False,
+        default_timeout=None,
+        on_error=None,
+        poll_error_delay=1.0,
+        min_remaining=None,
+        clock=time.time,
+    ):
+        self.decision_client = decision_client
+        self.num_pollers = num_pollers
+        self.identity = identity
+        self.use_raw_event_history = use_raw_event_history
+        self.default_timeout = default_timeout
+        self.on_error = on_error
+        self.poll_error_delay = poll_error_delay
+        self.min_remaining = min_remaining
+        self.clock = clock
+        self.stats = DeciderStats()
+        self.handlers = {}
+        self.continue_as_new_policies = {}
+        self._workers = WorkerPool(self._poll_forever, 'py_swf-decider')
+        self._poller = InterruptiblePoller(decision_client, self._workers.stopping, on_error=self._report)
+
+    def register(self, workflow_name, workflow_version, handler, continue_as_new=None):
+        """Dispatches the decision tasks of a workflow type to ``handler``.
+
+        :param handler: Called with a :class:`~py_swf.clients.decision.DecisionTask`. Returns a list of decisions, or
+                        a :class:`DecisionResponse`.
+        :param continue_as_new: Optional. When to continue the workflow as new instead of calling ``handler``.
+        :type continue_as_new: :class:`ContinueAsNewPolicy`
+        :return: The handler, so that ``register`` can wrap a function definition.
+        """
+        self.handlers[(workflow_name, workflow_version)] = handler
+        if continue_as_new is not None:
+            self.continue_as_new_policies[(workflow_name, workflow_version)] = continue_as_new
+        else:
+            self.continue_as_new_policies.pop((workflow_name, workflow_version), None)
+        return handler
+
+    def start(self):
+        """Starts the pollers. Returns immediately."""
+        self._workers.start(self.num_pollers)
+
+    def stop(self):
+        """Asks the pollers to stop. Returns immediately.
+
+        Polls in progress are interrupted, and tasks they receive later are handed back to SWF, as are tasks received
+        but not dispatched yet. Tasks already being decided are still responded to.
+        """
+        self._workers.stop()
+
+    def join(self, timeout=None, wait_for_abandoned_polls=False):
+        """Waits for the pollers to stop.
+
+        :param timeout: Optional. Seconds to wait for, overall.
+        :param wait_for_abandoned_polls: Whether to also wait for interrupted polls to complete, so that every task
+                                         they receive is handed back before the process exits. This may take until
+                                         their long-poll returns.
+        :return: Whether every poller stopped.
+        :rtype: bool
+        """
+        return self._workers.join(timeout, pollers=[self._poller] if wait_for_abandoned_polls else [])
+
+    def run(self):
+        """Starts the pollers and blocks until the decider is stopped, or interrupted with Ctrl-C."""
+        self.start()
+        try:
+            while not self._workers.stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+        self.join()
+
+    def _poll_forever(self):
+        while not self._workers.stopping.is_set():
+            try:
+                task = self._poller.poll(
+                    identity=self.identity,
+                    use_raw_event_history=self.use_raw_event_history,
+                )
+            except PollInterrupted:
+                break
+            except NoTaskFound:
+                self.stats.increment('empty_polls')
+                continue
+            except Exception as e:
+                self.stats.increment('poll_errors')
+                self._report(None, e)
+                self._workers.stopping.wait(self.poll_error_delay)
+                continue
+            self.stats.increment('polls')
+            self.decide(task, received=self.clock())
+
+    def decide(self, task, received=None):
+        """Dispatches a single task to its handler and responds with the decisions returned.
+
+        :param task: A task returned by :meth:`~py_swf.clients.decision.DecisionClient.poll`.
+        :type task: :class:`~py_swf.clients.decision.DecisionTask`
+        :param received: Optional. Epoch seconds when the task was received. Defaults to when the client received
+                         it, or now.
+        :type received: float
+        """
+        if received is None:
+            received = task.deadline.started if task.deadline is not None else self.clock()
+        timeout = task_start_to_close_timeout(task.events)
+        if timeout is None:
+            timeout = self.default_timeout
+        task.deadline = Deadline(timeout, started=received, clock=self.clock)
+
+        workflow_type = (task.workflow_type['name'], task.workflow_type['version'])
+        handler = self.handlers.get(workflow_type)
+        if handler is None:
+            self.stats.increment('unhandled')
+            return
+
+        if self.min_remaining is not None and task.deadline.expired(margin=self.min_remaining):
+            self.stats.increment('expired')
+            self._hand_back(task)
+            return
+
+        policy = self.continue_as_new_policies.get(workflow_type)
+        try:
+            with task_span(
+                getattr(self.decision_client, 'tracer', None),
+                'decide',
+                task.task_token,
+                dict(workflow_id=task.workflow_id, workflow_type='{0}:{1}'.format(*workflow_type)),
+            ) as span:
+                response = None
+                if policy is not None and policy.should_continue(self.decision_client, task):
+                    decisions = policy.decisions(task)
+                    if decisions is not None:
+                        response = DecisionResponse(decisions=decisions, execution_context=None)
+                continued = response is not None
+                if span is not None:
+                    span.attributes['continued_as_new'] = continued
+                if response is None:
+                    response = handler(task)
+                    fallbacks = sticky_activity_fallbacks(self.decision_client, task)
+                    if fallbacks:
+                        if not isinstance(response, DecisionResponse):
+                            response = DecisionResponse(decisions=response, execution_context=None)
+                        response = response._replace(decisions=fallbacks + list(response.decisions))
+        except DeadlineExceeded as e:
+            self.stats.increment('deadline_exceeded')
+            self._report(task, e)
+            self._hand_back(task)
+            return
+        except Exception as e:
+            self.stats.increment('handler_errors')
+            self._report(task, e)
+            return
+
+        if not isinstance(response, DecisionResponse):
+            response = DecisionResponse(decisions=response, execution_context=None)
+        try:
+            self.decision_client.finish_decision(
+                task.task_token,
+                list(response.decisions),
+                execution_context=response.execution_context,
+                deadline=task.deadline.expires_at,
+            )
+        except Exception as e:
+            self.stats.increment('respond_errors')
+            self._report(task, e)
+            return
+
+        self.stats.increment('decided')
+        if continued:
+            self.stats.increment('continued_as_new')
+        if timeout:
+            self.stats.observe_budget((self.clock() - received) / timeout)
+
+    def _hand_back(self, task):
+        # Too late to respond at all: SWF times the task out anyway.
+        if task.deadline.expired():
+            return
+        try:
+            self.decision_client.hand_back(task.task_token)
+        except Exception as e:
+            self.stats.increment('respond_errors')
+            self._report(task, e)
+
+    def _report(self, task, error):
+        if self.on_error is not None:
+            self.on_error(task, error)
+
+
+def payload_bytes(events):
+    """Adds up the sizes of the freeform text payloads of raw or namedtuple events, e.g. inputs and results.
+
+    :rtype: int
+    """
+    total = 0
+    for event in events:
+        event_type = get_field(event, 'eventType')
+        if not event_type:
+            continue
+        attributes = get_field(event, attributes_key(event_type))
+        if attributes is None:
+            continue
+        for field in _PAYLOAD_FIELDS:
+            value = get_field(attributes, field)
+            if value:
+                total += len(value.encode('utf-8'))
+    return total
@@ -7,3 +7,17 @@ class NoTaskFound(Exception):
     """Raised when polling for activity or decision tasks times out.
     """
     pass
+
+
+class PollInterrupted(NoTaskFound):
+    """Raised when a poll is abandoned because its worker is shutting down.
+    A task received after the shutdown started is handed back to SWF rather than returned.
+    """
+    pass
+
+
+class DeadlineExceeded(Exception):
+    """Raised by :meth:`~py_swf.deadline.Deadline.check` when a task can no longer be responded to before it times
+    out.
+    """
+    pass
@@ -0,0 +1,863 @@
+# -*- coding: utf-8 -*-
+"""An in-process stand-in for the SWF service, for load testing py_swf clients without AWS.
+
+:class:`FakeSWFClient` implements the subset of :class:`~SWF.Client` that py_swf uses, with the same request and
+response shapes, so it can be passed anywhere a boto3 SWF client is expected::
+
+    boto_client = FakeSWFClient(poll_timeout=1)
+    workflow_client = WorkflowClient(workflow_client_config, boto_client)
+    decision_client = DecisionClient(decision_config, boto_client)
+
+Polls block until a task is available or ``poll_timeout`` elapses, like SWF long-polls. It is thread-safe, so any
+number of pollers and responders may share one instance.
+
+It is deliberately not a full emulation: domains and types don't need to be registered before starting workflow
+executions, though, like SWF, types can only be listed or registered in a registered domain. Task and workflow
+timeouts are recorded in the history but never enforced. The one exception is the
+``taskListScheduleToStartTimeout`` of a decision task list override, after which the decision task moves back to
+the workflow's task list, as sticky deciders rely on it. An override without that timeout moves the workflow's
+decision tasks for good. Likewise, child workflows report back to their parent,
+but the child policy of a closing parent is not applied to its children.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+import threading
+import time
+import uuid
+from collections import defaultdict
+from collections import deque
+
+from py_swf._botocore import client_error
+from py_swf._encoding import attributes_key
+from py_swf._encoding import to_timestamp
+from py_swf._encoding import utc
+
+
+__all__ = ['FakeSWFClient']
+
+
+class _Run(object):
+    """The state of a single workflow execution."""
+
+    def __init__(self, domain, workflow_id, run_id, workflow_type, task_list, tags, start_time):
+        self.domain = domain
+        self.workflow_id = workflow_id
+        self.run_id = run_id
+        self.workflow_type = workflow_type
+        self.task_list = task_list
+        self.tags = tags
+        self.start_time = start_time
+        self.close_time = None
+        self.close_status = None
+        self.events = []
+        # Event id of the decision task waiting to be polled, and whether it was queued yet.
+        self.scheduled_decision_id = None
+        self.decision_queued = False
+        # Event id of the decision task being worked on by a decider.
+        self.started_decision_id = None
+        self.previous_started_decision_id = 0
+        self.timers = {}
+        # Where decision tasks go, changed for good by a decider responding with a taskList but no timeout.
+        self.decision_task_list_default = task_list
+        # Set by a decider responding with a taskList and a timeout, until the decision task scheduled there times out.
+        self.decision_task_list_override = None
+        self.decision_schedule_to_start_timeout = None
+        # (parent run, initiated event id, started event id) of a child workflow execution.
+        self.parent = None
+
+    @property
+    def decision_task_list(self):
+        return self.decision_task_list_override or self.decision_task_list_default
+
+    @property
+    def is_open(self):
+        return self.close_status is None
+
+    @property
+    def execution(self):
+        return {'workflowId': self.workflow_id, 'runId': self.run_id}
+
+
+class FakeSWFClient(object):
+    """A thread-safe, in-memory implementation of the SWF api used by py_swf.
+
+    :param poll_timeout: How long polls wait for a task before returning an empty response. Measured in seconds.
+    :type poll_timeout: float
+    """
+
+    def __init__(self, poll_timeout=60.0):
+        self.poll_timeout = poll_timeout
+        self._lock = threading.RLock()
+        self._conditions = {}
+        self._queues = defaultdict(deque)
+        self._domains = {}
+        self._types = {}
+        self._runs = {}
+        self._open_runs_by_workflow_id = {}
+        self._tokens = {}
+
+    # Registration
+
+    def register_domain(self, name, workflowExecutionRetentionPeriodInDays, description=None):
+        with self._lock:
+            if name in self._domains:
+                raise _error('DomainAlreadyExistsFault', 'RegisterDomain')
+            self._domains[name] = dict(name=name, status='REGISTERED', description=description)
+
+    def register_activity_type(self, domain, name, version, **kwargs):
+        self._register_type('activity_type', 'RegisterActivityType', domain, name, version)
+
+    def register_workflow_type(self, domain, name, version, **kwargs):
+        self._register_type('workflow_type', 'RegisterWorkflowType', domain, name, version)
+
+    def _register_type(self, kind, operation_name, domain, name, version):
+        with self._lock:
+            self._check_domain(domain, operation_name)
+            key = (kind, domain, name, version)
+            if key in self._types:
+                raise _error('TypeAlreadyExistsFault', operation_name)
+            self._types[key] = dict(name=name, version=version, status='REGISTERED')
+
+    def deprecate_domain(self, name):
+        with self._lock:
+            info = self._domains.get(name)
+            if info is None:
+                raise _error('UnknownResourceFault', 'DeprecateDomain')
+            if info['status'] == 'DEPRECATED':
+                raise _error('DomainDeprecatedFault', 'DeprecateDomain')
+            info['status'] = 'DEPRECATED'
+
+    def deprecate_activity_type(self, domain, activityType):
+        self._deprecate_type('activity_type', 'DeprecateActivityType', domain, activityType)
+
+    def deprecate_workflow_type(self, domain, workflowType):
+        self._deprecate_type('workflow_type', 'DeprecateWorkflowType', domain, workflowType)
+
+    def _deprecate_type(self, kind, operation_name, domain, type_):
+        with self._lock:
+            info = self._types.get((kind, domain, type_['name'], type_['version']))
+            if info is None:
+                raise _error('UnknownResourceFault', operation_name)
+            if info['status'] == 'DEPRECATED':
+                raise _error('TypeDeprecatedFault', operation_name)
+            info['status'] = 'DEPRECATED'
+
+    def list_domains(self, registrationStatus, **kwargs):
+        with self._lock:
+            return {
+                'domainInfos': [
+                    dict(name=name, status=info['status'])
+                    for name, info in sorted(self._domains.items())
+                    if info['status'] == registrationStatus
+                ],
+            }
+
+    def list_activity_types(self, domain, registrationStatus, **kwargs):
+        return self._list_types('activity_type', 'activityType', domain, registrationStatus, 'ListActivityTypes')
+
+    def list_workflow_types(self, domain, registrationStatus, **kwargs):
+        return self._list_types('workflow_type', 'workflowType', domain, registrationStatus, 'ListWorkflowTypes')
+
+    def _list_types(self, kind, type_field, domain, registration_status, operation_name):
+        with self._lock:
+            self._check_domain(domain, operation_name)
+            return {
+                'typeInfos': [
+                    {type_field: dict(name=info['name'], version=info['version']), 'status': info['status']}
+                    for key, info in sorted(self._types.items())
+                    if key[:2] == (kind, domain) and info['status'] == registration_status
+                ],
+            }
+
+    def _check_domain(self, domain, operation_name):
+        # Like SWF, types can only be listed and registered in a registered domain. Workflow executions don't check,
+        # so that tests needn't register anything.
+        if domain not in self._domains:
+            raise _error('UnknownResourceFault', operation_name)
+
+    # Workflow executions
+
+    def start_workflow_execution(
+        self,
+        domain,
+        workflowId,
+        workflowType,
+        taskList,
+        input=None,
+        executionStartToCloseTimeout=None,
+        taskStartToCloseTimeout=None,
+        childPolicy=None,
+        tagList=None,
+        **kwargs
+    ):
+        with self._lock:
+            if (domain, workflowId) in self._open_runs_by_workflow_id:
+                raise _error('WorkflowExecutionAlreadyStartedFault', 'StartWorkflowExecution')
+
+            run = self._start_run(
+                domain,
+                workflowId,
+                workflowType,
+                taskList,
+                input=input,
+                executionStartToCloseTimeout=executionStartToCloseTimeout,
+                taskStartToCloseTimeout=taskStartToCloseTimeout,
+                childPolicy=childPolicy,
+                tagList=tagList,
+            )
+            return {'runId': run.run_id}
+
+    def _start_run(
+        self,
+        domain,
+        workflow_id,
+        workflow_type,
+        task_list,
+        input=None,
+        executionStartToCloseTimeout=None,
+        taskStartToCloseTimeout=None,
+        childPolicy=None,
+        tagList=None,
+        continuedExecutionRunId=None,
+        parentWorkflowExecution=None,
+        parentInitiatedEventId=None,
+        run_id=None,
+    ):
+        run = _Run(
+            domain=domain,
+            workflow_id=workflow_id,
+            run_id=run_id or uuid.uuid4().hex,
+            workflow_type=dict(workflow_type),
+            task_list=task_list['name'],
+            tags=list(tagList or ()),
+            start_time=time.time(),
+        )
+        self._runs[run.run_id] = run
+        self._open_runs_by_workflow_id[(domain, workflow_id)] = run
+
+        self._add_event(
+            run,
+            'WorkflowExecutionStarted',
+            input=input,
+            executionStartToCloseTimeout=executionStartToCloseTimeout,
+            taskStartToCloseTimeout=taskStartToCloseTimeout,
+            childPolicy=childPolicy,
+            taskList=dict(task_list),
+            workflowType=dict(workflow_type),
+            tagList=list(tagList) if tagList else None,
+            continuedExecutionRunId=continuedExecutionRunId,
+            parentWorkflowExecution=parentWorkflowExecution,
+            parentInitiatedEventId=parentInitiatedEventId,
+        )
+        self._schedule_decision(run)
+        return run
+
+    def terminate_workflow_execution(self, domain, workflowId, runId=None, reason=None, details=None, **kwargs):
+        with self._lock:
+            run = self._open_runs_by_workflow_id.get((domain, workflowId))
+            if run is None or (runId is not None and run.run_id != runId):
+                raise _error('UnknownResourceFault', 'TerminateWorkflowExecution')
+            self._add_event(run, 'WorkflowExecutionTerminated', reason=reason, details=details, childPolicy='TERMINATE')
+            self._close(run, 'TERMINATED')
+
+    def get_workflow_execution_history(
+        self,
+        domain,
+        execution,
+        nextPageToken=None,
+        maximumPageSize=1000,
+        reverseOrder=False,
+    ):
+        with self._lock:
+            run = self._runs.get(execution['runId'])
+            if run is None or run.domain != domain or run.workflow_id != execution['workflowId']:
+                raise _error('UnknownResourceFault', 'GetWorkflowExecutionHistory')
+            return self._history_page(run, nextPageToken, maximumPageSize, reverseOrder)
+
+    def count_open_workflow_executions(self, domain, startTimeFilter, **filters):
+        with self._lock:
+            runs = [run for run in self._runs.values() if run.domain == domain and run.is_open]
+            return self._count(runs, dict(filters, startTimeFilter=startTimeFilter))
+
+    def count_closed_workflow_executions(self, domain, **filters):
+        with self._lock:
+            runs = [run for run in self._runs.values() if run.domain == domain and not run.is_open]
+            return self._count(runs, filters)
+
+    def _count(self, runs, filters):
+        count = 0
+        for run in runs:
+            if not _in_time_range(run.start_time, filters.get('startTimeFilter')):
+                continue
+            if not _in_time_range(run.close_time, filters.get('closeTimeFilter')):
+                continue
+            type_filter = filters.get('typeFilter')
+            if type_filter and not _matches_type_filter(run.workflow_type, type_filter):
+                continue
+            if 'tagFilter' in filters and filters['tagFilter']['tag'] not in run.tags:
+                continue
+            if 'executionFilter' in filters and filters['executionFilter']['workflowId'] != run.workflow_id:
+                continue
+            if 'closeStatusFilter' in filters and filters['closeStatusFilter']['status'] != run.close_status:
+                continue
+            count += 1
+        return {'count': count, 'truncated': False}
+
+    # Decision tasks
+
+    def poll_for_decision_task(
+        self,
+        domain,
+        taskList,
+        identity=None,
+        nextPageToken=None,
+        maximumPageSize=1000,
+        reverseOrder=False,
+    ):
+        if nextPageToken is not None:
+            with self._lock:
+                run_id, _ = _parse_page_token(nextPageToken)
+                run = self._runs[run_id]
+                return dict(
+                    self._decision_task_response(run),
+                    **self._history_page(run, nextPageToken, maximumPageSize, reverseOrder)
+                )
+
+        with self._lock:
+            run = self._wait_for_task(('decision', domain, taskList['name']))
+            if run is None:
+                return {'startedEventId': 0, 'previousStartedEventId': 0}
+
+            started = self._add_event(
+                run,
+                'DecisionTaskStarted',
+                scheduledEventId=run.scheduled_decision_id,
+                identity=identity,
+            )
+            run.started_decision_id = started['eventId']
+            run.scheduled_decision_id = None
+            run.decision_queued = False
+
+            task_token = uuid.uuid4().hex
+            self._tokens[task_token] = ('decision', run.run_id, started['eventId'])
+            response = self._decision_task_response(run)
+            response['taskToken'] = task_token
+            response.update(self._history_page(run, None, maximumPageSize, reverseOrder))
+            return response
+
+    def _decision_task_response(self, run):
+        return {
+            'startedEventId': run.started_decision_id,
+            'previousStartedEventId': run.previous_started_decision_id,
+            'workflowExecution': run.execution,
+            'workflowType': dict(run.workflow_type),
+        }
+
+    def respond_decision_task_completed(
+        self,
+        taskToken,
+        decisions=None,
+        executionContext=None,
+        taskList=None,
+        taskListScheduleToStartTimeout=None,
+        **kwargs
+    ):
+        with self._lock:
+            self._lookup_token(taskToken, 'decision', 'RespondDecisionTaskCompleted')
+            # Like SWF, rejects the whole response before applying any of it.
+            for decision in decisions or ():
+                required = _REQUIRED_DECISION_ATTRIBUTES.get(decision.get('decisionType'))
+                if required is None:
+                    raise _error('ValidationException', 'RespondDecisionTaskCompleted')
+                attributes = decision.get(attributes_key(decision['decisionType'], 'DecisionAttributes'), {})
+                if any(attributes.get(field) is None for field in required):
+                    raise _error('ValidationException', 'RespondDecisionTaskCompleted')
+
+            run, started_event_id = self._take_token(taskToken, 'decision', 'RespondDecisionTaskCompleted')
+            run.decision_task_list_override = None
+            run.decision_schedule_to_start_timeout = None
+            if taskList and taskListScheduleToStartTimeout is None:
+                run.decision_task_list_default = taskList['name']
+            elif taskList:
+                run.decision_task_list_override = taskList['name']
+                run.decision_schedule_to_start_timeout = taskListScheduleToStartTimeout
+            completed = self._add_event(
+                run,
+                'DecisionTaskCompleted',
+                scheduledEventId=run.events[started_event_id - 1]['decisionTaskStartedEventAttributes']['scheduledEventId'],
+                startedEventId=started_event_id,
+                executionContext=executionContext,
+            )
+            run.previous_started_decision_id = started_event_id
+            run.started_decision_id = None
+
+            for decision in decisions or ():
+                if not run.is_open:
+                    break
+                handler = self._decision_handlers[decision['decisionType']]
+                attributes = decision.get(attributes_key(decision['decisionType'], 'DecisionAttributes'), {})
+                handler(self, run, completed['eventId'], attributes)
+
+            if run.is_open and run.scheduled_decision_id is not None and not run.decision_queued:
+                self._enqueue_decision(run)
+
+    def _schedule_activity_task(self, run, completed_event_id, attributes):
+        task_list = attributes.get('taskList') or {'name': run.task_list}
+        scheduled = self._add_event(
+            run,
+            'ActivityTaskScheduled',
+            activityType=dict(attributes['activityType']),
+            activityId=attributes['activityId'],
+            input=attributes.get('input'),
+            control=attributes.get('control'),
+            taskList=dict(task_list),
+            scheduleToCloseTimeout=attributes.get('scheduleToCloseTimeout'),
+            scheduleToStartTimeout=attributes.get('scheduleToStartTimeout'),
+            startToCloseTimeout=attributes.get('startToCloseTimeout'),
+            heartbeatTimeout=attributes.get('heartbeatTimeout'),
+            decisionTaskCompletedEventId=completed_event_id,
+        )
+        self._enqueue(('activity', run.domain, task_list['name']), (run.run_id, scheduled['eventId']))
+
+    def _complete_workflow_execution(self, run, completed_event_id, attributes):
+        self._add_event(
+            run,
+            'WorkflowExecutionCompleted',
+            result=attributes.get('result'),
+            decisionTaskCompletedEventId=completed_event_id,
+        )
+        self._close(run, 'COMPLETED')
+
+    def _fail_workflow_execution(self, run, completed_event_id, attributes):
+        self._add_event(
+            run,
+            'WorkflowExecutionFailed',
+            reason=attributes.get('reason'),
+            details=attributes.get('details'),
+            decisionTaskCompletedEventId=completed_event_id,
+        )
+        self._close(run, 'FAILED')
+
+    def _continue_as_new_workflow_execution(self, run, completed_event_id, attributes):
+        started = run.events[0]['workflowExecutionStartedEventAttributes']
+        workflow_type = dict(run.workflow_type)
+        if attributes.get('workflowTypeVersion') is not None:
+            workflow_type['version'] = attributes['workflowTypeVersion']
+        new_attributes = dict(
+            input=attributes.get('input'),
+            executionStartToCloseTimeout=attributes.get(
+                'executionStartToCloseTimeout',
+                started.get('executionStartToCloseTimeout'),
+            ),
+            taskStartToCloseTimeout=attributes.get('taskStartToCloseTimeout', started.get('taskStartToCloseTimeout')),
+            childPolicy=attributes.get('childPolicy', started.get('childPolicy')),
+            tagList=attributes.get('tagList', run.tags) or None,
+        )
+        task_list = attributes.get('taskList') or {'name': run.task_list}
+        new_run_id = uuid.uuid4().hex
+
+        self._add_event(
+            run,
+            'WorkflowExecutionContinuedAsNew',
+            decisionTaskCompletedEventId=completed_event_id,
+            newExecutionRunId=new_run_id,
+            taskList=dict(task_list),
+            workflowType=workflow_type,
+            **new_attributes
+        )
+        self._close(run, 'CONTINUED_AS_NEW')
+        new_run = self._start_run(
+            run.domain,
+            run.workflow_id,
+            workflow_type,
+            task_list,
+            continuedExecutionRunId=run.run_id,
+            parentWorkflowExecution=started.get('parentWorkflowExecution'),
+            parentInitiatedEventId=started.get('parentInitiatedEventId'),
+            run_id=new_run_id,
+            **new_attributes
+        )
+        # The parent only hears of the child again once its last run closes.
+        new_run.parent = run.parent
+
+    def _start_child_workflow_execution(self, run, completed_event_id, attributes):
+        workflow_type = dict(attributes['workflowType'])
+        task_list = attributes.get('taskList') or {'name': run.task_list}
+        child_attributes = dict(
+            input=attributes.get('input'),
+            executionStartToCloseTimeout=attributes.get('executionStartToCloseTimeout'),
+            taskStartToCloseTimeout=attributes.get('taskStartToCloseTimeout'),
+            childPolicy=attributes.get('childPolicy'),
+            tagList=attributes.get('tagList'),
+        )
+        initiated = self._add_event(
+            run,
+            'StartChildWorkflowExecutionInitiated',
+            workflowId=attributes['workflowId'],
+            workflowType=workflow_type,
+            control=attributes.get('control'),
+            taskList=dict(task_list),
+            decisionTaskCompletedEventId=completed_event_id,
+            **child_attributes
+        )
+        if (run.domain, attributes['workflowId']) in self._open_runs_by_workflow_id:
+            self._add_event(
+                run,
+                'StartChildWorkflowExecutionFailed',
+                workflowType=workflow_type,
+                cause='WORKFLOW_ALREADY_RUNNING',
+                workflowId=attributes['workflowId'],
+                initiatedEventId=initiated['eventId'],
+                decisionTaskCompletedEventId=completed_event_id,
+                control=attributes.get('control'),
+            )
+            self._schedule_decision(run)
+            return
+
+        child = self._start_run(
+            run.domain,
+            attributes['workflowId'],
+            workflow_type,
+            task_list,
+            parentWorkflowExecution=run.execution,
+            parentInitiatedEventId=initiated['eventId'],
+            **child_attributes
+        )
+        started = self._add_event(
+            run,
+            'ChildWorkflowExecutionStarted',
+            workflowExecution=child.execution,
+            workflowType=workflow_type,
+            initiatedEventId=initiated['eventId'],
+        )
+        child.parent = (run, initiated['eventId'], started['eventId'])
+        self._schedule_decision(run)
+
+    def _record_marker(self, run, completed_event_id, attributes):
+        self._add_event(
+            run,
+            'MarkerRecorded',
+            markerName=attributes['markerName'],
+            details=attributes.get('details'),
+            decisionTaskCompletedEventId=completed_event_id,
+        )
+
+    def _start_timer(self, run, completed_event_id, attributes):
+        started = self._add_event(
+            run,
+            'TimerStarted',
+            timerId=attributes['timerId'],
+            control=attributes.get('control'),
+            startToFireTimeout=attributes['startToFireTimeout'],
+            decisionTaskCompletedEventId=completed_event_id,
+        )
+        delay = float(attributes['startToFireTimeout'])
+        if delay <= 0:
+            self._fire_timer(run, attributes['timerId'], started['eventId'])
+            return
+        timer = threading.Timer(delay, self._fire_timer_later, args=(run, attributes['timerId'], started['eventId']))
+        timer.daemon = True
+        run.timers[attributes['timerId']] = timer
+        timer.start()
+
+    def _fire_timer_later(self, run, timer_id, started_event_id):
+        with self._lock:
+            if run.is_open and run.timers.pop(timer_id, None) is not None:
+                self._fire_timer(run, timer_id, started_event_id)
+
+    def _fire_timer(self, run, timer_id, started_event_id):
+        self._add_event(run, 'TimerFired', timerId=timer_id, startedEventId=started_event_id)
+        self._schedule_decision(run)
+
+    _decision_handlers = {
+        'ScheduleActivityTask': _schedule_activity_task,
+        'CompleteWorkflowExecution': _complete_workflow_execution,
+        'FailWorkflowExecution': _fail_workflow_execution,
+        'ContinueAsNewWorkflowExecution': _continue_as_new_workflow_execution,
+        'StartChildWorkflowExecution': _start_child_workflow_execution,
+        'RecordMarker': _record_marker,
+        'StartTimer': _start_timer,
+    }
+
+    def count_pending_decision_tasks(self, domain, taskList):
+        return self._count_pending(('decision', domain, taskList['name']))
+
+    # Activity tasks
+
+    def poll_for_activity_task(self, domain, taskList, identity=None):
+        with self._lock:
+            item = self._wait_for_task(('activity', domain, taskList['name']))
+            if item is None:
+                return {'startedEventId': 0}
+
+            run, scheduled_event_id = item
+            scheduled = run.events[scheduled_event_id - 1]['activityTaskScheduledEventAttributes']
+            started = self._add_event(
+                run,
+                'ActivityTaskStarted',
+                scheduledEventId=scheduled_event_id,
+                identity=identity,
+            )
+            task_token = uuid.uuid4().hex
+            self._tokens[task_token] = ('activity', run.run_id, (scheduled_event_id, started['eventId']))
+
+            response = {
+                'taskToken': task_token,
+                'activityId': scheduled['activityId'],
+                'startedEventId': started['eventId'],
+                'workflowExecution': run.execution,
+                'activityType': dict(scheduled['activityType']),
+            }
+            if scheduled.get('input') is not None:
+                response['input'] = scheduled['input']
+            return response
+
+    def respond_activity_task_completed(self, taskToken, result=None):
+        with self._lock:
+            run, (scheduled_event_id, started_event_id) = self._take_token(
+                taskToken,
+                'activity',
+                'RespondActivityTaskCompleted',
+            )
+            self._add_event(
+                run,
+                'ActivityTaskCompleted',
+                result=result,
+                scheduledEventId=scheduled_event_id,
+                startedEventId=started_event_id,
+            )
+            self._schedule_decision(run)
+
+    def respond_activity_task_failed(self, taskToken, reason=None, details=None):
+        with self._lock:
+            run, (scheduled_event_id, started_event_id) = self._take_token(
+                taskToken,
+                'activity',
+                'RespondActivityTaskFailed',
+            )
+            self._add_event(
+                run,
+                'ActivityTaskFailed',
+                reason=reason,
+                details=details,
+                scheduledEventId=scheduled_event_id,
+                startedEventId=started_event_id,
+            )
+            self._schedule_decision(run)
+
+    def record_activity_task_heartbeat(self, taskToken, details=None):
+        with self._lock:
+            self._lookup_token(taskToken, 'activity', 'RecordActivityTaskHeartbeat')
+            return {'cancelRequested': False}
+
+    def count_pending_activity_tasks(self, domain, taskList):
+        return self._count_pending(('activity', domain, taskList['name']))
+
+    # Internals. Everything below expects self._lock to be held.
+
+    def _add_event(self, run, event_type, **attributes):
+        event = {
+            'eventId': len(run.events) + 1,
+            'eventType': event_type,
+            'eventTimestamp': datetime.datetime.now(utc),
+            attributes_key(event_type, 'EventAttributes'): dict(
+                (key, value) for key, value in attributes.items() if value is not None
+            ),
+        }
+        run.events.append(event)
+        return event
+
+    def _schedule_decision(self, run):
+        if not run.is_open or run.scheduled_decision_id is not None:
+            return
+        scheduled = self._add_event(
+            run,
+            'DecisionTaskScheduled',
+            taskList={'name': run.decision_task_list},
+            scheduleToStartTimeout=run.decision_schedule_to_start_timeout,
+            startToCloseTimeout=run.events[0]['workflowExecutionStartedEventAttributes'].get('taskStartToCloseTimeout'),
+        )
+        run.scheduled_decision_id = scheduled['eventId']
+        # SWF only hands out a run's next decision task once the current one is completed.
+        if run.started_decision_id is None:
+            self._enqueue_decision(run)
+
+    def _enqueue_decision(self, run):
+        run.decision_queued = True
+        self._enqueue(('decision', run.domain, run.decision_task_list), run.run_id)
+        if run.decision_schedule_to_start_timeout is not None:
+            key = ('schedule_to_start', run.scheduled_decision_id)
+            timer = threading.Timer(
+                float(run.decision_schedule_to_start_timeout),
+                self._decision_schedule_to_start_timed_out,
+                args=(run, run.scheduled_decision_id, key),
+            )
+            timer.daemon = True
+            run.timers[key] = timer
+            timer.start()
+
+    def _decision_schedule_to_start_timed_out(self, run, scheduled_event_id, key):
+        with self._lock:
+            run.timers.pop(key, None)
+            if not run.is_open or run.scheduled_decision_id != scheduled_event_id or not run.decision_queued:
+                return
+            try:
+                self._queues[('decision', run.domain, run.decision_task_list)].remove(run.run_id)
+            except ValueError:
+                pass
+            self._add_event(
+                run,
+                'DecisionTaskTimedOut',
+                timeoutType='SCHEDULE_TO_START',
+                scheduledEventId=scheduled_event_id,
+                startedEventId=0,
+            )
+            run.decision_task_list_override = None
+            run.decision_schedule_to_start_timeout = None
+            run.scheduled_decision_id = None
+            run.decision_queued = False
+            self._schedule_decision(run)
+
+    def _enqueue(self, queue_key, item):
+        self._queues[queue_key].append(item)
+        self._condition(queue_key).notify()
+
+    def _condition(self, queue_key):
+        condition = self._conditions.get(queue_key)
+        if condition is None:
+            condition = self._conditions[queue_key] = threading.Condition(self._lock)
+        return condition
+
+    def _wait_for_task(self, queue_key):
+        """Blocks until a task of an open run can be taken from a queue, or the poll times out.
+
+        :return: The run for decision tasks, a tuple of (run, scheduled event id) for activity tasks, or None.
+        """
+        queue = self._queues[queue_key]
+        condition = self._condition(queue_key)
+        deadline = time.time() + self.poll_timeout
+        while True:
+            while queue:
+                item = queue.popleft()
+                run = self._runs[item if queue_key[0] == 'decision' else item[0]]
+                if run.is_open:
+                    return run if queue_key[0] == 'decision' else (run, item[1])
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            condition.wait(remaining)
+
+    def _count_pending(self, queue_key):
+        with self._lock:
+            return {'count': len(self._queues.get(queue_key, ())), 'truncated': False}
+
+    def _lookup_token(self, task_token, kind, operation_name):
+        entry = self._tokens.get(task_token)
+        if entry is None or entry[0] != kind or not self._runs[entry[1]].is_open:
+            raise _error('UnknownResourceFault', operation_name)
+        return self._runs[entry[1]], entry[2]
+
+    def _take_token(self, task_token, kind, operation_name):
+        run, details = self._lookup_token(task_token, kind, operation_name)
+        del self._tokens[task_token]
+        return run, details
+
+    def _close(self, run, close_status):
+        run.close_status = close_status
+        run.close_time = time.time()
+        run.scheduled_decision_id = None
+        for timer in run.timers.values():
+            timer.cancel()
+        run.timers.clear()
+        self._open_runs_by_workflow_id.pop((run.domain, run.workflow_id), None)
+        if run.parent is not None and close_status in _CHILD_CLOSED_EVENTS:
+            self._notify_parent(run, close_status)
+
+    def _notify_parent(self, run, close_status):
+        parent, initiated_event_id, started_event_id = run.parent
+        if not parent.is_open:
+            return
+        event_type, fields = _CHILD_CLOSED_EVENTS[close_status]
+        closed = run.events[-1]
+        closed_attributes = closed[attributes_key(closed['eventType'], 'EventAttributes')]
+        attributes = dict((field, closed_attributes.get(field)) for field in fields)
+        self._add_event(
+            parent,
+            event_type,
+            workflowExecution=run.execution,
+            workflowType=dict(run.workflow_type),
+            initiatedEventId=initiated_event_id,
+            startedEventId=started_event_id,
+            **attributes
+        )
+        self._schedule_decision(parent)
+
+    def _history_page(self, run, next_page_token, maximum_page_size, reverse_order):
+        """Returns a page of a run's history. Page tokens hold the id of the next event to return, so that events
+        added between page requests don't shift the pages.
+        """
+        if reverse_order:
+            next_event_id = len(run.events) if next_page_token is None else _parse_page_token(next_page_token)[1]
+            first_event_id = max(next_event_id - maximum_page_size, 0) + 1
+            page = {'events': run.events[first_event_id - 1:next_event_id][::-1]}
+            if first_event_id > 1:
+                page['nextPageToken'] = '{0}:{1}'.format(run.run_id, first_event_id - 1)
+        else:
+            next_event_id = 1 if next_page_token is None else _parse_page_token(next_page_token)[1]
+            last_event_id = next_event_id + maximum_page_size - 1
+            page = {'events': run.events[next_event_id - 1:last_event_id]}
+            if last_event_id < len(run.events):
+                page['nextPageToken'] = '{0}:{1}'.format(run.run_id, last_event_id + 1)
+        return page
+
+
+# The attributes SWF requires of each type of decision the fake supports.
+_REQUIRED_DECISION_ATTRIBUTES = {
+    'ScheduleActivityTask': ('activityType', 'activityId'),
+    'CompleteWorkflowExecution': (),
+    'FailWorkflowExecution': (),
+    'ContinueAsNewWorkflowExecution': (),
+    'StartChildWorkflowExecution': ('workflowType', 'workflowId'),
+    'RecordMarker': ('markerName',),
+    'StartTimer': ('timerId', 'startToFireTimeout'),
+}
+
+
+# The event recorded in the parent's history when a child closes, and the fields copied from the child's closing event.
+_CHILD_CLOSED_EVENTS = {
+    'COMPLETED': ('ChildWorkflowExecutionCompleted', ('result',)),
+    'FAILED': ('ChildWorkflowExecutionFailed', ('reason', 'details')),
+    'TERMINATED': ('ChildWorkflowExecutionTerminated', ()),
+    'TIMED_OUT': ('ChildWorkflowExecutionTimedOut', ('timeoutType',)),
+    'CANCELED': ('ChildWorkflowExecutionCanceled', ('details',)),
+}
+
+
+def _parse_page_token(next_page_token):
+    run_id, offset = next_page_token.split(':')
+    return run_id, int(offset)
+
+
+def _matches_type_filter(workflow_type, type_filter):
+    if workflow_type['name'] != type_filter['name']:
+        return False
+    return type_filter.get('version', workflow_type['version']) == workflow_type['version']
+
+
+def _in_time_range(timestamp, time_filter):
+    if time_filter is None:
+        return True
+    if timestamp is None:
+        return False
+    if timestamp < to_timestamp(time_filter['oldestDate']):
+        return False
+    return 'latestDate' not in time_filter or timestamp <= to_timestamp(time_filter['latestDate'])
+
+
+def _error(code, operation_name):
+    return client_error()(
+        error_response={'Error': {'Code': code, 'Message': code}},
+        operation_name=operation_name,
+    )
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Hooks that observe every SWF call made by the py_swf clients.
+
+Pass an instrumentation to a client and it is handed a :class:`CallRecord` after each call::
+
+    histograms = HistogramSink()
+    decision_client = DecisionClient(decision_config, boto_client, instrumentation=histograms)
+    ...
+    histograms.snapshot()[('poll_for_decision_task', 'ok')]['p99']
+
+Sinks are called synchronously on the calling thread, so they must be cheap and thread-safe.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import math
+import socket
+import threading
+from collections import namedtuple
+
+
+__all__ = ['CallRecord', 'Instrumentation', 'MultiSink', 'HistogramSink', 'StatsdSink']
+
+
+OUTCOME_OK = 'ok'
+OUTCOME_NO_TASK = 'no_task'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_ERROR = 'error'
+
+
+CallRecord = namedtuple(
+    'CallRecord',
+    'api_name domain task_list duration request_bytes response_bytes event_count outcome',
+)
+"""Describes a single call made through an SWF boto3 client.
+
+api_name (string) -- The :class:`~SWF.Client` method that was called, e.g. ``poll_for_decision_task``.
+domain (string) -- The domain of the call, or None if it has none.
+task_list (string) -- The task list of the call, or None if it has none.
+duration (float) -- Seconds spent in the call, including retries.
+request_bytes (int) -- The length of the strings sent, an approximation of the request payload size.
+response_bytes (int) -- The Content-Length of the response, or None if unknown.
+event_count (int) -- The number of history events returned, or None if the call doesn't return events.
+outcome (string) -- One of ``ok``, ``no_task`` (a poll that returned no task), ``throttled`` or ``error``.
+"""
+
+
+class Instrumentation(object):
+    """Base class of instrumentation sinks. Does nothing."""
+
+    def record(self, call_record):
+        """Called after every SWF call.
+
+        :param call_record: What happened during the call.
+        :type call_record: CallRecord
+        """
+        pass
+
+
+class MultiSink(Instrumentation):
+    """Forwards every record to several sinks.
+
+    :param sinks: The sinks to forward to, in order.
+    :type sinks: list of :class:`Instrumentation`
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def record(self, call_record):
+        for sink in self.sinks:
+            sink.record(call_record)
+
+
+class _Histogram(object):
+    """Counts durations in power-of-two microsecond buckets."""
+
+    NUM_BUCKETS = 40
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.event_count = 0
+        self.buckets = [0] * self.NUM_BUCKETS
+
+    def add(self, call_record):
+        duration = call_record.duration
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.request_bytes += call_record.request_bytes or 0
+        self.response_bytes += call_record.response_bytes or 0
+        self.event_count += call_record.event_count or 0
+        # frexp gives the exponent e such that 2 ** (e - 1) <= microseconds < 2 ** e.
+        bucket = math.frexp(duration * 1e6)[1]
+        self.buckets[min(max(bucket, 0), self.NUM_BUCKETS - 1)] += 1
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket holding the given percentile, in seconds."""
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(2 ** bucket / 1e6, self.max)
+        return self.max
+
+
+class HistogramSink(Instrumentation):
+    """Aggregates calls in process into a latency histogram per api name and outcome.
+
+    Percentiles are approximate: they are the upper bound of a power-of-two bucket, so within a factor of two.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, call_record):
+        key = (call_record.api_name, call_record.outcome)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.add(call_record)
+
+    def snapshot(self):
+        """Summarizes the calls recorded so far.
+
+        :return: A dict of ``{(api_name, outcome): summary}``, where each summary holds ``count``, ``total``,
+                 ``mean``, ``max``, ``p50``, ``p90`` and ``p99`` in seconds, plus the summed ``request_bytes``,
+                 ``response_bytes`` and ``event_count``.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(
+                (key, dict(
+                    count=histogram.count,
+                    total=histogram.total,
+                    mean=histogram.total / histogram.count,
+                    max=histogram.max,
+                    p50=histogram.percentile(50),
+                    p90=histogram.percentile(90),
+                    p99=histogram.percentile(99),
+                    request_bytes=histogram.request_bytes,
+                    response_bytes=histogram.response_bytes,
+                    event_count=histogram.event_count,
+                ))
+                for key, histogram in self._histograms.items()
+            )
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class StatsdSink(Instrumentation):
+    """Sends every call as StatsD metrics over UDP. Sending never blocks, and errors are ignored.
+
+    For a call to ``poll_for_decision_task`` that returned a task, with the default prefix, it sends::
+
+        py_swf.poll_for_decision_task.ok:12.5|ms
+        py_swf.poll_for_decision_task.request_bytes:42|h
+        py_swf.poll_for_decision_task.response_bytes:8104|h
+        py_swf.poll_for_decision_task.event_count:23|h
+
+    :param host: The StatsD host.
+    :type host: string
+    :param port: The StatsD port.
+    :type port: int
+    :param prefix: Prepended to every metric name.
+    :type prefix: string
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='py_swf'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+
+    def format(self, call_record):
+        name = '{0}.{1}'.format(self.prefix, call_record.api_name)
+        lines = ['{0}.{1}:{2:.3f}|ms'.format(name, call_record.outcome, call_record.duration * 1000)]
+        for field in ('request_bytes', 'response_bytes', 'event_count'):
+            value = getattr(call_record, field)
+            if value is not None:
+                lines.append('{0}.{1}:{2}|h'.format(name, field, value))
+        return '\n'.join(lines)
+
+    def record(self, call_record):
+        try:
+            self._socket.sendto(self.format(call_record).encode('utf-8'), self.address)
+        except (IOError, OSError):
+            pass
+
+    def close(self):
+        self._socket.close()
+
+
+def request_size(value):
+    """Sums the lengths of the strings in a request, as a cheap estimate of its payload size."""
+    if isinstance(value, dict):
+        return sum(request_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(request_size(item) for item in value)
+    if isinstance(value, (bytes, type(''))):
+        return len(value)
+    return 0
+
+
+def response_size(response):
+    """Returns the Content-Length of a boto3 response, or None if it isn't known."""
+    try:
+        return int(response['ResponseMetadata']['HTTPHeaders']['content-length'])
+    except (KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Share the strings repeated across history events, to decode large histories in less memory.
+
+Every event of a history repeats the same keys, and many of the same values: event types, activity names and
+versions, task list names. Decoded one response at a time, each page holds its own copy of all of them. With
+``intern_strings=True``, :meth:`~py_swf.clients.decision.DecisionClient.poll` and
+:meth:`~py_swf.clients.decision.DecisionClient.walk_execution_history` replace them with a single shared copy::
+
+    events = list(decision_client.walk_execution_history(workflow_id, run_id, intern_strings=True))
+
+Keys are shared anyway by namedtuple events, whose classes hold the field names, so namedtuples of interned
+strings are the most compact decoding. ``python -m benchmarks.memory`` reports the bytes per event of each one.
+
+Only short strings are interned, as long ones are mostly unique payloads, and the table stops growing once full.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+
+__all__ = ['StringTable', 'default_string_table']
+
+
+# unicode on py2, like the strings botocore decodes, and str on py3.
+_TEXT = type('')
+
+
+class StringTable(object):
+    """Maps every string to a single shared copy of it.
+
+    Thread-safe: concurrent calls adding the same string get the same copy.
+
+    :param max_length: Longer strings are returned as is.
+    :type max_length: int
+    :param max_size: How many strings the table holds at most. Strings not in a full table are returned as is.
+    :type max_size: int
+    """
+
+    def __init__(self, max_length=64, max_size=100000):
+        self.max_length = max_length
+        self.max_size = max_size
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def intern(self, value):
+        """Returns the shared copy of ``value``, if it is a string that is or may be put in the table."""
+        if type(value) is not _TEXT or len(value) > self.max_length:
+            return value
+        shared = self._strings.get(value)
+        if shared is not None:
+            return shared
+        if len(self._strings) >= self.max_size:
+            return value
+        return self._strings.setdefault(value, value)
+
+    def intern_raw(self, thing):
+        """Returns a copy of raw events, or any structure of dicts and lists, with its keys and strings interned."""
+        if type(thing) is dict:
+            return dict((self.intern(key), self.intern_raw(value)) for key, value in thing.items())
+        if type(thing) is list:
+            return [self.intern_raw(value) for value in thing]
+        return self.intern(thing)
+
+    def clear(self):
+        self._strings.clear()
+
+
+default_string_table = StringTable()
+"""The table shared by every client."""
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Polls that return as soon as a worker starts shutting down, instead of after a full long-poll.
+
+boto3 calls can't be cancelled, so :class:`InterruptiblePoller` runs every poll on a helper thread and waits for
+either its result or the shutdown event::
+
+    shutdown = threading.Event()
+    poller = InterruptiblePoller(activity_task_client, shutdown)
+    while True:
+        try:
+            task = poller.poll(identity='worker')
+        except PollInterrupted:
+            break
+        except NoTaskFound:
+            continue
+        ...
+
+    # From a signal handler, or another thread:
+    shutdown.set()
+
+A poll abandoned because of the shutdown keeps running in the background until SWF answers it. If it receives a
+task, the task is handed back to SWF right away with the client's ``hand_back``, rather than being left to time
+out: activity tasks are failed with :data:`~py_swf.clients.activity_task.HAND_BACK_REASON`, and decision tasks are
+rescheduled through a timer firing immediately. Tasks received after the shutdown started are handed back the same
+way. Use :meth:`InterruptiblePoller.wait_for_abandoned_polls` before exiting to make sure every task was handed back;
+a task sent to a process that already exited is only retried once it times out.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from py_swf.errors import PollInterrupted
+
+
+__all__ = ['InterruptiblePoller']
+
+
+class _Poll(object):
+    """A single poll running on its own thread. Hands its task back if abandoned before it completes."""
+
+    def __init__(self, poller, kwargs):
+        self.poller = poller
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        # Set once the poll completed and, if it was abandoned, its task was handed back.
+        self.finished = threading.Event()
+        self.task = None
+        self.error = None
+        self._lock = threading.Lock()
+        self._abandoned = False
+
+    def run(self):
+        try:
+            self.task = self.poller.client.poll(**self.kwargs)
+        except Exception as e:
+            self.error = e
+        with self._lock:
+            self.done.set()
+            abandoned = self._abandoned
+        if abandoned:
+            if self.task is not None:
+                self.poller.hand_back(self.task)
+            self.poller._forget(self)
+        self.finished.set()
+
+    def abandon(self):
+        """Returns whether the poll was abandoned, i.e. hadn't completed yet."""
+        with self._lock:
+            if self.done.is_set():
+                return False
+            self._abandoned = True
+            # Under the lock run checks, so that the poll is registered before it can complete and forget itself.
+            self.poller._remember(self)
+            return True
+
+
+class InterruptiblePoller(object):
+    """Wraps an :class:`~py_swf.clients.activity_task.ActivityTaskClient` or
+    :class:`~py_swf.clients.decision.DecisionClient` so that polls return as soon as ``shutdown`` is set.
+
+    :param client: The client to poll with.
+    :param shutdown: Optional. Set to shut down. Defaults to a new event, set by :meth:`shutdown_now`.
+    :type shutdown: :class:`threading.Event`
+    :param check_interval: Seconds between checks of the shutdown event while a poll is in progress.
+    :type check_interval: float
+    :param on_error: Optional. Called with the task and the exception when handing a task back fails.
+
+    :ivar handed_back: How many tasks were handed back.
+    """
+
+    def __init__(self, client, shutdown=None, check_interval=0.1, on_error=None):
+        self.client = client
+        self.shutdown = shutdown if shutdown is not None else threading.Event()
+        self.check_interval = check_interval
+        self.on_error = on_error
+        self.handed_back = 0
+        self._lock = threading.Lock()
+        self._abandoned_polls = set()
+
+    def poll(self, **kwargs):
+        """Polls with the client, returning early if the shutdown event is set.
+
+        :param kwargs: Passed on to the client's ``poll``, e.g. ``identity``.
+        :return: The task received.
+        :raises py_swf.errors.PollInterrupted: Raised when shutting down. Any task received is handed back.
+        :raises py_swf.errors.NoTaskFound: Raised when the poll times out without receiving any tasks.
+        """
+        if self.shutdown.is_set():
+            raise PollInterrupted('Shutting down')
+
+        poll = _Poll(self, kwargs)
+        thread = threading.Thread(target=poll.run, name='py_swf-poll')
+        thread.daemon = True
+        thread.start()
+
+        while not poll.done.wait(self.check_interval):
+            if self.shutdown.is_set() and poll.abandon():
+                raise PollInterrupted('Shutting down')
+
+        if poll.error is not None:
+            raise poll.error
+        if self.shutdown.is_set():
+            self.hand_back(poll.task)
+            raise PollInterrupted('Shutting down')
+        return poll.task
+
+    def shutdown_now(self):
+        """Sets the shutdown event, interrupting every poll in progress."""
+        self.shutdown.set()
+
+    def hand_back(self, task):
+        """Gives a task back to SWF, so that it is retried without waiting for it to time out."""
+        try:
+            self.client.hand_back(task.task_token)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(task, e)
+            return
+        with self._lock:
+            self.handed_back += 1
+
+    def wait_for_abandoned_polls(self, timeout=None):
+        """Waits for abandoned polls to complete, and their tasks to be handed back.
+
+        :param timeout: Optional. Seconds to wait for, overall.
+        :return: Whether every abandoned poll completed.
+        :rtype: bool
+        """
+        end = None if timeout is None else time.time() + timeout
+        with self._lock:
+            polls = list(self._abandoned_polls)
+        for poll in polls:
+            if not poll.finished.wait(None if end is None else max(end - time.time(), 0)):
+                return False
+        return True
+
+    def _remember(self, poll):
+        with self._lock:
+            self._abandoned_polls.add(poll)
+
+    def _forget(self, poll):
+        with self._lock:
+            self._abandoned_polls.discard(poll)
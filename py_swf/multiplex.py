@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Serves several task lists from one pool of worker threads, giving capacity to the lists that have work.
+
+Each task list is a :class:`TaskListSource`: a client polling it, a handler for its tasks, a priority and a weight::
+
+    poller = MultiplexedPoller(
+        [
+            TaskListSource('urgent', ActivityTaskClient(urgent_config, boto_client), handle, priority=1),
+            TaskListSource('bulk', ActivityTaskClient(bulk_config, boto_client), handle, weight=3),
+            TaskListSource('reports', ActivityTaskClient(reports_config, boto_client), handle),
+        ],
+        num_workers=16,
+    )
+    poller.start()
+
+Whenever a worker is free, it polls the highest priority list that has pending tasks, sharing among lists of equal
+priority in proportion to their weight. When no list has pending tasks, workers spread their polls over every list
+by weight, so that new work is picked up wherever it arrives.
+
+Pending counts come from :meth:`~SWF.Client.count_pending_activity_tasks` or
+:meth:`~SWF.Client.count_pending_decision_tasks`, refreshed at most every ``refresh_interval`` seconds. Those calls
+are throttled per account, and every poller of every process makes one per list, so keep the interval in tens of
+seconds. In between, counts go down as workers poll, and a list whose poll comes back empty is taken as having no
+pending tasks. A worker long-polling an empty list is busy until the poll returns, so keep some workers beyond the
+expected concurrency.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from py_swf._workers import Counters
+from py_swf._workers import WorkerPool
+from py_swf.errors import NoTaskFound
+from py_swf.errors import PollInterrupted
+from py_swf.interruptible import InterruptiblePoller
+from py_swf.tracing import task_span
+
+
+__all__ = ['TaskListSource', 'MultiplexedPoller']
+
+
+class TaskListSource(object):
+    """A task list served by a :class:`MultiplexedPoller`.
+
+    :param name: Identifies the source in stats.
+    :type name: string
+    :param client: Polls the task list.
+    :type client: :class:`~py_swf.clients.activity_task.ActivityTaskClient` or
+                  :class:`~py_swf.clients.decision.DecisionClient`
+    :param handler: Called with every task polled.
+    :param priority: Lists with pending tasks and a higher priority are polled first.
+    :type priority: int
+    :param weight: The share of polls among lists of equal priority.
+    :type weight: float
+    """
+
+    def __init__(self, name, client, handler, priority=0, weight=1):
+        if weight <= 0:
+            raise ValueError('weight must be positive')
+        self.name = name
+        self.client = client
+        self.handler = handler
+        self.priority = priority
+        self.weight = weight
+
+
+class MultiplexedPoller(object):
+    """Polls and handles the tasks of several task lists on a shared pool of worker threads.
+
+    :param sources: The task lists to serve.
+    :type sources: list of :class:`TaskListSource`
+    :param num_workers: How many threads poll and handle tasks concurrently.
+    :type num_workers: int
+    :param identity: Optional. Recorded in the history of every task polled.
+    :type identity: string
+    :param refresh_interval: Seconds between refreshes of the pending task counts, each costing one count call per
+                             source.
+    :type refresh_interval: float
+    :param on_error: Optional. Called with the source, the task or None, and the exception whenever polling or
+                     handling fails.
+    :param poll_error_delay: Seconds a worker waits before polling again after a poll error.
+    :type poll_error_delay: float
+    :param clock: Returns the current epoch seconds. For tests.
+
+    When a source's client has a tracer, its handler runs in a ``handle_task`` span, a child of the poll that
+    received the task.
+    """
+
+    def __init__(
+        self,
+        sources,
+        num_workers=8,
+        identity=None,
+        refresh_interval=30.0,
+        on_error=None,
+        poll_error_delay=1.0,
+        clock=time.time,
+    ):
+        self.sources = list(sources)
+        self.num_workers = num_workers
+        self.identity = identity
+        self.refresh_interval = refresh_interval
+        self.on_error = on_error
+        self.poll_error_delay = poll_error_delay
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pending = dict((source.name, 0) for source in self.sources)
+        # Stride scheduling: a source's pass advances by 1 / weight every time it is picked.
+        self._passes = dict((source.name, 0.0) for source in self.sources)
+        self._candidates = set()
+        self._last_refresh = None
+        self._refreshing = False
+        self._counts = Counters()
+        self._workers = WorkerPool(self._work_forever, 'py_swf-multiplex')
+        self._pollers = dict(
+            (
+                source.name,
+                InterruptiblePoller(source.client, self._workers.stopping, on_error=self._hand_back_failed(source)),
+            )
+            for source in self.sources
+        )
+
+    def start(self):
+        """Starts the workers. Returns immediately."""
+        self._workers.start(self.num_workers)
+
+    def stop(self):
+        """Asks the workers to stop. Returns immediately.
+
+        Polls in progress are interrupted, and tasks they receive later are handed back to SWF, as are tasks received
+        but not handled yet. Tasks already being handled are finished.
+        """
+        self._workers.stop()
+
+    def join(self, timeout=None, wait_for_abandoned_polls=False):
+        """Waits for the workers to stop.
+
+        :param timeout: Optional. Seconds to wait for, overall.
+        :param wait_for_abandoned_polls: Whether to also wait for interrupted polls to complete, so that every task
+                                         they receive is handed back before the process exits.
+        :return: Whether every worker stopped.
+        :rtype: bool
+        """
+        return self._workers.join(timeout, pollers=list(self._pollers.values()) if wait_for_abandoned_polls else [])
+
+    def stats(self):
+        """Returns a dict of ``{(source name, counter): value}``, for the counters ``polls``, ``tasks``,
+        ``empty_polls``, ``poll_errors`` and ``handler_errors``.
+        """
+        return self._counts.snapshot()
+
+    def next_source(self):
+        """Picks the source a free worker polls next.
+
+        :rtype: :class:`TaskListSource`
+        """
+        self._refresh_pending()
+        with self._lock:
+            candidates = [source for source in self.sources if self._pending[source.name] > 0]
+            if candidates:
+                priority = max(source.priority for source in candidates)
+                candidates = [source for source in candidates if source.priority == priority]
+            else:
+                candidates = self.sources
+            names = set(source.name for source in candidates)
+            still_candidates = [self._passes[name] for name in names & self._candidates]
+            if still_candidates:
+                # A source that was left out doesn't get to catch up on the picks it missed.
+                floor = min(still_candidates)
+                for name in names - self._candidates:
+                    self._passes[name] = max(self._passes[name], floor)
+            self._candidates = names
+            source = min(candidates, key=lambda source: self._passes[source.name] + 1.0 / source.weight)
+            self._passes[source.name] += 1.0 / source.weight
+            if self._pending[source.name] > 0:
+                self._pending[source.name] -= 1
+            return source
+
+    def _refresh_pending(self):
+        with self._lock:
+            now = self.clock()
+            if self._refreshing:
+                return
+            if self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return
+            self._refreshing = True
+            self._last_refresh = now
+
+        counts = {}
+        try:
+            for source in self.sources:
+                try:
+                    counts[source.name] = source.client.count_pending()
+                except Exception as e:
+                    self._report(source, None, e)
+        finally:
+            with self._lock:
+                self._pending.update(counts)
+                self._refreshing = False
+
+    def _work_forever(self):
+        while not self._workers.stopping.is_set():
+            source = self.next_source()
+            self._increment(source, 'polls')
+            try:
+                task = self._pollers[source.name].poll(identity=self.identity)
+            except PollInterrupted:
+                break
+            except NoTaskFound:
+                self._increment(source, 'empty_polls')
+                with self._lock:
+                    self._pending[source.name] = 0
+                continue
+            except Exception as e:
+                self._increment(source, 'poll_errors')
+                self._report(source, None, e)
+                self._workers.stopping.wait(self.poll_error_delay)
+                continue
+
+            self._increment(source, 'tasks')
+            try:
+                tracer = getattr(source.client, 'tracer', None)
+                with task_span(tracer, 'handle_task', task.task_token, dict(source=source.name)):
+                    source.handler(task)
+            except Exception as e:
+                self._increment(source, 'handler_errors')
+                self._report(source, task, e)
+
+    def _increment(self, source, counter):
+        self._counts.increment((source.name, counter))
+
+    def _hand_back_failed(self, source):
+        return lambda task, error: self._report(source, task, error)
+
+    def _report(self, source, task, error):
+        if self.on_error is not None:
+            self.on_error(source, task, error)
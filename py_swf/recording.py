@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""Record SWF traffic in production and replay it offline.
+
+:class:`RecordingClient` wraps an SWF boto3 client and writes every call it makes, with its response and latency,
+as one line of JSON::
+
+    boto_client = RecordingClient(boto3.client('swf'), '/tmp/decider.ndjson.gz')
+    decision_client = DecisionClient(decision_config, boto_client)
+
+:class:`ReplayClient` serves a recording back in place of SWF, so that deciders and workers can be profiled
+against realistic histories without AWS::
+
+    boto_client = ReplayClient('/tmp/decider.ndjson.gz', speed=1.0)
+    decision_client = DecisionClient(decision_config, boto_client)
+
+Each line holds ``op`` (the :class:`~SWF.Client` method), ``t`` (seconds since recording started), ``duration``,
+``request``, and either ``response`` or ``error``. Datetimes are written as ``{"$dt": epoch_seconds}``.
+Recordings whose path ends in ``.gz`` are compressed.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import threading
+import time
+from collections import defaultdict
+from collections import deque
+
+from py_swf._botocore import client_error
+from py_swf._botocore import read_timeout
+from py_swf._encoding import decode_datetime
+from py_swf._encoding import encode_datetime
+from py_swf._encoding import open_text
+
+
+__all__ = ['RecordingClient', 'ReplayClient', 'ReplayExhausted', 'read_recording']
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+_READ_TIMEOUT = 'ReadTimeout'
+
+_MATCH_FIELDS = ('execution', 'nextPageToken')
+"""Request fields that tell apart calls of one op, so that pages are served for the page token that asks for them."""
+
+
+class ReplayExhausted(Exception):
+    """Raised by a :class:`ReplayClient` when a call has no recorded response left."""
+    pass
+
+
+def read_recording(path):
+    """Yields the entries of a recording as dicts, in the order they were written."""
+    with open_text(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line, object_hook=decode_datetime)
+
+
+class RecordingClient(object):
+    """Wraps an SWF boto3 client, writing every call made through it to a recording.
+
+    Calls that raise a ``ClientError`` or a read timeout are recorded with their error; other exceptions are raised
+    without being recorded. ``ResponseMetadata`` is left out of responses, to keep recordings compact.
+
+    :param boto_client: The client to record.
+    :type boto_client: :class:`~SWF.Client`
+    :param path: The file to write to. Compressed with gzip if it ends in ``.gz``.
+    :type path: string
+    :param ops: Optional. The names of the methods to record. Defaults to all of them.
+    :type ops: list of string
+    """
+
+    def __init__(self, boto_client, path, ops=None):
+        self._boto_client = boto_client
+        self._ops = frozenset(ops) if ops is not None else None
+        self._lock = threading.Lock()
+        self._file = open_text(path, 'w')
+        self._start = _timer()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._boto_client, name)
+        if not callable(attribute) or name.startswith('_') or (self._ops is not None and name not in self._ops):
+            return attribute
+
+        def call(**kwargs):
+            return self._record(name, attribute, kwargs)
+        return call
+
+    def _record(self, op, func, kwargs):
+        start = _timer()
+        entry = dict(op=op, t=round(start - self._start, 6), request=kwargs)
+        try:
+            response = func(**kwargs)
+        except client_error() as e:
+            entry['error'] = dict(code=e.response.get('Error', {}).get('Code'), response=e.response.get('Error'))
+            raise
+        except read_timeout():
+            entry['error'] = dict(code=_READ_TIMEOUT)
+            raise
+        else:
+            entry['response'] = dict(
+                (key, value) for key, value in (response or {}).items() if key != 'ResponseMetadata'
+            )
+            return response
+        finally:
+            if 'response' in entry or 'error' in entry:
+                entry['duration'] = round(_timer() - start, 6)
+                self._write(entry)
+
+    def _write(self, entry):
+        # Keys keep the order of the response, which the field order of nametuplefied events depends on.
+        line = json.dumps(entry, default=encode_datetime, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        """Flushes and closes the recording. Calls made afterwards fail."""
+        with self._lock:
+            self._file.close()
+
+
+class ReplayClient(object):
+    """Serves the responses of a recording in place of an SWF boto3 client.
+
+    Every call is answered with the next recorded response to the same op. Calls to one op that differ by
+    ``execution`` or ``nextPageToken`` are answered from separate queues, so history pages are served to the
+    request that asks for them, whatever the order of calls. Recorded errors are raised again.
+
+    When an op's responses run out, polls return an empty response, as an expired long-poll would; other calls
+    raise :class:`ReplayExhausted`.
+
+    :param path: The recording to serve.
+    :type path: string
+    :param speed: Optional. Paces the responses by the recorded timeline, sped up by ``speed``, e.g. ``1.0`` for
+                  the original timing, ``10.0`` for ten times faster: a call recorded ``t`` seconds into the
+                  recording and answered ``duration`` seconds later is answered no sooner than
+                  ``(t + duration) / speed`` seconds after the first call to the client. Calls made later than that
+                  are answered immediately. Defaults to answering immediately.
+    :type speed: float
+    :param sleep: Waits for the given number of seconds. For tests.
+    :param clock: Returns the current time in seconds. For tests.
+
+    :ivar calls: The ``(op, kwargs)`` of every call made, in order, e.g. to compare the decisions sent with the
+                 recorded ones.
+    """
+
+    def __init__(self, path, speed=None, sleep=time.sleep, clock=_timer):
+        self.speed = speed
+        self.calls = []
+        self._sleep = sleep
+        self._clock = clock
+        self._start = None
+        self._lock = threading.Lock()
+        self._queues = defaultdict(deque)
+        for entry in read_recording(path):
+            self._queues[_match_key(entry['op'], entry['request'])].append(entry)
+
+    def remaining(self):
+        """Returns the number of recorded responses not served yet."""
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(**kwargs):
+            return self._replay(name, kwargs)
+        return call
+
+    def _replay(self, op, kwargs):
+        now = self._clock()
+        with self._lock:
+            if self._start is None:
+                self._start = now
+            self.calls.append((op, kwargs))
+            queue = self._queues.get(_match_key(op, kwargs))
+            entry = queue.popleft() if queue else None
+
+        if entry is None:
+            if op.startswith('poll_for_'):
+                return {}
+            raise ReplayExhausted('No recorded response left for {0} {1!r}'.format(op, kwargs))
+
+        if self.speed:
+            delay = self._start + (entry.get('t', 0) + entry.get('duration', 0)) / self.speed - now
+            if delay > 0:
+                self._sleep(delay)
+
+        error = entry.get('error')
+        if error is None:
+            return entry['response']
+        if error['code'] == _READ_TIMEOUT:
+            raise read_timeout()('Replayed read timeout of {0}'.format(op))
+        raise client_error()(error_response={'Error': error['response']}, operation_name=op)
+
+
+def _match_key(op, request):
+    return op, json.dumps([request.get(field) for field in _MATCH_FIELDS], sort_keys=True)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import random
+import threading
+import time
+from collections import defaultdict
+
+from py_swf._botocore import client_error
+from py_swf._botocore import connection_errors
+
+
+__all__ = ['RetryPolicy', 'RetryStats']
+
+
+THROTTLING_ERROR_CODES = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+])
+"""Error codes returned by SWF when a caller exceeds its request rate.
+
+``LimitExceededFault`` isn't one of them: it means a quota, like the number of open executions, was reached, which
+retrying doesn't help.
+"""
+
+TRANSIENT_ERROR_CODES = frozenset([
+    'InternalFailure',
+    'InternalError',
+    'InternalServerError',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+])
+"""Error codes returned by SWF for server side failures that are safe to retry."""
+
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+
+
+class RetryStats(object):
+    """Thread-safe counters describing what a :class:`RetryPolicy` did, keyed by SWF api name.
+
+    The counters are:
+
+    * ``calls``: calls made through the policy.
+    * ``attempts``: requests sent to SWF, including retries.
+    * ``retries``: requests that were sent again after a retryable error.
+    * ``throttled``: errors that were caused by throttling.
+    * ``transient_errors``: errors that were caused by a transient server or connection failure.
+    * ``budget_exhausted``: calls that gave up because they ran out of attempts.
+    * ``deadline_exceeded``: calls that gave up because another attempt would finish past their deadline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def increment(self, api_name, counter, value=1):
+        with self._lock:
+            self._counts[(api_name, counter)] += value
+
+    def get(self, api_name, counter):
+        """Returns the value of a single counter for an SWF api name."""
+        with self._lock:
+            return self._counts.get((api_name, counter), 0)
+
+    def total(self, counter):
+        """Returns the value of a counter summed over every SWF api name."""
+        with self._lock:
+            return sum(value for (_, name), value in self._counts.items() if name == counter)
+
+    def snapshot(self):
+        """Returns a copy of every counter as a dict of ``{(api_name, counter): value}``."""
+        with self._lock:
+            return dict(self._counts)
+
+
+class RetryPolicy(object):
+    """Retries SWF calls that failed because of throttling or a transient failure.
+
+    Delays between attempts use decorrelated jitter: each delay is drawn uniformly between ``base_delay`` and three
+    times the previous delay, capped at ``max_delay``. This spreads retries from many workers over time instead of
+    having them hit SWF again in lockstep.
+
+    A policy may be shared by every client in a process, so that :attr:`stats` reflects all SWF traffic.
+
+    :param max_attempts: The maximum number of requests sent for a single call, including the first one.
+    :type max_attempts: int
+    :param base_delay: The smallest delay between two attempts. Measured in seconds.
+    :type base_delay: float
+    :param max_delay: The largest delay between two attempts. Measured in seconds.
+    :type max_delay: float
+    :param max_attempts_by_api: Optional. Overrides ``max_attempts`` for specific SWF api names,
+                                e.g. ``{'poll_for_decision_task': 2}``.
+    :type max_attempts_by_api: dict
+    :param retry_transient_errors: Whether to retry server side and connection failures as well as throttling.
+    :type retry_transient_errors: bool
+    :param stats: Optional. Where to count retries. Defaults to a new :class:`RetryStats`.
+    :type stats: :class:`RetryStats`
+    """
+
+    def __init__(
+        self,
+        max_attempts=4,
+        base_delay=0.1,
+        max_delay=10.0,
+        max_attempts_by_api=None,
+        retry_transient_errors=True,
+        stats=None,
+        sleep=time.sleep,
+        clock=time.time,
+        random_uniform=random.uniform,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts_by_api = dict(max_attempts_by_api or {})
+        self.retry_transient_errors = retry_transient_errors
+        self.stats = stats if stats is not None else RetryStats()
+        self._sleep = sleep
+        self._clock = clock
+        self._random_uniform = random_uniform
+
+    def classify(self, error):
+        """Returns why an error may be retried, or None if it should be raised immediately."""
+        if isinstance(error, client_error()):
+            code = error.response.get('Error', {}).get('Code')
+            if code in THROTTLING_ERROR_CODES:
+                return THROTTLED
+            if self.retry_transient_errors:
+                status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+                if code in TRANSIENT_ERROR_CODES or status >= 500:
+                    return TRANSIENT
+            return None
+        if self.retry_transient_errors and isinstance(error, connection_errors()):
+            return TRANSIENT
+        return None
+
+    def next_delay(self, previous_delay):
+        """Computes the next delay with decorrelated jitter."""
+        upper = max(self.base_delay, previous_delay * 3)
+        return min(self.max_delay, self._random_uniform(self.base_delay, upper))
+
+    def call(self, func, api_name, deadline=None, **kwargs):
+        """Calls ``func(**kwargs)``, retrying retryable errors.
+
+        :param func: A bound method of an SWF boto3 client.
+        :param api_name: The SWF api name, used for per api attempt budgets and counters.
+        :type api_name: string
+        :param deadline: Optional. Epoch seconds after which the call is pointless, e.g. the start-to-close deadline
+                         of the task being responded to. No retry is attempted if its delay would end past it.
+        :type deadline: float
+        :return: Whatever ``func`` returns.
+        """
+        max_attempts = self.max_attempts_by_api.get(api_name, self.max_attempts)
+        self.stats.increment(api_name, 'calls')
+
+        attempt = 0
+        delay = self.base_delay
+        while True:
+            attempt += 1
+            self.stats.increment(api_name, 'attempts')
+            try:
+                return func(**kwargs)
+            except Exception as e:
+                reason = self.classify(e)
+                if reason is None:
+                    raise
+                self.stats.increment(api_name, 'throttled' if reason == THROTTLED else 'transient_errors')
+
+                if attempt >= max_attempts:
+                    self.stats.increment(api_name, 'budget_exhausted')
+                    raise
+
+                delay = self.next_delay(delay)
+                if deadline is not None and self._clock() + delay >= deadline:
+                    self.stats.increment(api_name, 'deadline_exceeded')
+                    raise
+
+            self.stats.increment(api_name, 'retries')
+            self._sleep(delay)
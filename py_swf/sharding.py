@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Spreads the tasks of one logical task list over several SWF task lists, to scale past per-task-list limits.
+
+A :class:`ShardedTaskList` can be used wherever a config takes a ``task_list``::
+
+    task_list = ShardedTaskList('orders', num_shards=8)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', task_list, 3600, 60), boto_client)
+    decision_client = DecisionClient(DecisionConfig('domain', task_list, ...), boto_client)
+
+Workflows are started, and activities scheduled, on shards ``orders-0`` to ``orders-7``, picked by hashing the
+workflow or activity id, or round-robin. Every poll asks the next shard in turn, so pollers cover all shards
+evenly whatever their number.
+
+Decision tasks stay on the shard their workflow was started on. When the number of shards shrinks, the retired
+shards are still polled, and a :class:`~py_swf.clients.decision.DecisionClient` responding to a task polled from a
+retired shard moves the workflow's next decision tasks to a current shard, picked by workflow id. Workflows waiting
+on a timer or an activity are moved at their next decision task, so retired shards are polled until they drain: they
+returned nothing ``drain_empty_polls`` times in a row, and ``drain_seconds`` elapsed since they were retired. Set
+``drain_seconds`` to the longest time a workflow may go without a decision task, e.g. its longest timer.
+
+The number of shards, and which shards are draining, are local to each process: nothing is shared through SWF.
+Every process producing to or polling the task list must resize it at the same time, e.g. when they all reload
+the same configuration, or tasks go to shards that some pollers don't cover. A process started while shards drain
+must be created with the old number of shards and resized, or it never polls the retired shards.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+import zlib
+
+
+__all__ = [
+    'ShardedTaskList',
+    'HASH',
+    'ROUND_ROBIN',
+    'producer_task_list',
+    'poller_task_list',
+    'polled_task_lists',
+    'report_poll',
+    'home_task_list',
+]
+
+
+HASH = 'hash'
+ROUND_ROBIN = 'round_robin'
+
+
+class ShardedTaskList(object):
+    """A logical task list made of ``num_shards`` SWF task lists named ``<name>-<shard>``.
+
+    :param name: The base name of the shards.
+    :type name: string
+    :param num_shards: How many task lists to spread tasks over.
+    :type num_shards: int
+    :param strategy: How producers pick a shard: ``hash`` hashes the workflow or activity id, so retries of the
+                     same id land on the same shard; ``round_robin`` cycles through the shards.
+    :type strategy: string
+    :param drain_empty_polls: How many empty polls in a row a retired shard must return before it is no longer
+                              polled.
+    :type drain_empty_polls: int
+    :param drain_seconds: Optional. How long a retired shard is polled at least, however many empty polls it returns.
+    :type drain_seconds: float
+    :param clock: Returns the current epoch seconds. For tests.
+    """
+
+    def __init__(self, name, num_shards, strategy=HASH, drain_empty_polls=3, drain_seconds=None, clock=time.time):
+        if num_shards < 1:
+            raise ValueError('num_shards must be at least 1')
+        if strategy not in (HASH, ROUND_ROBIN):
+            raise ValueError('Unknown sharding strategy {0!r}'.format(strategy))
+        self.name = name
+        self.num_shards = num_shards
+        self.strategy = strategy
+        self.drain_empty_polls = drain_empty_polls
+        self.drain_seconds = drain_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._next_producer = 0
+        self._next_poller = 0
+        # Retired shard name -> empty polls in a row.
+        self._draining = {}
+        # Retired shard name -> epoch seconds when it was retired.
+        self._retired_at = {}
+
+    def shard_name(self, shard):
+        return '{0}-{1}'.format(self.name, shard)
+
+    @property
+    def shards(self):
+        """The names of the shards producers currently use."""
+        return [self.shard_name(shard) for shard in range(self.num_shards)]
+
+    @property
+    def polled_shards(self):
+        """The names of the shards pollers currently cover: the current ones, then those still draining."""
+        with self._lock:
+            return self.shards + sorted(self._draining)
+
+    def pick(self, key=None):
+        """Returns the name of the shard a new task goes to.
+
+        :param key: Optional. The workflow or activity id, hashed by the ``hash`` strategy. Without a key, shards are
+                    picked round-robin.
+        :type key: string
+        """
+        with self._lock:
+            num_shards = self.num_shards
+            if self.strategy == HASH and key is not None:
+                shard = (zlib.crc32(key.encode('utf-8')) & 0xffffffff) % num_shards
+            else:
+                shard = self._next_producer % num_shards
+                self._next_producer += 1
+        return self.shard_name(shard)
+
+    def next_poll(self):
+        """Returns the name of the shard the next poll should ask. Shared by every poller of the task list."""
+        with self._lock:
+            shards = self.shards + sorted(self._draining)
+            shard = shards[self._next_poller % len(shards)]
+            self._next_poller += 1
+        return shard
+
+    def report_poll(self, shard, got_task):
+        """Tells whether a poll of ``shard`` received a task, so that retired shards stop being polled once drained."""
+        with self._lock:
+            if shard not in self._draining:
+                return
+            if got_task:
+                self._draining[shard] = 0
+                return
+            self._draining[shard] += 1
+            if self._draining[shard] < self.drain_empty_polls:
+                return
+            if self.drain_seconds is not None and self.clock() - self._retired_at[shard] < self.drain_seconds:
+                return
+            del self._draining[shard]
+            del self._retired_at[shard]
+
+    def is_retired(self, shard):
+        """Whether ``shard`` was one of the shards, but no longer is."""
+        with self._lock:
+            return shard in self._retired_at
+
+    def resize(self, num_shards):
+        """Changes the number of shards. Producers use the new shards right away; retired shards are drained.
+
+        Only this process sees the change: every process using the task list must resize it too, at the same time,
+        and keep the same ``drain_seconds``, covering the longest timer of its workflows.
+
+        :param num_shards: The new number of shards.
+        :type num_shards: int
+        """
+        if num_shards < 1:
+            raise ValueError('num_shards must be at least 1')
+        with self._lock:
+            now = self.clock()
+            for shard in range(num_shards, self.num_shards):
+                self._draining[self.shard_name(shard)] = 0
+                self._retired_at[self.shard_name(shard)] = now
+            for shard in range(num_shards):
+                self._draining.pop(self.shard_name(shard), None)
+                self._retired_at.pop(self.shard_name(shard), None)
+            self.num_shards = num_shards
+
+
+def producer_task_list(task_list, key=None):
+    """Returns the name of the SWF task list a new task goes to, for a task list name or a :class:`ShardedTaskList`."""
+    if isinstance(task_list, ShardedTaskList):
+        return task_list.pick(key)
+    return task_list
+
+
+def poller_task_list(task_list):
+    """Returns the name of the SWF task list to poll next, for a task list name or a :class:`ShardedTaskList`."""
+    if isinstance(task_list, ShardedTaskList):
+        return task_list.next_poll()
+    return task_list
+
+
+def polled_task_lists(task_list):
+    """Returns the names of every SWF task list pollers cover, for a task list name or a :class:`ShardedTaskList`."""
+    if isinstance(task_list, ShardedTaskList):
+        return task_list.polled_shards
+    return [task_list]
+
+
+def report_poll(task_list, shard, got_task):
+    """Reports the outcome of a poll to a :class:`ShardedTaskList`. Does nothing for a task list name."""
+    if isinstance(task_list, ShardedTaskList):
+        task_list.report_poll(shard, got_task)
+
+
+def home_task_list(task_list, shard, key):
+    """Returns the shard the decision tasks of a workflow polled from ``shard`` should move to, if ``shard`` is a
+    retired shard of a :class:`ShardedTaskList`, or None.
+
+    :param key: The workflow id.
+    :type key: string
+    """
+    if isinstance(task_list, ShardedTaskList) and task_list.is_retired(shard):
+        return task_list.pick(key)
+    return None
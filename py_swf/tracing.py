@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""Trace context propagation across the processes taking part in a workflow.
+
+When clients share a :class:`Tracer`, a trace started by :meth:`~py_swf.clients.workflow.WorkflowClient.start_workflow`
+follows the workflow through deciders and activity workers:
+
+* The trace context travels as a one line header prepended to workflow inputs, activity inputs and activity results.
+  py_swf clients remove it again before handing payloads to your code, whether they have a tracer or not. Other
+  consumers of those payloads see it, so only give clients a tracer when every consumer uses py_swf. Payloads the
+  header would push past SWF's limit of :data:`MAX_PAYLOAD_LENGTH` characters are sent without it.
+* Spans are opened around polls, responses, and any handler code wrapped in :meth:`Tracer.span`, and are handed to
+  an exporter once finished.
+
+Handlers can parent their spans on the task they are working on::
+
+    task = decision_client.poll()
+    with tracer.span('decide', parent=tracer.context_for(task.task_token)):
+        ...
+
+:class:`~py_swf.decider.Decider` and :class:`~py_swf.multiplex.MultiplexedPoller` do so around every handler they
+call, with :func:`task_span`.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import contextlib
+import io
+import json
+import random
+import threading
+import time
+from collections import namedtuple
+from collections import OrderedDict
+
+try:
+    _string_types = (basestring,)  # noqa: F821
+except NameError:
+    _string_types = (str,)
+
+
+__all__ = [
+    'TraceContext', 'Span', 'Tracer', 'InMemoryExporter', 'JsonLinesExporter', 'inject', 'extract', 'task_span',
+]
+
+
+HEADER_PREFIX = 'traceparent:'
+"""Starts the header line. The header follows the W3C traceparent format, e.g.
+``traceparent:00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01``.
+"""
+
+
+MAX_PAYLOAD_LENGTH = 32768
+"""The most characters SWF accepts in an input or a result."""
+
+
+TraceContext = namedtuple('TraceContext', 'trace_id span_id')
+"""Identifies a span within a trace. Both ids are lower case hex strings, of 32 and 16 characters."""
+
+
+def inject(payload, context):
+    """Prepends a trace header to a payload. Payloads that are None, or that the header would make longer than
+    :data:`MAX_PAYLOAD_LENGTH`, are left alone.
+    """
+    if payload is None or context is None:
+        return payload
+    injected = '{0}00-{1}-{2}-01\n{3}'.format(HEADER_PREFIX, context.trace_id, context.span_id, payload)
+    if len(injected) > MAX_PAYLOAD_LENGTH:
+        return payload
+    return injected
+
+
+def extract(payload):
+    """Removes the trace header from a payload.
+
+    :return: The trace context, or None if the payload has no header, and the payload without the header.
+    :rtype: tuple
+    """
+    if not isinstance(payload, _string_types) or not payload.startswith(HEADER_PREFIX):
+        return None, payload
+    header, _, rest = payload.partition('\n')
+    parts = header[len(HEADER_PREFIX):].split('-')
+    if len(parts) != 4:
+        return None, payload
+    return TraceContext(trace_id=parts[1], span_id=parts[2]), rest
+
+
+class Span(object):
+    """A timed operation within a trace. Exported when finished.
+
+    :ivar name: What the span measures, e.g. ``poll_for_decision_task``.
+    :ivar context: The :class:`TraceContext` identifying this span.
+    :ivar parent_span_id: The span id of the parent span, or None for the root of a trace.
+    :ivar start: Epoch seconds when the span started.
+    :ivar end: Epoch seconds when the span finished, or None while in progress.
+    :ivar attributes: A dict of freeform values describing the span.
+    """
+
+    def __init__(self, tracer, name, context, parent_span_id, start, attributes):
+        self._tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.start = start
+        self.end = None
+        self.attributes = attributes
+
+    @property
+    def duration(self):
+        return None if self.end is None else self.end - self.start
+
+    def finish(self, end=None, error=None):
+        """Ends the span and exports it. Finishing a span again does nothing.
+
+        :param error: Optional. The exception that ended the span, recorded in its attributes.
+        """
+        if self.end is not None:
+            return
+        self.end = time.time() if end is None else end
+        if error is not None:
+            self.attributes['error'] = '{0}: {1}'.format(type(error).__name__, error)
+        self._tracer.exporter.export(self)
+
+    def as_dict(self):
+        return dict(
+            name=self.name,
+            trace_id=self.context.trace_id,
+            span_id=self.context.span_id,
+            parent_span_id=self.parent_span_id,
+            start=self.start,
+            end=self.end,
+            attributes=self.attributes,
+        )
+
+
+class Tracer(object):
+    """Creates spans and remembers the trace context of the tasks being worked on, by task token.
+
+    :param exporter: Receives every finished span through its ``export(span)`` method.
+    :param max_tracked_tasks: How many task contexts to remember. The oldest are forgotten first, so that tasks
+                              that are never responded to don't accumulate.
+    :type max_tracked_tasks: int
+    """
+
+    def __init__(self, exporter, max_tracked_tasks=10000):
+        self.exporter = exporter
+        self.max_tracked_tasks = max_tracked_tasks
+        self._lock = threading.Lock()
+        self._task_contexts = OrderedDict()
+        self._random = random.Random()
+
+    def start_span(self, name, parent=None, attributes=None, start=None):
+        """Starts a span, in the trace of ``parent`` or in a new trace.
+
+        :param parent: Optional. The context of the parent span.
+        :type parent: TraceContext
+        :param attributes: Optional. Freeform values describing the span.
+        :type attributes: dict
+        :param start: Optional. Epoch seconds when the span started, if not now.
+        :type start: float
+        :rtype: Span
+        """
+        span_id = '{0:016x}'.format(self._random.getrandbits(64))
+        if parent is None:
+            context = TraceContext(trace_id='{0:032x}'.format(self._random.getrandbits(128)), span_id=span_id)
+        else:
+            context = TraceContext(trace_id=parent.trace_id, span_id=span_id)
+        return Span(
+            self,
+            name,
+            context,
+            parent.span_id if parent is not None else None,
+            time.time() if start is None else start,
+            dict(attributes or {}),
+        )
+
+    @contextlib.contextmanager
+    def span(self, name, parent=None, attributes=None):
+        """A context manager running its block in a span. Exceptions are recorded on the span and re-raised."""
+        span = self.start_span(name, parent=parent, attributes=attributes)
+        try:
+            yield span
+        except Exception as e:
+            span.finish(error=e)
+            raise
+        span.finish()
+
+    def context_for(self, task_token):
+        """Returns the context of the span that received a task, or None if the task isn't known."""
+        with self._lock:
+            return self._task_contexts.get(task_token)
+
+    def track(self, task_token, context):
+        with self._lock:
+            self._task_contexts[task_token] = context
+            while len(self._task_contexts) > self.max_tracked_tasks:
+                self._task_contexts.popitem(last=False)
+
+    def untrack(self, task_token):
+        with self._lock:
+            return self._task_contexts.pop(task_token, None)
+
+
+@contextlib.contextmanager
+def task_span(tracer, name, task_token, attributes=None):
+    """A context manager running its block in a span parented to the poll that received a task, e.g. around the
+    task's handler. Yields the span, or None when ``tracer`` is None.
+
+    :param tracer: The tracer of the client that polled the task, or None.
+    :type tracer: :class:`Tracer`
+    """
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, parent=tracer.context_for(task_token), attributes=attributes) as span:
+        yield span
+
+
+class InMemoryExporter(object):
+    """Keeps finished spans in a list. Useful for tests and ad hoc analysis."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def export(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+
+class JsonLinesExporter(object):
+    """Writes every finished span as one line of JSON to a file.
+
+    :param path: The file to append spans to.
+    :type path: string
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = io.open(path, 'a', encoding='utf-8')
+
+    def export(self, span):
+        line = json.dumps(span.as_dict(), sort_keys=True)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def extract_from_events(events):
+    """Finds the most recent trace context in a page of raw history events, and removes the headers.
+
+    Headers are looked for in the ``input`` and ``result`` of the event attributes. Events are not modified;
+    those with a header are copied.
+
+    :param events: Raw events, most recent first.
+    :type events: list of dict
+    :return: The most recent trace context or None, and the events without headers.
+    :rtype: tuple
+    """
+    found = None
+    stripped_events = []
+    for event in events:
+        if not isinstance(event, dict):
+            stripped_events.append(event)
+            continue
+        for key, attributes in event.items():
+            if not key.endswith('EventAttributes'):
+                continue
+            for field in ('input', 'result'):
+                value = attributes.get(field)
+                if value is not None and value.startswith(HEADER_PREFIX):
+                    context, payload = extract(value)
+                    if found is None:
+                        found = context
+                    attributes = dict(attributes)
+                    attributes[field] = payload
+                    event = dict(event)
+                    event[key] = attributes
+        stripped_events.append(event)
+    return found, stripped_events
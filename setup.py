@@ -24,11 +24,14 @@ setup(
     author=py_swf.__author__,
     author_email=py_swf.__email__,
     url='http://py-swf.readthedocs.io/en/latest/',
-    packages=find_packages(exclude=['tests*', 'testing']),
+    packages=find_packages(exclude=['tests*', 'testing', 'benchmarks']),
     install_requires=[
         'boto3',
         'botocore>=1.3.24',
     ],
+    extras_require={
+        'analytics': ['numpy'],
+    },
     zip_safe=False,
     keywords=['py_swf', 'swf', 'amazon', 'workflow'],
     classifiers=[
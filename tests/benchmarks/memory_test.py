@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import pytest
+
+from benchmarks import memory
+
+
+pytest.importorskip('tracemalloc')
+
+
+def test_measure():
+    results = memory.measure(num_events=200, page_size=50)
+
+    assert list(results) == list(memory.MODES)
+    assert results['raw_interned'] < results['raw']
+    assert results['namedtuples_interned'] < results['namedtuples'] < results['raw']
+
+
+def test_main():
+    assert memory.main(['--events', '100', '--page-size', '50']) == 0
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+
+import pytest
+
+from benchmarks import run
+from benchmarks.cases import build_history
+from benchmarks.cases import CASES
+
+
+@pytest.fixture(autouse=True)
+def fast_measurements(monkeypatch):
+    monkeypatch.setattr(run, 'TARGET_SECONDS_PER_REPEAT', 0.001)
+
+
+def results(**mins):
+    return dict(results=dict((name, dict(number=1, min=value, median=value)) for name, value in mins.items()))
+
+
+def test_build_history_has_requested_size():
+    _, _, events = build_history(100)
+
+    assert 94 < len(events) <= 100
+    assert events[0]['eventId'] == len(events)
+
+
+@pytest.mark.parametrize('name', ['nametuplefy_100_events', 'build_activity_task', 'poll_decide_respond_workflow'])
+def test_cases_run(name):
+    result = run.measure(CASES[name], repeat=1)
+
+    assert result['number'] >= 1
+    assert 0 < result['min'] <= result['median']
+
+
+def test_compare():
+    rows = run.compare(results(a=1.0, b=1.0, gone=1.0), results(a=1.05, b=1.5, new=1.0), threshold=0.1)
+
+    assert rows == [
+        ('a', 1.0, 1.05, 1.05, False),
+        ('b', 1.0, 1.5, 1.5, True),
+    ]
+
+
+def test_main_saves_and_compares(tmpdir):
+    baseline = tmpdir.join('baselines', 'main.json')
+
+    assert run.main(['build_workflow_filter_dict', '--repeat', '1', '--save', baseline.strpath]) == 0
+    assert list(json.loads(baseline.read())['results']) == ['build_workflow_filter_dict']
+
+    saved = json.loads(baseline.read())
+    saved['results']['build_workflow_filter_dict']['min'] = 1e-12
+    baseline.write(json.dumps(saved))
+    assert run.main(['build_workflow_filter_dict', '--repeat', '1', '--compare', baseline.strpath]) == 1
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import pytest
+
+from py_swf.analytics import activity_latencies
+from py_swf.analytics import ActivityLatencies
+from py_swf.analytics import history_latencies
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.columnar import EventColumns
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.fake_swf import FakeSWFClient
+
+
+pytest.importorskip('numpy')
+
+
+def event(event_id, event_type, timestamp, **attributes):
+    return {
+        'eventId': event_id,
+        'eventType': event_type,
+        'eventTimestamp': timestamp,
+        event_type[0].lower() + event_type[1:] + 'EventAttributes': attributes,
+    }
+
+
+def activity_run(offset, activity_name, schedule_to_start, start_to_close, completed=True):
+    """Events of a run scheduling one activity, whose decision task was scheduled at ``offset`` and took 1s."""
+    events = [
+        event(1, 'WorkflowExecutionStarted', offset),
+        event(2, 'DecisionTaskScheduled', offset),
+        event(3, 'DecisionTaskStarted', offset + 0.5, scheduledEventId=2),
+        event(4, 'DecisionTaskCompleted', offset + 1, scheduledEventId=2, startedEventId=3),
+        event(
+            5,
+            'ActivityTaskScheduled',
+            offset + 1,
+            activityId='activity_id',
+            activityType={'name': activity_name, 'version': '1.0'},
+            decisionTaskCompletedEventId=4,
+        ),
+        event(6, 'ActivityTaskStarted', offset + 1 + schedule_to_start, scheduledEventId=5),
+    ]
+    if completed:
+        events.append(event(
+            7,
+            'ActivityTaskCompleted',
+            offset + 1 + schedule_to_start + start_to_close,
+            scheduledEventId=5,
+            startedEventId=6,
+        ))
+    return events
+
+
+def make_columns(runs):
+    columns = EventColumns()
+    for i, events in enumerate(runs):
+        columns.extend(columns.add_run('workflow_id', 'run_{0}'.format(i)), events)
+    return columns
+
+
+def test_activity_latencies():
+    columns = make_columns([
+        activity_run(100, 'resize', 2, 10),
+        activity_run(200, 'upload', 1, 3),
+        activity_run(300, 'resize', 4, 20),
+        activity_run(400, 'resize', 6, 0, completed=False),
+    ])
+
+    latencies = activity_latencies(columns, percentiles=(0, 50, 100))
+
+    assert latencies == {
+        ('resize', '1.0'): ActivityLatencies(
+            started=3,
+            completed=2,
+            schedule_to_start={0: 2.0, 50: 4.0, 100: 6.0},
+            start_to_close={0: 10.0, 50: 15.0, 100: 20.0},
+            queue_wait={0: 3.0, 50: 5.0, 100: 7.0},
+        ),
+        ('upload', '1.0'): ActivityLatencies(
+            started=1,
+            completed=1,
+            schedule_to_start={0: 1.0, 50: 1.0, 100: 1.0},
+            start_to_close={0: 3.0, 50: 3.0, 100: 3.0},
+            queue_wait={0: 2.0, 50: 2.0, 100: 2.0},
+        ),
+    }
+
+
+def test_joins_events_by_run():
+    # Both runs use the same event ids; each join must stay within its run.
+    columns = make_columns([activity_run(0, 'resize', 1, 1), activity_run(1000, 'resize', 3, 3)])
+
+    latencies = activity_latencies(columns, percentiles=(100,))[('resize', '1.0')]
+
+    assert latencies.schedule_to_start == {100: 3.0}
+    assert latencies.start_to_close == {100: 3.0}
+
+
+def test_ignores_activities_scheduled_outside_of_the_columns():
+    columns = make_columns([activity_run(0, 'resize', 1, 1)[3:]])
+    columns.extend(columns.add_run('workflow_id', 'partial'), activity_run(0, 'resize', 5, 5)[5:])
+
+    latencies = activity_latencies(columns, percentiles=(100,))[('resize', '1.0')]
+
+    assert latencies.started == latencies.completed == 1
+    assert latencies.schedule_to_start == {100: 1.0}
+    assert latencies.queue_wait == {}
+
+
+def test_without_events():
+    assert activity_latencies(EventColumns()) == {}
+
+
+def test_history_latencies():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf)
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+    activity_task_client = ActivityTaskClient(ActivityTaskConfig('domain', 'task_list'), fake_swf)
+    run_id = workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_client.finish_decision_with_activity(decision_client.poll().task_token, 'id', 'activity', '1.0', 'meow')
+    activity_task_client.finish(activity_task_client.poll().task_token, 'done')
+
+    latencies = history_latencies(decision_client, [('workflow_id', run_id)], percentiles=(50,))
+
+    assert list(latencies) == [('activity', '1.0')]
+    latency = latencies[('activity', '1.0')]
+    assert (latency.started, latency.completed) == (1, 1)
+    assert 0 <= latency.schedule_to_start[50] <= latency.queue_wait[50] < 5
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import os
+
+import mock
+import pytest
+
+from py_swf.bulk_history import BulkHistoryFetcher
+from py_swf.bulk_history import CHECKPOINT_FILE
+from py_swf.bulk_history import export_histories
+from py_swf.bulk_history import RateLimiter
+from py_swf.bulk_history import read_histories
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.fake_swf import FakeSWFClient
+
+
+@pytest.fixture
+def fake_swf():
+    return FakeSWFClient(poll_timeout=0.01)
+
+
+@pytest.fixture
+def decision_client(fake_swf):
+    return DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+
+
+@pytest.fixture
+def executions(fake_swf, decision_client):
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf)
+    executions = []
+    for i in range(10):
+        workflow_id = 'workflow_{0}'.format(i)
+        executions.append((workflow_id, workflow_client.start_workflow('input', workflow_id, 'workflow', '1.0')))
+        decision_client.finish_decision_with_activity(decision_client.poll().task_token, 'id', 'activity', '1.0', '')
+    return executions
+
+
+@pytest.fixture
+def fetcher(decision_client):
+    return BulkHistoryFetcher(decision_client, num_workers=3, maximum_page_size=2)
+
+
+def history(decision_client, execution):
+    return list(decision_client.walk_execution_history(*execution, reverse_order=False, use_raw_event_history=True))
+
+
+class TestRateLimiter(object):
+
+    @pytest.fixture
+    def clock(self):
+        return mock.Mock(return_value=100.0)
+
+    def test_burst_then_rate(self, clock):
+        sleep = mock.Mock()
+        rate_limiter = RateLimiter(rate=2, burst=2, clock=clock, sleep=sleep)
+
+        for _ in range(4):
+            rate_limiter.acquire()
+
+        assert sleep.call_args_list == [mock.call(0.5), mock.call(1.0)]
+
+    def test_refills(self, clock):
+        sleep = mock.Mock()
+        rate_limiter = RateLimiter(rate=1, clock=clock, sleep=sleep)
+        rate_limiter.acquire()
+
+        clock.return_value += 1
+        rate_limiter.acquire()
+
+        assert not sleep.called
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            RateLimiter(rate=0)
+
+
+def test_fetch(fetcher, decision_client, executions):
+    rate_limiter = fetcher.rate_limiter = mock.Mock()
+
+    histories = list(fetcher.fetch(iter(executions)))
+
+    assert sorted((h.workflow_id, h.run_id) for h in histories) == sorted(executions)
+    for h in histories:
+        assert h.events == history(decision_client, (h.workflow_id, h.run_id))
+    assert fetcher.fetched == 10
+    assert fetcher.pages == rate_limiter.acquire.call_count > 10
+
+
+def test_fetch_skips_failures(fetcher, executions):
+    on_error = fetcher.on_error = mock.Mock()
+
+    histories = list(fetcher.fetch(executions[:2] + [('meow', 'meow')]))
+
+    assert len(histories) == 2
+    assert fetcher.failed == 1
+    assert on_error.call_args[0][0] == ('meow', 'meow')
+
+
+def test_fetch_survives_raising_on_error(fetcher, executions):
+    fetcher.on_error = mock.Mock(side_effect=ValueError('meow'))
+    fetcher.num_workers = 1
+
+    histories = list(fetcher.fetch([('meow', 'meow'), ('woof', 'woof')] + executions[:2]))
+
+    assert len(histories) == 2
+    assert fetcher.failed == 2
+
+
+def test_export_and_resume(fetcher, decision_client, executions, tmpdir):
+    directory = tmpdir.join('histories').strpath
+
+    assert export_histories(fetcher, executions[:4], directory, shard_size=3) == 4
+    assert export_histories(fetcher, executions, directory, shard_size=3) == 6
+
+    assert sorted(os.listdir(directory)) == [
+        CHECKPOINT_FILE,
+        'histories-00000.ndjson',
+        'histories-00001.ndjson',
+        'histories-00002.ndjson',
+        'histories-00003.ndjson',
+    ]
+    histories = list(read_histories(directory))
+    assert sorted((h.workflow_id, h.run_id) for h in histories) == sorted(executions)
+    for h in histories:
+        assert h.events == history(decision_client, (h.workflow_id, h.run_id))
+
+
+def test_resume_after_interrupted_checkpoint(fetcher, executions, tmpdir):
+    directory = tmpdir.strpath
+    export_histories(fetcher, executions[:2], directory, compress=True)
+    with open(os.path.join(directory, CHECKPOINT_FILE), 'a') as f:
+        f.write('{"shard": "histories-000')
+
+    assert export_histories(fetcher, executions, directory, compress=True) == 8
+    assert len(list(read_histories(directory))) == 10
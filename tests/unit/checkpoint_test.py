@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import mock
+import pytest
+
+from py_swf.checkpoint import build_checkpoint_marker
+from py_swf.checkpoint import Checkpoint
+from py_swf.checkpoint import checkpoint_execution_context
+from py_swf.checkpoint import decode_state
+from py_swf.checkpoint import encode_state
+from py_swf.checkpoint import find_checkpoint
+from py_swf.checkpoint import load_checkpoint
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.decision import build_activity_task
+from py_swf.clients.decision import build_start_timer
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.decision import DecisionTask
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.fake_swf import FakeSWFClient
+
+
+def marker_event(event_id, state, marker_name='py_swf.checkpoint', completed_event_id=None):
+    attributes = {'markerName': marker_name, 'details': encode_state(state)}
+    if completed_event_id is not None:
+        attributes['decisionTaskCompletedEventId'] = completed_event_id
+    return {'eventId': event_id, 'eventType': 'MarkerRecorded', 'markerRecordedEventAttributes': attributes}
+
+
+def completed_event(event_id, started_event_id, execution_context=None):
+    return {
+        'eventId': event_id,
+        'eventType': 'DecisionTaskCompleted',
+        'decisionTaskCompletedEventAttributes': {
+            'startedEventId': started_event_id,
+            'executionContext': execution_context,
+        },
+    }
+
+
+def timer_event(event_id):
+    return {'eventId': event_id, 'eventType': 'TimerFired', 'timerFiredEventAttributes': {'timerId': 'timer'}}
+
+
+@pytest.mark.parametrize('state', [{'count': 1}, {'items': ['meow'] * 1000}])
+def test_encode_state(state):
+    assert decode_state(encode_state(state)) == state
+
+
+def test_only_large_states_are_compressed():
+    assert encode_state({'count': 1}) == '{"count":1}'
+    assert encode_state({'items': ['meow'] * 1000}).startswith('zlib:')
+
+
+class TestFindCheckpoint(object):
+
+    def test_marker(self):
+        events = [timer_event(5), timer_event(4), marker_event(3, 'new'), marker_event(2, 'old')]
+
+        assert find_checkpoint(events) == (Checkpoint('new', 3), [timer_event(4), timer_event(5)])
+
+    def test_execution_context(self):
+        completed = {
+            'eventId': 3,
+            'eventType': 'DecisionTaskCompleted',
+            'decisionTaskCompletedEventAttributes': {'executionContext': checkpoint_execution_context([1, 2])},
+        }
+
+        assert find_checkpoint([timer_event(4), completed]) == (Checkpoint([1, 2], 3), [timer_event(4)])
+
+    def test_replays_events_since_decision_started(self):
+        events = [
+            timer_event(7),
+            marker_event(6, 'state', completed_event_id=4),
+            timer_event(5),
+            completed_event(4, 2),
+            timer_event(3),
+            {'eventId': 2, 'eventType': 'DecisionTaskStarted'},
+            marker_event(1, 'old'),
+        ]
+
+        assert find_checkpoint(events) == (
+            Checkpoint('state', 6),
+            [timer_event(3), completed_event(4, 2), timer_event(5), timer_event(7)],
+        )
+
+    def test_execution_context_replays_events_since_decision_started(self):
+        def events():
+            yield timer_event(5)
+            yield completed_event(4, 2, execution_context=checkpoint_execution_context('state'))
+            yield timer_event(3)
+            raise AssertionError('Consumed past the decision')
+
+        assert find_checkpoint(events()) == (Checkpoint('state', 4), [timer_event(3), timer_event(5)])
+
+    def test_ignores_other_markers_and_contexts(self):
+        completed = {
+            'eventId': 2,
+            'eventType': 'DecisionTaskCompleted',
+            'decisionTaskCompletedEventAttributes': {'executionContext': 'meow'},
+        }
+        events = [marker_event(3, 'other', marker_name='other'), completed]
+
+        assert find_checkpoint(events) == (None, events[::-1])
+
+    def test_stops_consuming_at_checkpoint(self):
+        def events():
+            yield timer_event(2)
+            yield marker_event(1, 'state')
+            raise AssertionError('Consumed past the checkpoint')
+
+        assert find_checkpoint(events())[0] == Checkpoint('state', 1)
+
+
+class TestLoadCheckpoint(object):
+
+    @pytest.fixture
+    def decision_client(self):
+        return mock.Mock()
+
+    def make_task(self, events):
+        return DecisionTask(events, 'task_token', 'workflow_id', 'run_id', {'name': 'workflow', 'version': '1.0'})
+
+    def test_checkpoint_in_task(self, decision_client):
+        task = self.make_task([timer_event(3), marker_event(2, 'state')])
+
+        assert load_checkpoint(decision_client, task) == (Checkpoint('state', 2), [timer_event(3)])
+        assert not decision_client.walk_older_events.called
+
+    def test_checkpoint_in_older_events(self, decision_client):
+        task = self.make_task([timer_event(4), timer_event(3)])
+        decision_client.walk_older_events.return_value = iter([timer_event(2), marker_event(1, 'state')])
+
+        assert load_checkpoint(decision_client, task, use_raw_event_history=True) == (
+            Checkpoint('state', 1),
+            [timer_event(2), timer_event(3), timer_event(4)],
+        )
+        decision_client.walk_older_events.assert_called_once_with(task, use_raw_event_history=True)
+
+    def test_stops_walking_at_checkpoint(self, decision_client):
+        def older_events():
+            yield timer_event(2)
+            yield marker_event(1, 'state')
+            raise AssertionError('Walked past the checkpoint')
+        task = self.make_task([timer_event(3)])
+        decision_client.walk_older_events.return_value = older_events()
+
+        assert load_checkpoint(decision_client, task)[0] == Checkpoint('state', 1)
+
+    def test_walks_back_to_decision_started(self, decision_client):
+        task = self.make_task([timer_event(8), completed_event(7, 4), marker_event(6, 'state', completed_event_id=5)])
+        decision_client.walk_older_events.return_value = iter([
+            completed_event(5, 3),
+            timer_event(4),
+            {'eventId': 3, 'eventType': 'DecisionTaskStarted'},
+        ])
+
+        assert load_checkpoint(decision_client, task) == (
+            Checkpoint('state', 6),
+            [timer_event(4), completed_event(5, 3), completed_event(7, 4), timer_event(8)],
+        )
+
+    def test_task_with_whole_history(self, decision_client):
+        task = self.make_task([timer_event(2), timer_event(1)])
+        decision_client.walk_older_events.return_value = iter([])
+
+        assert load_checkpoint(decision_client, task) == (None, [timer_event(1), timer_event(2)])
+
+
+def test_checkpoint_round_trip():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf).start_workflow(
+        'input', 'workflow_id', 'workflow', '1.0',
+    )
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+
+    decision_client.finish_decision(
+        decision_client.poll().task_token,
+        [build_checkpoint_marker({'step': 1}), build_start_timer('timer', 0)],
+    )
+    task = decision_client.poll()
+    checkpoint, events = load_checkpoint(decision_client, task)
+
+    assert checkpoint.state == {'step': 1}
+    assert [event.eventType for event in events] == [
+        'DecisionTaskCompleted',
+        'TimerStarted',
+        'TimerFired',
+        'DecisionTaskScheduled',
+        'DecisionTaskStarted',
+    ]
+
+
+def test_checkpoint_keeps_events_recorded_while_deciding():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf).start_workflow(
+        'input', 'workflow_id', 'workflow', '1.0',
+    )
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+    activity_client = ActivityTaskClient(ActivityTaskConfig('domain', 'task_list'), fake_swf)
+
+    decision_client.finish_decision(
+        decision_client.poll().task_token,
+        [build_activity_task('activity_id', 'activity', '1.0', 'input', decision_client.decision_config, 5, 5, 5, 5),
+         build_start_timer('timer', 0)],
+    )
+    activity_task = activity_client.poll()
+    task = decision_client.poll()
+    # The activity completes while the decider is checkpointing the state it rebuilt from the task's events.
+    activity_client.finish(activity_task.task_token, 'result')
+    decision_client.finish_decision(task.task_token, [build_checkpoint_marker({'step': 2})])
+
+    checkpoint, events = load_checkpoint(decision_client, decision_client.poll())
+
+    assert checkpoint.state == {'step': 2}
+    assert [event.eventType for event in events] == [
+        'ActivityTaskCompleted',
+        'DecisionTaskScheduled',
+        'DecisionTaskCompleted',
+        'DecisionTaskStarted',
+    ]
+
+
+def test_checkpoint_in_older_pages_of_the_poll():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf).start_workflow(
+        'input', 'workflow_id', 'workflow', '1.0',
+    )
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+    decision_client.finish_decision(
+        decision_client.poll().task_token,
+        [build_checkpoint_marker({'step': 1}), build_start_timer('timer', 0)],
+    )
+    poll = fake_swf.poll_for_decision_task
+    fake_swf.poll_for_decision_task = mock.Mock(side_effect=lambda **kwargs: poll(maximumPageSize=2, **kwargs))
+    fake_swf.get_workflow_execution_history = mock.Mock()
+
+    task = decision_client.poll()
+    checkpoint, events = load_checkpoint(decision_client, task)
+
+    assert len(task.events) == 2
+    assert checkpoint.state == {'step': 1}
+    assert [event.eventType for event in events] == [
+        'DecisionTaskCompleted',
+        'TimerStarted',
+        'TimerFired',
+        'DecisionTaskScheduled',
+        'DecisionTaskStarted',
+    ]
+    # The poll and two more pages down to the checkpoint's decision; the first page is never fetched again and
+    # the 3 oldest events are never fetched at all.
+    assert fake_swf.poll_for_decision_task.call_count == 3
+    assert not fake_swf.get_workflow_execution_history.called
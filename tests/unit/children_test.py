@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import mock
+import pytest
+
+from py_swf.children import Child
+from py_swf.children import ChildWorkflows
+from py_swf.children import FanOut
+from py_swf.children import load_children
+from py_swf.clients.decision import build_start_child_workflow
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.decision import DecisionTask
+from py_swf.clients.decision import nametuplefy
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.fake_swf import FakeSWFClient
+
+
+def initiated(event_id, workflow_id, control=None):
+    attributes = {'workflowId': workflow_id, 'workflowType': {'name': 'child', 'version': '1.0'}}
+    if control is not None:
+        attributes['control'] = control
+    return {
+        'eventId': event_id,
+        'eventType': 'StartChildWorkflowExecutionInitiated',
+        'startChildWorkflowExecutionInitiatedEventAttributes': attributes,
+    }
+
+
+def child_event(event_id, event_type, workflow_id, **attributes):
+    attributes['workflowExecution'] = {'workflowId': workflow_id, 'runId': 'run-' + workflow_id}
+    return {
+        'eventId': event_id,
+        'eventType': event_type,
+        event_type[0].lower() + event_type[1:] + 'EventAttributes': attributes,
+    }
+
+
+def start_failed(event_id, workflow_id):
+    return {
+        'eventId': event_id,
+        'eventType': 'StartChildWorkflowExecutionFailed',
+        'startChildWorkflowExecutionFailedEventAttributes': {
+            'workflowId': workflow_id,
+            'cause': 'WORKFLOW_ALREADY_RUNNING',
+        },
+    }
+
+
+def timer_event(event_id):
+    return {'eventId': event_id, 'eventType': 'TimerFired', 'timerFiredEventAttributes': {'timerId': 'timer'}}
+
+
+@pytest.fixture
+def events():
+    return [
+        initiated(1, 'a', control='meow'),
+        initiated(2, 'b'),
+        initiated(3, 'c'),
+        initiated(4, 'd'),
+        child_event(5, 'ChildWorkflowExecutionStarted', 'a'),
+        child_event(6, 'ChildWorkflowExecutionStarted', 'b'),
+        start_failed(7, 'd'),
+        child_event(8, 'ChildWorkflowExecutionCompleted', 'a', result='result'),
+        child_event(9, 'ChildWorkflowExecutionFailed', 'b', reason='reason', details='details'),
+        timer_event(10),
+    ]
+
+
+class TestChildWorkflows(object):
+
+    @pytest.mark.parametrize('convert', [lambda events: events, nametuplefy])
+    def test_statuses(self, events, convert):
+        children = ChildWorkflows(convert(events[::-1]))
+
+        assert list(children) == [
+            Child('a', 'run-a', 'COMPLETED', 'result', None, None, 'meow'),
+            Child('b', 'run-b', 'FAILED', None, 'reason', 'details', None),
+            Child('c', None, 'INITIATED', None, None, None, None),
+            Child('d', None, 'START_FAILED', None, 'WORKFLOW_ALREADY_RUNNING', None, None),
+        ]
+        assert [child.workflow_id for child in children.open] == ['c']
+        assert [child.workflow_id for child in children.closed] == ['a', 'b', 'd']
+        assert children.last_event_id == 10
+
+    def test_update_skips_indexed_events(self, events):
+        children = ChildWorkflows(events[:6])
+        children.update(events[4:])
+
+        assert children.get('a').status == 'COMPLETED'
+        assert children.last_event_id == 10
+
+    def test_reused_workflow_id(self, events):
+        children = ChildWorkflows(events + [initiated(11, 'b')])
+
+        assert children.get('b') == Child('b', None, 'INITIATED', None, None, None, None)
+        assert [child.workflow_id for child in children] == ['a', 'c', 'd', 'b']
+
+
+class TestFanOut(object):
+
+    def make_fan_out(self, count, **kwargs):
+        return FanOut(
+            [build_start_child_workflow('child-{0}'.format(i), 'child', '1.0', 'input') for i in range(count)],
+            **kwargs
+        )
+
+    def workflow_ids(self, decisions):
+        return [decision['startChildWorkflowExecutionDecisionAttributes']['workflowId'] for decision in decisions]
+
+    def test_batches_within_max_decisions(self):
+        fan_out = self.make_fan_out(5, max_decisions=2)
+
+        assert self.workflow_ids(fan_out.decisions(ChildWorkflows())) == ['child-0', 'child-1']
+        assert self.workflow_ids(fan_out.decisions(ChildWorkflows(), reserved=1)) == ['child-0']
+
+    def test_batches_within_max_open(self):
+        fan_out = self.make_fan_out(5, max_open=3)
+        children = ChildWorkflows([initiated(1, 'child-0'), initiated(2, 'child-1')])
+
+        assert self.workflow_ids(fan_out.decisions(children)) == ['child-2']
+
+        children.update([child_event(3, 'ChildWorkflowExecutionCompleted', 'child-0'), initiated(4, 'child-2')])
+        assert self.workflow_ids(fan_out.decisions(children)) == ['child-3']
+
+        children.update([initiated(5, 'child-3')])
+        assert fan_out.decisions(children) == []
+
+    def test_fan_in(self):
+        fan_out = self.make_fan_out(3)
+        children = ChildWorkflows([initiated(1, 'child-0'), initiated(2, 'child-1'), initiated(3, 'child-2')])
+        children.update([
+            child_event(4, 'ChildWorkflowExecutionCompleted', 'child-2', result='2'),
+            child_event(5, 'ChildWorkflowExecutionTerminated', 'child-1'),
+        ])
+
+        assert not fan_out.done(children)
+        assert fan_out.pending(children) == ['child-0']
+
+        children.update([child_event(6, 'ChildWorkflowExecutionCompleted', 'child-0', result='0')])
+        assert fan_out.done(children)
+        assert list(fan_out.results(children).items()) == [('child-0', '0'), ('child-2', '2')]
+        assert [child.workflow_id for child in fan_out.failures(children)] == ['child-1']
+
+
+class TestLoadChildren(object):
+
+    def make_task(self, events):
+        return DecisionTask(events, 'task_token', 'workflow_id', 'run_id', {'name': 'workflow', 'version': '1.0'})
+
+    def test_whole_history_in_task(self, events):
+        decision_client = mock.Mock()
+
+        children = load_children(decision_client, self.make_task(events[::-1]))
+
+        assert len(children) == 4
+        assert not decision_client.walk_execution_history.called
+
+    def test_walks_history_down_to_indexed_events(self, events):
+        decision_client = mock.Mock()
+        decision_client.walk_execution_history.return_value = iter(events[7:3:-1])
+        children = ChildWorkflows(events[:4])
+
+        assert load_children(decision_client, self.make_task(events[9:7:-1]), children=children) is children
+        assert children.get('a').status == 'COMPLETED'
+        assert children.last_event_id == 10
+
+        kwargs = decision_client.walk_execution_history.call_args[1]
+        assert kwargs['reverse_order'] and kwargs['use_raw_event_history']
+        assert not kwargs['predicate'](timer_event(10))
+        assert [kwargs['stop'](event) for event in (events[5], events[4])] == [False, True]
+
+
+def test_fan_out_with_fake_swf():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf)
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+    workflow_client.start_workflow('input', 'parent', 'parent', '1.0')
+    fan_out = FanOut(
+        [
+            build_start_child_workflow('child-{0}'.format(i), 'child', '1.0', str(i), task_list='children')
+            for i in range(5)
+        ],
+        max_decisions=2,
+    )
+    child_decision_client = DecisionClient(DecisionConfig('domain', 'children', 5, 5, 5, 5), fake_swf)
+
+    children = ChildWorkflows()
+    responses = 0
+    while True:
+        task = decision_client.poll()
+        children = load_children(decision_client, task, children=children)
+        if fan_out.done(children):
+            decision_client.finish_workflow(task.task_token, ','.join(fan_out.results(children).values()))
+            break
+        decision_client.finish_decision(task.task_token, fan_out.decisions(children))
+        responses += 1
+        # Children complete as soon as they start, echoing their input.
+        for child_task in child_decision_client.iter_tasks(max_polls=5):
+            child_decision_client.finish_workflow(
+                child_task.task_token,
+                child_task.events[-1].workflowExecutionStartedEventAttributes.input,
+            )
+
+    history = list(decision_client.walk_execution_history('parent', task.workflow_run_id, reverse_order=False))
+    assert history[-1].workflowExecutionCompletedEventAttributes.result == '0,1,2,3,4'
+    assert len(children) == 5
+    assert responses >= 3
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import warnings
+
+import mock
+import pytest
+
+from py_swf import client_factory
+from py_swf.client_factory import BotoClientFactory
+from py_swf.client_factory import build_boto_client
+from py_swf.client_factory import warm_connections
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.decision import DecisionClient
+
+
+@pytest.fixture
+def session():
+    return mock.Mock()
+
+
+def test_build_boto_client_sizes_pool_for_concurrency(session):
+    boto_client = build_boto_client(max_concurrency=50, region_name='us-west-2', session=session)
+
+    assert boto_client is session.client.return_value
+    args, kwargs = session.client.call_args
+    assert args == ('swf',)
+    assert kwargs['region_name'] == 'us-west-2'
+    config = kwargs['config']
+    assert config.max_pool_connections == 50 + client_factory.POOL_HEADROOM
+    assert config.read_timeout > client_factory.LONG_POLL_SECONDS
+
+
+def test_build_boto_client_passes_config_kwargs(session):
+    build_boto_client(session=session, retries={'max_attempts': 0})
+
+    assert session.client.call_args[1]['config'].retries == {'max_attempts': 0}
+
+
+def test_build_boto_client_warns_on_short_read_timeout(session):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        build_boto_client(session=session, read_timeout=30)
+
+    assert len(caught) == 1
+
+
+def test_warm_connections_makes_concurrent_calls():
+    boto_client = mock.Mock()
+    boto_client.list_domains.side_effect = [{}, Exception('meow'), {}]
+
+    warm_connections(boto_client, 3)
+
+    assert boto_client.list_domains.call_count == 3
+
+
+class TestBotoClientFactory(object):
+
+    @pytest.fixture
+    def build(self):
+        with mock.patch.object(client_factory, 'build_boto_client', side_effect=lambda **kwargs: mock.Mock()) as build:
+            yield build
+
+    def test_get_builds_once(self, build):
+        factory = BotoClientFactory(max_concurrency=20, region_name='us-west-2')
+
+        assert factory.get() is factory.get()
+        build.assert_called_once_with(max_concurrency=20, region_name='us-west-2')
+
+    def test_get_rebuilds_after_fork(self, build):
+        factory = BotoClientFactory()
+        parent_client = factory.get()
+
+        with mock.patch.object(client_factory.os, 'getpid', return_value=-1):
+            child_client = factory.get()
+
+        assert child_client is not parent_client
+        assert build.call_count == 2
+
+    def test_get_warms_connections(self, build):
+        factory = BotoClientFactory(max_concurrency=5, warm=True)
+
+        with mock.patch.object(client_factory, 'warm_connections') as warm:
+            boto_client = factory.get()
+
+        warm.assert_called_once_with(boto_client, 5)
+
+    def test_clients_share_boto_client(self, build):
+        factory = BotoClientFactory()
+        retry_policy = mock.Mock()
+
+        decision_client = factory.decision_client(mock.Mock(), retry_policy=retry_policy)
+        activity_task_client = factory.activity_task_client(mock.Mock())
+
+        assert isinstance(decision_client, DecisionClient)
+        assert isinstance(activity_task_client, ActivityTaskClient)
+        assert decision_client.boto_client is activity_task_client.boto_client is factory.get()
+        assert decision_client.retry_policy is retry_policy
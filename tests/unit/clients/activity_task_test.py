@@ -2,6 +2,8 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import threading
+
 import mock
 import pytest
 from botocore.vendored.requests.exceptions import ReadTimeout
@@ -9,6 +11,7 @@ from botocore.vendored.requests.exceptions import ReadTimeout
 from py_swf.clients.activity_task import ActivityTask
 from py_swf.clients.activity_task import ActivityTaskClient
 from py_swf.errors import NoTaskFound
+from py_swf.sharding import ShardedTaskList
 from testing.util import DictMock
 
 
@@ -72,11 +75,41 @@ class TestPolling:
             },
         )
 
+    def test_deadline(self, activity_task_config, boto_client):
+        activity_task_client = ActivityTaskClient(activity_task_config, boto_client, start_to_close_timeout=30)
+        task = activity_task_client.poll()
+
+        assert task.deadline.timeout == 30
+        assert 29 < task.deadline.remaining() <= 30
+
+    def test_deadline_without_timeout(self, activity_task_client):
+        assert activity_task_client.poll().deadline.expires_at is None
+
     def test_poll_timeout(self, activity_task_client, boto_client):
         boto_client.poll_for_activity_task.side_effect = ReadTimeout
         with pytest.raises(NoTaskFound):
             activity_task_client.poll()
 
+    def test_iter_tasks_skips_empty_polls(self, expected_activity_task, activity_task_client, boto_client):
+        boto_client.poll_for_activity_task.side_effect = [
+            ReadTimeout(),
+            {'startedEventId': 0},
+            boto_client.poll_for_activity_task.return_value,
+        ]
+
+        assert list(activity_task_client.iter_tasks(identity='meow', max_polls=3)) == [expected_activity_task]
+        assert activity_task_client.poll_stats.snapshot() == {'timed_out_polls': 1, 'empty_polls': 1, 'tasks': 1}
+
+    def test_poll_forever_stops_on_shutdown(self, activity_task_client, boto_client):
+        shutdown = threading.Event()
+        tasks = activity_task_client.poll_forever(shutdown=shutdown)
+
+        next(tasks)
+        shutdown.set()
+
+        assert list(tasks) == []
+        assert boto_client.poll_for_activity_task.call_count == 1
+
 
 class TestPollingWithBadResults:
     @pytest.fixture(autouse=True)
@@ -99,6 +132,23 @@ class TestPollingWithBadResults:
             activity_task_client.poll()
 
 
+def test_count_pending(activity_task_config, activity_task_client, boto_client):
+    boto_client.count_pending_activity_tasks.return_value = {'count': 3, 'truncated': False}
+
+    assert activity_task_client.count_pending() == 3
+    boto_client.count_pending_activity_tasks.assert_called_once_with(
+        domain=activity_task_config.domain,
+        taskList={'name': activity_task_config.task_list},
+    )
+
+
+def test_count_pending_sums_shards(activity_task_config, activity_task_client, boto_client):
+    activity_task_config.task_list = ShardedTaskList('task_list', 3)
+    boto_client.count_pending_activity_tasks.return_value = {'count': 2, 'truncated': False}
+
+    assert activity_task_client.count_pending() == 6
+
+
 def test_finish(activity_task_client, boto_client):
     task_token = mock.Mock()
     result = mock.Mock()
@@ -132,3 +182,17 @@ def test_fail_without_detail(activity_task_client, boto_client):
         reason=reason,
         taskToken=task_token,
     )
+
+
+def test_finish_with_retry_policy(activity_task_config, boto_client):
+    retry_policy = mock.Mock()
+    activity_task_client = ActivityTaskClient(activity_task_config, boto_client, retry_policy=retry_policy)
+    activity_task_client.finish('task_token', 'result', deadline=123)
+
+    retry_policy.call.assert_called_once_with(
+        boto_client.respond_activity_task_completed,
+        'respond_activity_task_completed',
+        deadline=123,
+        result='result',
+        taskToken='task_token',
+    )
@@ -2,6 +2,8 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import json
+
 import pytest
 from botocore.exceptions import ClientError
 
@@ -14,6 +16,17 @@ def workflow_registrar(boto_client):
     return WorkflowRegistrar(boto_client)
 
 
+def mock_listing(method, items_field, items_by_status):
+    """Mocks an SWF listing returning one of the items of the listed registration status per page."""
+    def listing(registrationStatus, nextPageToken=0, **kwargs):
+        items = items_by_status.get(registrationStatus, [])
+        page = {items_field: items[nextPageToken:nextPageToken + 1]}
+        if nextPageToken + 1 < len(items):
+            page['nextPageToken'] = nextPageToken + 1
+        return page
+    method.side_effect = listing
+
+
 @pytest.mark.parametrize('error_code', ['DomainAlreadyExistsFault', 'TypeAlreadyExistsFault'])
 def test_idempotent_create_whitelist(error_code):
     err = ClientError(error_response={'Error': {'Code': error_code}}, operation_name='meowing')
@@ -155,3 +168,159 @@ def test_register_workflow_type_default(workflow_registrar, boto_client):
         name='name',
         version='version',
     )
+
+
+class TestRegisterManifest:
+
+    @pytest.fixture
+    def manifest(self):
+        return {
+            'domains': [{'name': 'domain', 'retention': 10}],
+            'activity_types': [
+                {'domain': 'domain', 'name': 'existing_activity', 'version': '1'},
+                {'domain': 'domain', 'name': 'new_activity', 'version': '1', 'task_list_name': 'task_list'},
+            ],
+            'workflow_types': [
+                {'domain': 'domain', 'name': 'new_workflow', 'version': '2'},
+            ],
+        }
+
+    @pytest.fixture(autouse=True)
+    def patch_listings(self, boto_client):
+        mock_listing(boto_client.list_domains, 'domainInfos', {'REGISTERED': [{'name': 'domain'}]})
+        mock_listing(boto_client.list_activity_types, 'typeInfos', {
+            'REGISTERED': [
+                {'activityType': {'name': 'other_activity', 'version': '1'}},
+                {'activityType': {'name': 'existing_activity', 'version': '1'}},
+            ],
+        })
+        mock_listing(boto_client.list_workflow_types, 'typeInfos', {})
+
+    def test_registers_only_missing_types(self, workflow_registrar, boto_client, manifest):
+        result = workflow_registrar.register_manifest(manifest)
+
+        assert sorted(result.registered) == [
+            ('activity_type', 'domain', 'new_activity', '1'),
+            ('workflow_type', 'domain', 'new_workflow', '2'),
+        ]
+        assert sorted(result.already_registered) == [
+            ('activity_type', 'domain', 'existing_activity', '1'),
+            ('domain', 'domain'),
+        ]
+        assert not boto_client.register_domain.called
+        boto_client.register_activity_type.assert_called_once_with(
+            domain='domain',
+            name='new_activity',
+            version='1',
+            defaultTaskList={'name': 'task_list'},
+        )
+        boto_client.register_workflow_type.assert_called_once_with(
+            domain='domain',
+            name='new_workflow',
+            version='2',
+        )
+        assert boto_client.list_activity_types.call_args_list[1][1]['nextPageToken'] == 1
+        assert result.deprecated == []
+
+    def test_registers_missing_domain(self, workflow_registrar, boto_client):
+        mock_listing(boto_client.list_domains, 'domainInfos', {})
+
+        result = workflow_registrar.register_manifest({'domains': [{'name': 'domain', 'retention': 10}]})
+
+        assert result.registered == [('domain', 'domain')]
+        boto_client.register_domain.assert_called_once_with(
+            name='domain',
+            workflowExecutionRetentionPeriodInDays='10',
+        )
+
+    def test_types_of_missing_domain_are_not_listed(self, workflow_registrar, boto_client, manifest):
+        mock_listing(boto_client.list_domains, 'domainInfos', {})
+
+        result = workflow_registrar.register_manifest(manifest)
+
+        assert len(result.registered) == 4
+        assert result.already_registered == []
+        assert not boto_client.list_activity_types.called
+        assert not boto_client.list_workflow_types.called
+
+    def test_deprecated_types_are_reported_apart(self, workflow_registrar, boto_client, manifest, tmpdir):
+        cache_path = tmpdir.join('registered.json').strpath
+        mock_listing(boto_client.list_workflow_types, 'typeInfos', {
+            'DEPRECATED': [{'workflowType': {'name': 'new_workflow', 'version': '2'}}],
+        })
+
+        result = workflow_registrar.register_manifest(manifest, cache_path=cache_path)
+
+        assert result.deprecated == [('workflow_type', 'domain', 'new_workflow', '2')]
+        assert ('workflow_type', 'domain', 'new_workflow', '2') not in result.already_registered
+        assert not boto_client.register_workflow_type.called
+
+        boto_client.reset_mock()
+        result = workflow_registrar.register_manifest(manifest, cache_path=cache_path)
+
+        assert result.deprecated == [('workflow_type', 'domain', 'new_workflow', '2')]
+        assert boto_client.list_workflow_types.called
+
+    def test_types_of_undeclared_unknown_domain(self, workflow_registrar, boto_client):
+        boto_client.list_activity_types.side_effect = ClientError(
+            error_response={'Error': {'Code': 'UnknownResourceFault'}},
+            operation_name='ListActivityTypes',
+        )
+        boto_client.register_activity_type.side_effect = ClientError(
+            error_response={'Error': {'Code': 'UnknownResourceFault'}},
+            operation_name='RegisterActivityType',
+        )
+        manifest = {
+            'activity_types': [{'domain': 'unknown_domain', 'name': 'activity', 'version': '1'}],
+            'workflow_types': [{'domain': 'domain', 'name': 'workflow', 'version': '1'}],
+        }
+
+        with pytest.raises(ClientError) as excinfo:
+            workflow_registrar.register_manifest(manifest)
+
+        assert excinfo.value.operation_name == 'RegisterActivityType'
+        boto_client.register_workflow_type.assert_called_once_with(domain='domain', name='workflow', version='1')
+
+    def test_failed_registration_caches_the_others(self, workflow_registrar, boto_client, manifest, tmpdir):
+        cache_path = tmpdir.join('registered.json').strpath
+        boto_client.register_workflow_type.side_effect = ClientError(
+            error_response={'Error': {'Code': 'LimitExceededFault'}},
+            operation_name='RegisterWorkflowType',
+        )
+
+        with pytest.raises(ClientError):
+            workflow_registrar.register_manifest(manifest, cache_path=cache_path)
+
+        boto_client.reset_mock()
+        boto_client.register_workflow_type.side_effect = None
+        result = workflow_registrar.register_manifest(manifest, cache_path=cache_path)
+
+        assert result.registered == [('workflow_type', 'domain', 'new_workflow', '2')]
+        assert not boto_client.register_activity_type.called
+
+    def test_warm_cache_makes_no_calls(self, workflow_registrar, boto_client, manifest, tmpdir):
+        cache_path = tmpdir.join('registered.json').strpath
+        workflow_registrar.register_manifest(manifest, cache_path=cache_path)
+        boto_client.reset_mock()
+
+        result = workflow_registrar.register_manifest(manifest, cache_path=cache_path)
+
+        assert result.registered == []
+        assert len(result.already_registered) == 4
+        assert boto_client.method_calls == []
+
+    def test_corrupt_cache_is_ignored(self, workflow_registrar, manifest, tmpdir):
+        cache = tmpdir.join('registered.json')
+        cache.write('not json')
+
+        result = workflow_registrar.register_manifest(manifest, cache_path=cache.strpath)
+
+        assert len(result.registered) == 2
+
+    def test_manifest_from_file(self, workflow_registrar, manifest, tmpdir):
+        manifest_file = tmpdir.join('manifest.json')
+        manifest_file.write(json.dumps(manifest))
+
+        result = workflow_registrar.register_manifest(manifest_file.strpath)
+
+        assert len(result.registered) == 2
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import mock
+import pytest
+from botocore.exceptions import ClientError
+from botocore.vendored.requests.exceptions import ReadTimeout
+
+from py_swf.clients.base import BaseClient
+
+
+class FakeClient(BaseClient):
+
+    def __init__(self, boto_client, retry_policy=None):
+        self.boto_client = boto_client
+        self.retry_policy = retry_policy
+
+
+def test_call_without_retry_policy(boto_client):
+    result = FakeClient(boto_client)._call('count_pending_activity_tasks', domain='domain')
+
+    assert result == boto_client.count_pending_activity_tasks.return_value
+    boto_client.count_pending_activity_tasks.assert_called_once_with(domain='domain')
+
+
+def test_call_with_retry_policy(boto_client):
+    retry_policy = mock.Mock()
+
+    result = FakeClient(boto_client, retry_policy)._call('count_pending_activity_tasks', deadline=5, domain='domain')
+
+    assert result == retry_policy.call.return_value
+    retry_policy.call.assert_called_once_with(
+        boto_client.count_pending_activity_tasks,
+        'count_pending_activity_tasks',
+        deadline=5,
+        domain='domain',
+    )
+
+
+class TestInstrumentation:
+
+    @pytest.fixture
+    def instrumentation(self):
+        return mock.Mock()
+
+    @pytest.fixture
+    def client(self, boto_client, instrumentation):
+        client = FakeClient(boto_client)
+        client.instrumentation = instrumentation
+        return client
+
+    def recorded(self, instrumentation):
+        (call_record,), _ = instrumentation.record.call_args
+        return call_record
+
+    def test_records_poll(self, client, boto_client, instrumentation):
+        boto_client.poll_for_decision_task.return_value = {
+            'taskToken': 'token',
+            'events': [{}, {}],
+            'ResponseMetadata': {'HTTPHeaders': {'content-length': '42'}},
+        }
+
+        client._call('poll_for_decision_task', domain='domain', taskList={'name': 'task_list'})
+
+        call_record = self.recorded(instrumentation)
+        assert call_record.api_name == 'poll_for_decision_task'
+        assert call_record.domain == 'domain'
+        assert call_record.task_list == 'task_list'
+        assert call_record.duration >= 0
+        assert call_record.request_bytes == len('domain') + len('task_list')
+        assert call_record.response_bytes == 42
+        assert call_record.event_count == 2
+        assert call_record.outcome == 'ok'
+
+    def test_records_empty_poll(self, client, boto_client, instrumentation):
+        boto_client.poll_for_activity_task.return_value = {'startedEventId': 0}
+
+        client._call('poll_for_activity_task', domain='domain', taskList={'name': 'task_list'})
+
+        assert self.recorded(instrumentation).outcome == 'no_task'
+
+    @pytest.mark.parametrize(('error', 'outcome'), [
+        (ReadTimeout(), 'no_task'),
+        (ClientError(error_response={'Error': {'Code': 'ThrottlingException'}}, operation_name='op'), 'throttled'),
+        (ValueError(), 'error'),
+    ])
+    def test_records_errors(self, client, boto_client, instrumentation, error, outcome):
+        boto_client.respond_activity_task_completed.side_effect = error
+
+        with pytest.raises(type(error)):
+            client._call('respond_activity_task_completed', taskToken='token', result='result')
+
+        call_record = self.recorded(instrumentation)
+        assert call_record.outcome == outcome
+        assert call_record.domain is None
+        assert call_record.task_list is None
+        assert call_record.event_count is None
+
+    def test_recording_errors_do_not_change_the_result(self, client, boto_client, instrumentation):
+        instrumentation.record.side_effect = IOError('meow')
+        boto_client.poll_for_decision_task.return_value = {'taskToken': 'token', 'events': []}
+
+        assert client._call('poll_for_decision_task', domain='domain') == {'taskToken': 'token', 'events': []}
+
+    def test_recording_errors_do_not_hide_the_call_error(self, client, boto_client, instrumentation):
+        instrumentation.record.side_effect = IOError('meow')
+        boto_client.respond_activity_task_completed.side_effect = ValueError()
+
+        with pytest.raises(ValueError):
+            client._call('respond_activity_task_completed', taskToken='token', result='result')
@@ -2,16 +2,29 @@
 from __future__ import absolute_import
 from __future__ import unicode_literals
 
+import json
+import pickle
+import threading
+import time
 from collections import namedtuple
 
 import mock
 import pytest
 from botocore.vendored.requests.exceptions import ReadTimeout
 
+from py_swf.clients.decision import _STICKY_ACTIVITY_CONTROL
+from py_swf.clients.decision import build_start_child_workflow
 from py_swf.clients.decision import DecisionClient
 from py_swf.clients.decision import DecisionTask
+from py_swf.clients.decision import event_types
+from py_swf.clients.decision import host_task_list
 from py_swf.clients.decision import nametuplefy
+from py_swf.clients.decision import stop_at_event_id
+from py_swf.clients.decision import stop_at_event_types
+from py_swf.clients.decision import sticky_activity_fallbacks
+from py_swf.config_definitions import StickyConfig
 from py_swf.errors import NoTaskFound
+from py_swf.sharding import ShardedTaskList
 from testing.util import DictMock
 
 
@@ -64,6 +77,20 @@ class TestNametuplefy:
         result = nametuplefy(dictionary)
         assert result == expected
 
+    def test_shares_classes(self):
+        assert type(nametuplefy(dict(cat='meow'))) is type(nametuplefy(dict(cat='purr')))
+        assert type(nametuplefy(dict(cat='meow'))) is not type(nametuplefy(dict(dog='woof')))
+
+    @pytest.mark.parametrize('protocol', range(pickle.HIGHEST_PROTOCOL + 1))
+    def test_pickle(self, protocol):
+        result = nametuplefy(dict(animals=[dict(kind='cat', sound='meow')], count=1))
+
+        unpickled = pickle.loads(pickle.dumps(result, protocol))
+
+        assert unpickled == result
+        assert unpickled.animals[0].sound == 'meow'
+        assert type(unpickled) is type(result)
+
 
 @pytest.fixture
 def decision_config():
@@ -185,11 +212,48 @@ class TestPolling:
         expected_decision_task = expected_decision_task._replace(events=raw_decision_events)
         assert result_decision_task == expected_decision_task
 
+    def test_deadline(self, decision_client):
+        task = decision_client.poll()
+
+        assert task.deadline.timeout == 600.0
+        assert 599 < task.deadline.remaining() <= 600
+
+    @pytest.mark.parametrize('use_raw_event_history', [True, False])
+    def test_intern_strings(self, decision_client, boto_client_results, use_raw_event_history):
+        # Decoded from separate pages, equal strings are separate objects.
+        boto_client_results['events'] = [
+            json.loads(json.dumps({'eventId': event_id, 'eventType': 'TimerFired'})) for event_id in (2, 1)
+        ]
+
+        task = decision_client.poll(use_raw_event_history=use_raw_event_history, intern_strings=True)
+
+        first, second = [event if use_raw_event_history else event._asdict() for event in task.events]
+        assert first['eventType'] is second['eventType']
+        assert task == decision_client.poll(use_raw_event_history=use_raw_event_history)
+
     def test_poll_timeout(self, decision_client, boto_client):
         boto_client.poll_for_decision_task.side_effect = ReadTimeout
         with pytest.raises(NoTaskFound):
             decision_client.poll()
 
+    def test_iter_tasks_skips_empty_polls(self, decision_client, expected_decision_task, boto_client):
+        boto_client.poll_for_decision_task.side_effect = [
+            ReadTimeout(),
+            {'startedEventId': 0},
+            boto_client.poll_for_decision_task.return_value,
+        ]
+
+        assert list(decision_client.iter_tasks(max_polls=3)) == [expected_decision_task]
+        assert decision_client.poll_stats.snapshot() == {'timed_out_polls': 1, 'empty_polls': 1, 'tasks': 1}
+
+    def test_poll_forever_with_use_raw_event_history(self, decision_client, raw_decision_events):
+        shutdown = threading.Event()
+        tasks = decision_client.poll_forever(use_raw_event_history=True, shutdown=shutdown)
+
+        assert next(tasks).events == raw_decision_events
+        shutdown.set()
+        assert list(tasks) == []
+
 
 class TestPollingWithBadResults:
     @pytest.fixture(autouse=True)
@@ -264,6 +328,65 @@ def test_finish_decision_with_activity_timeout_config(decision_client, decision_
     )
 
 
+def test_finish_decision(decision_client, boto_client):
+    decisions = [{'decisionType': 'RecordMarker', 'recordMarkerDecisionAttributes': {'markerName': 'meow'}}]
+
+    decision_client.finish_decision('task_token', decisions, execution_context='context')
+
+    boto_client.respond_decision_task_completed.assert_called_once_with(
+        taskToken='task_token',
+        decisions=decisions,
+        executionContext='context',
+    )
+
+
+def test_continue_as_new(decision_client, boto_client):
+    decision_client.continue_as_new('task_token', 'state', task_list='other', task_start_to_close_timeout=30)
+
+    boto_client.respond_decision_task_completed.assert_called_once_with(
+        taskToken='task_token',
+        decisions=[{
+            'decisionType': 'ContinueAsNewWorkflowExecution',
+            'continueAsNewWorkflowExecutionDecisionAttributes': {
+                'input': 'state',
+                'taskList': {'name': 'other'},
+                'taskStartToCloseTimeout': '30',
+            },
+        }],
+    )
+
+
+def test_build_start_child_workflow():
+    assert build_start_child_workflow(
+        'child_id',
+        'child',
+        '1.0',
+        'input',
+        task_list='children',
+        execution_start_to_close_timeout=60,
+        control='control',
+    ) == {
+        'decisionType': 'StartChildWorkflowExecution',
+        'startChildWorkflowExecutionDecisionAttributes': {
+            'workflowId': 'child_id',
+            'workflowType': {'name': 'child', 'version': '1.0'},
+            'input': 'input',
+            'taskList': {'name': 'children'},
+            'executionStartToCloseTimeout': '60',
+            'control': 'control',
+        },
+    }
+
+
+def test_finish_decision_without_decisions(decision_client, boto_client):
+    decision_client.finish_decision('task_token', [])
+
+    boto_client.respond_decision_task_completed.assert_called_once_with(
+        taskToken='task_token',
+        decisions=[],
+    )
+
+
 class TestWalkWorkflowExecutionHistory:
 
     def verify_next_value_in_execution_history(
@@ -392,3 +515,398 @@ class TestWalkWorkflowExecutionHistory:
         )
         result = next(execution_history)
         assert result == dictionary
+
+    def test_get_execution_history_page(self, decision_client, boto_client, decision_config):
+        self.mock_result_for_next_history_page(
+            boto_client=boto_client,
+            new_events=[dict(blah='meow')],
+            new_next_page_token='token2',
+        )
+
+        events, next_page_token = decision_client.get_execution_history_page(
+            'workflow_id',
+            'workflow_run_id',
+            next_page_token='token1',
+            reverse_order=False,
+            use_raw_event_history=True,
+            maximum_page_size=10,
+        )
+
+        assert events == [dict(blah='meow')]
+        assert next_page_token == 'token2'
+        boto_client.get_workflow_execution_history.assert_called_once_with(
+            domain=decision_config.domain,
+            reverseOrder=False,
+            execution=dict(workflowId='workflow_id', runId='workflow_run_id'),
+            maximumPageSize=10,
+            nextPageToken='token1',
+        )
+
+    def test_intern_strings(self, decision_client, boto_client):
+        events = [dict(eventId=event_id, eventType='TimerFired') for event_id in (2, 1)]
+        self.mock_result_for_next_history_page(
+            boto_client=boto_client,
+            new_events=json.loads(json.dumps(events)),
+            new_next_page_token=None,
+        )
+
+        first, second = decision_client.walk_execution_history(
+            workflow_id='workflow_id',
+            workflow_run_id='workflow_run_id',
+            use_raw_event_history=True,
+            intern_strings=True,
+        )
+
+        assert [first, second] == events
+        assert first['eventType'] is second['eventType']
+
+    def test_predicate_filters_raw_events(self, decision_client, boto_client):
+        events = [dict(eventId=2, eventType='TimerFired'), dict(eventId=1, eventType='WorkflowExecutionStarted')]
+        self.mock_result_for_next_history_page(boto_client=boto_client, new_events=events, new_next_page_token=None)
+
+        with mock.patch('py_swf.clients.decision.nametuplefy', side_effect=nametuplefy) as mock_nametuplefy:
+            result = list(decision_client.walk_execution_history(
+                workflow_id='workflow_id',
+                workflow_run_id='workflow_run_id',
+                predicate=event_types('TimerFired'),
+            ))
+
+        assert result == [nametuplefy(events[0])]
+        assert events[1] not in [call[0][0] for call in mock_nametuplefy.call_args_list]
+
+    def test_stop_requests_no_more_pages(self, decision_client, boto_client):
+        events = [dict(eventId=3, eventType='TimerFired'), dict(eventId=2, eventType='DecisionTaskCompleted')]
+        self.mock_result_for_next_history_page(boto_client=boto_client, new_events=events, new_next_page_token='token')
+
+        result = list(decision_client.walk_execution_history(
+            workflow_id='workflow_id',
+            workflow_run_id='workflow_run_id',
+            use_raw_event_history=True,
+            stop=stop_at_event_types('DecisionTaskCompleted'),
+        ))
+
+        assert result == events
+        assert boto_client.get_workflow_execution_history.call_count == 1
+
+    def test_stop_applies_to_filtered_out_events(self, decision_client, boto_client):
+        events = [dict(eventId=3, eventType='TimerFired'), dict(eventId=2, eventType='TimerStarted')]
+        self.mock_result_for_next_history_page(boto_client=boto_client, new_events=events, new_next_page_token='token')
+
+        result = list(decision_client.walk_execution_history(
+            workflow_id='workflow_id',
+            workflow_run_id='workflow_run_id',
+            use_raw_event_history=True,
+            predicate=event_types('TimerFired'),
+            stop=stop_at_event_id(2),
+        ))
+
+        assert result == events[:1]
+        assert boto_client.get_workflow_execution_history.call_count == 1
+
+
+class TestWalkOlderEvents:
+
+    def polled_task(self, next_page_token):
+        task = DecisionTask(
+            events=[dict(eventId=9, eventType='DecisionTaskStarted')],
+            task_token='token',
+            workflow_id='workflow_id',
+            workflow_run_id='workflow_run_id',
+            workflow_type=dict(name='workflow', version='1.0'),
+        )
+        task.polled_from = 'task_list'
+        task.next_page_token = next_page_token
+        return task
+
+    def test_nothing_to_fetch_for_whole_history(self, decision_client, boto_client):
+        assert list(decision_client.walk_older_events(self.polled_task(None))) == []
+        assert not boto_client.poll_for_decision_task.called
+        assert not boto_client.get_workflow_execution_history.called
+
+    def test_continues_the_poll(self, decision_client, decision_config, boto_client):
+        events = [
+            dict(eventId=8, eventType='DecisionTaskScheduled'),
+            dict(eventId=7, eventType='TimerFired'),
+            dict(eventId=6, eventType='TimerStarted'),
+        ]
+        boto_client.poll_for_decision_task.return_value = dict(events=events, nextPageToken='next')
+
+        result = list(decision_client.walk_older_events(
+            self.polled_task('page'),
+            use_raw_event_history=True,
+            predicate=event_types('TimerFired', 'TimerStarted'),
+            stop=stop_at_event_types('TimerFired'),
+        ))
+
+        assert result == events[1:2]
+        boto_client.poll_for_decision_task.assert_called_once_with(
+            domain=decision_config.domain,
+            taskList={'name': 'task_list'},
+            reverseOrder=True,
+            nextPageToken='page',
+        )
+        assert not boto_client.get_workflow_execution_history.called
+
+    def test_walks_history_of_unpolled_task(self, decision_client, boto_client):
+        task = self.polled_task(None)
+        task.polled_from = None
+        events = [dict(eventId=9, eventType='DecisionTaskStarted'), dict(eventId=8, eventType='DecisionTaskScheduled')]
+        boto_client.get_workflow_execution_history.return_value = dict(events=events)
+
+        assert list(decision_client.walk_older_events(task, use_raw_event_history=True)) == events[1:]
+        assert not boto_client.poll_for_decision_task.called
+
+
+class TestSticky:
+
+    @pytest.fixture
+    def sticky_client(self, decision_config, boto_client):
+        decision_config.task_list = 'task_list'
+        return DecisionClient(
+            decision_config,
+            boto_client,
+            sticky_config=StickyConfig(task_list='task_list-host', schedule_to_start_timeout=5, route_activities=True),
+        )
+
+    def test_polls_both_task_lists(self, sticky_client, boto_client):
+        boto_client.poll_for_decision_task.return_value = {}
+        with pytest.raises(NoTaskFound):
+            sticky_client.poll()
+
+        task_lists = set(call[1]['taskList']['name'] for call in boto_client.poll_for_decision_task.call_args_list)
+        assert task_lists == set(['task_list-host', 'task_list'])
+
+    def test_hands_back_shared_task_received_once_nobody_waits(self, sticky_client, boto_client):
+        release = threading.Event()
+
+        def poll_for_decision_task(taskList, **kwargs):
+            if taskList['name'] == 'task_list':
+                release.wait(5)
+            return {
+                'taskToken': taskList['name'],
+                'events': [],
+                'workflowExecution': {'workflowId': 'workflow_id', 'runId': 'run_id'},
+                'workflowType': {'name': 'workflow', 'version': '1.0'},
+            }
+        boto_client.poll_for_decision_task.side_effect = poll_for_decision_task
+
+        assert sticky_client.poll().task_token == 'task_list-host'
+        release.set()
+        give_up = time.time() + 5
+        while not boto_client.respond_decision_task_completed.called and time.time() < give_up:
+            time.sleep(0.01)
+
+        kwargs = boto_client.respond_decision_task_completed.call_args[1]
+        assert kwargs['taskToken'] == 'task_list'
+        assert kwargs['decisions'][0]['decisionType'] == 'StartTimer'
+        assert 'taskList' not in kwargs
+        assert sticky_client.poll_stats.get('handed_back') == 1
+
+    def test_responds_with_sticky_task_list(self, sticky_client, boto_client):
+        sticky_client.finish_workflow('task_token', 'result')
+
+        boto_client.respond_decision_task_completed.assert_called_once_with(
+            taskToken='task_token',
+            decisions=[mock.ANY],
+            taskList={'name': 'task_list-host'},
+            taskListScheduleToStartTimeout='5',
+        )
+
+    def test_count_pending_includes_sticky_task_list(self, sticky_client, boto_client):
+        boto_client.count_pending_decision_tasks.return_value = {'count': 2, 'truncated': False}
+
+        assert sticky_client.count_pending() == 4
+        task_lists = [call[1]['taskList']['name'] for call in boto_client.count_pending_decision_tasks.call_args_list]
+        assert task_lists == ['task_list', 'task_list-host']
+
+    def test_hand_back_is_not_sticky(self, sticky_client, boto_client):
+        sticky_client.hand_back('task_token')
+
+        kwargs = boto_client.respond_decision_task_completed.call_args[1]
+        assert 'taskList' not in kwargs
+        assert kwargs['decisions'][0]['decisionType'] == 'StartTimer'
+
+    def test_moves_workflows_off_retired_shards(self, sticky_client, boto_client):
+        task_list = sticky_client.decision_config.task_list = ShardedTaskList('task_list', 2)
+        task_list.resize(1)
+
+        def poll_for_decision_task(taskList, **kwargs):
+            if taskList['name'] != 'task_list-1':
+                return {}
+            return {
+                'taskToken': 'task_token',
+                'events': [],
+                'workflowExecution': {'workflowId': 'workflow_id', 'runId': 'run_id'},
+                'workflowType': {'name': 'workflow', 'version': '1.0'},
+            }
+        boto_client.poll_for_decision_task.side_effect = poll_for_decision_task
+
+        with mock.patch.object(task_list, 'next_poll', return_value='task_list-1'):
+            task = sticky_client.poll()
+
+        sticky_client.finish_workflow(task.task_token, 'result')
+        sticky_client.finish_workflow(task.task_token, 'result')
+
+        first, second = [call[1] for call in boto_client.respond_decision_task_completed.call_args_list]
+        assert first['taskList'] == {'name': 'task_list-0'}
+        assert 'taskListScheduleToStartTimeout' not in first
+        assert second['taskList'] == {'name': 'task_list-host'}
+
+    def test_routes_activities(self, sticky_client, boto_client):
+        sticky_client.finish_decision_with_activity('task_token', 'activity_id', 'activity', '1.0', 'input')
+
+        decision, = boto_client.respond_decision_task_completed.call_args[1]['decisions']
+        attributes = decision['scheduleActivityTaskDecisionAttributes']
+        assert attributes['taskList'] == {'name': 'task_list-host'}
+        assert attributes['scheduleToStartTimeout'] == '5'
+        assert attributes['control'] == _STICKY_ACTIVITY_CONTROL
+
+    @pytest.mark.parametrize('timeout, expected', [(60, '5'), (2, '2')])
+    def test_routed_activities_wait_at_most_sticky_timeout(self, sticky_client, boto_client, timeout, expected):
+        sticky_client.finish_decision_with_activity(
+            'task_token', 'activity_id', 'activity', '1.0', 'input', schedule_to_start_timeout=timeout,
+        )
+
+        decision, = boto_client.respond_decision_task_completed.call_args[1]['decisions']
+        assert decision['scheduleActivityTaskDecisionAttributes']['scheduleToStartTimeout'] == expected
+
+    def test_explicit_task_list_is_not_routed(self, sticky_client, boto_client):
+        sticky_client.finish_decision_with_activity(
+            'task_token', 'activity_id', 'activity', '1.0', 'input', task_list='other',
+        )
+
+        decision, = boto_client.respond_decision_task_completed.call_args[1]['decisions']
+        assert 'control' not in decision['scheduleActivityTaskDecisionAttributes']
+
+
+def scheduled_event(event_id, activity_id, control=_STICKY_ACTIVITY_CONTROL):
+    attributes = {
+        'activityId': activity_id,
+        'activityType': {'name': 'activity', 'version': '1.0'},
+        'input': 'input',
+        'taskList': {'name': 'task_list-host'},
+        'scheduleToCloseTimeout': '600',
+        'scheduleToStartTimeout': '5',
+        'startToCloseTimeout': '60',
+        'heartbeatTimeout': 'NONE',
+    }
+    if control is not None:
+        attributes['control'] = control
+    return {'eventId': event_id, 'eventType': 'ActivityTaskScheduled', 'activityTaskScheduledEventAttributes': attributes}
+
+
+def timed_out_event(event_id, scheduled_event_id, timeout_type='SCHEDULE_TO_START'):
+    return {
+        'eventId': event_id,
+        'eventType': 'ActivityTaskTimedOut',
+        'activityTaskTimedOutEventAttributes': {'scheduledEventId': scheduled_event_id, 'timeoutType': timeout_type},
+    }
+
+
+class TestStickyActivityFallbacks:
+
+    @pytest.fixture
+    def decision_config(self):
+        return mock.Mock(task_list='task_list', schedule_to_start_timeout=300)
+
+    @pytest.fixture
+    def decision_client(self, decision_config, boto_client):
+        return DecisionClient(
+            decision_config,
+            boto_client,
+            sticky_config=StickyConfig(task_list='task_list-host', schedule_to_start_timeout=5, route_activities=True),
+        )
+
+    def make_task(self, events):
+        return DecisionTask(
+            events=events,
+            task_token='task_token',
+            workflow_id='workflow_id',
+            workflow_run_id='run_id',
+            workflow_type={'name': 'workflow', 'version': '1.0'},
+        )
+
+    def test_schedules_again_on_shared_task_list(self, decision_client):
+        task = self.make_task([
+            {'eventId': 8, 'eventType': 'DecisionTaskStarted'},
+            {'eventId': 7, 'eventType': 'DecisionTaskScheduled'},
+            timed_out_event(6, 5),
+            scheduled_event(5, 'activity_id'),
+            {'eventId': 4, 'eventType': 'DecisionTaskCompleted'},
+        ])
+
+        decision, = sticky_activity_fallbacks(decision_client, task)
+
+        attributes = decision['scheduleActivityTaskDecisionAttributes']
+        assert attributes['activityId'] == 'activity_id'
+        assert attributes['activityType'] == {'name': 'activity', 'version': '1.0'}
+        assert attributes['input'] == 'input'
+        assert attributes['taskList'] == {'name': 'task_list'}
+        assert attributes['scheduleToStartTimeout'] == '300'
+        assert attributes['scheduleToCloseTimeout'] == '600'
+        assert attributes['startToCloseTimeout'] == '60'
+        assert attributes['heartbeatTimeout'] == 'NONE'
+        assert 'control' not in attributes
+
+    def test_looks_up_older_events_in_history(self, decision_client, boto_client):
+        boto_client.get_workflow_execution_history.return_value = {
+            'events': [
+                {'eventId': 12, 'eventType': 'DecisionTaskCompleted'},
+                scheduled_event(5, 'activity_id'),
+                {'eventId': 4, 'eventType': 'DecisionTaskCompleted'},
+            ],
+        }
+        task = self.make_task([
+            {'eventId': 15, 'eventType': 'DecisionTaskStarted'},
+            timed_out_event(14, 5),
+            {'eventId': 13, 'eventType': 'DecisionTaskScheduled'},
+        ])
+
+        decision, = sticky_activity_fallbacks(decision_client, task)
+
+        assert decision['scheduleActivityTaskDecisionAttributes']['activityId'] == 'activity_id'
+        assert boto_client.get_workflow_execution_history.call_count == 1
+
+    @pytest.mark.parametrize('sticky_config', [
+        None,
+        StickyConfig(task_list='task_list-host', schedule_to_start_timeout=5, route_activities=False),
+    ])
+    def test_nothing_to_schedule_again_without_routing(self, decision_config, boto_client, sticky_config):
+        decision_client = DecisionClient(decision_config, boto_client, sticky_config=sticky_config)
+        task = self.make_task([{'eventId': 15, 'eventType': 'DecisionTaskStarted'}, timed_out_event(14, 5)])
+
+        assert sticky_activity_fallbacks(decision_client, task) == []
+        assert not boto_client.get_workflow_execution_history.called
+
+    def test_ignores_timeouts_before_last_decision(self, decision_client, boto_client):
+        task = self.make_task([
+            {'eventId': 8, 'eventType': 'DecisionTaskStarted'},
+            {'eventId': 7, 'eventType': 'DecisionTaskCompleted'},
+            timed_out_event(6, 5),
+            scheduled_event(5, 'activity_id'),
+        ])
+
+        assert sticky_activity_fallbacks(decision_client, task) == []
+        assert not boto_client.get_workflow_execution_history.called
+
+    @pytest.mark.parametrize('control, timeout_type', [(None, 'SCHEDULE_TO_START'), ('meow', 'SCHEDULE_TO_START'),
+                                                       (_STICKY_ACTIVITY_CONTROL, 'START_TO_CLOSE')])
+    def test_ignores_other_timeouts(self, decision_client, control, timeout_type):
+        task = self.make_task([
+            timed_out_event(6, 5, timeout_type=timeout_type),
+            scheduled_event(5, 'activity_id', control=control),
+        ])
+
+        assert sticky_activity_fallbacks(decision_client, task) == []
+
+    def test_namedtuple_events(self, decision_client):
+        task = self.make_task(nametuplefy([timed_out_event(6, 5), scheduled_event(5, 'activity_id')]))
+
+        decision, = sticky_activity_fallbacks(decision_client, task)
+
+        assert decision['scheduleActivityTaskDecisionAttributes']['activityId'] == 'activity_id'
+
+
+def test_host_task_list():
+    assert host_task_list('task_list', host='meow') == 'task_list-meow'
+    assert host_task_list('task_list').startswith('task_list-')
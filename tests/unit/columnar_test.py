@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+
+import mock
+import pytest
+
+from py_swf._encoding import utc
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.columnar import EVENT_TYPE_CODES
+from py_swf.columnar import EventColumns
+from py_swf.columnar import export_history
+from py_swf.columnar import UNKNOWN_EVENT_TYPE
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.fake_swf import FakeSWFClient
+
+
+@pytest.fixture
+def fake_swf():
+    return FakeSWFClient(poll_timeout=0.01)
+
+
+@pytest.fixture
+def decision_client(fake_swf):
+    return DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+
+
+def run_workflow(fake_swf, decision_client, workflow_id):
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf)
+    run_id = workflow_client.start_workflow('input', workflow_id, 'workflow', '1.0')
+    task = decision_client.poll()
+    decision_client.finish_decision_with_activity(task.task_token, 'activity_id', 'activity', '1.0', 'meow')
+    activity_task_client = ActivityTaskClient(ActivityTaskConfig('domain', 'task_list'), fake_swf)
+    activity_task_client.finish(activity_task_client.poll().task_token, 'done')
+    return run_id
+
+
+def test_append():
+    columns = EventColumns()
+    run = columns.add_run('workflow_id', 'run_id')
+
+    columns.append(run, {
+        'eventId': 5,
+        'eventType': 'ActivityTaskScheduled',
+        'eventTimestamp': datetime.datetime(2016, 1, 1, 0, 0, 1, 500000, tzinfo=utc),
+        'activityTaskScheduledEventAttributes': {
+            'activityId': 'activity_id',
+            'activityType': {'name': 'activity', 'version': '1.0'},
+        },
+    })
+    columns.append(run, {
+        'eventId': 6,
+        'eventType': 'ActivityTaskStarted',
+        'eventTimestamp': 1451606402.25,
+        'activityTaskStartedEventAttributes': {'scheduledEventId': 5},
+    })
+
+    assert len(columns) == 2
+    assert columns.run.tolist() == [0, 0]
+    assert columns.event_id.tolist() == [5, 6]
+    assert columns.event_type.tolist() == [
+        EVENT_TYPE_CODES['ActivityTaskScheduled'],
+        EVENT_TYPE_CODES['ActivityTaskStarted'],
+    ]
+    assert columns.timestamp.tolist() == [1451606401500, 1451606402250]
+    assert columns.activity_id.tolist() == [0, -1]
+    assert columns.activity_ids == ['activity_id']
+    assert columns.activity_type.tolist() == [0, -1]
+    assert columns.activity_types == [('activity', '1.0')]
+    assert columns.scheduled_event_id.tolist() == [0, 5]
+    assert columns.started_event_id.tolist() == [0, 0]
+    assert columns.decision_task_completed_event_id.tolist() == [0, 0]
+
+
+def test_unknown_event_type():
+    columns = EventColumns()
+    columns.append(columns.add_run('workflow_id', 'run_id'), {'eventId': 1, 'eventType': 'Meow', 'eventTimestamp': 0})
+
+    assert columns.event_type.tolist() == [UNKNOWN_EVENT_TYPE]
+
+
+def test_export_history(fake_swf, decision_client):
+    run_ids = [run_workflow(fake_swf, decision_client, workflow_id) for workflow_id in ('a', 'b')]
+
+    columns = export_history(decision_client, zip(('a', 'b'), run_ids), maximum_page_size=2)
+
+    assert columns.runs == list(zip(('a', 'b'), run_ids))
+    expected = [
+        event for run_id, workflow_id in zip(run_ids, ('a', 'b'))
+        for event in decision_client.walk_execution_history(workflow_id, run_id, reverse_order=False)
+    ]
+    assert columns.event_id.tolist() == [event.eventId for event in expected]
+    assert [EVENT_TYPE_CODES[event.eventType] for event in expected] == columns.event_type.tolist()
+    assert columns.activity_ids == ['activity_id']
+
+
+def test_export_history_does_not_build_namedtuples(decision_client):
+    decision_client.walk_execution_history = mock.Mock(return_value=[])
+
+    export_history(decision_client, [('workflow_id', 'run_id')])
+
+    decision_client.walk_execution_history.assert_called_once_with(
+        'workflow_id',
+        'run_id',
+        reverse_order=False,
+        use_raw_event_history=True,
+        maximum_page_size=1000,
+    )
+
+
+def test_save_and_load(fake_swf, decision_client, tmpdir):
+    run_id = run_workflow(fake_swf, decision_client, 'workflow_id')
+    columns = export_history(decision_client, [('workflow_id', run_id)])
+    path = tmpdir.join('history.cols').strpath
+
+    columns.save(path)
+    loaded = EventColumns.load(path)
+
+    for name in columns.columns:
+        assert getattr(loaded, name) == getattr(columns, name)
+    assert loaded.runs == columns.runs
+    assert loaded.activity_types == columns.activity_types
+    loaded.append(0, {'eventId': 99, 'eventType': 'ActivityTaskScheduled', 'eventTimestamp': 0,
+                      'activityTaskScheduledEventAttributes': {'activityId': 'activity_id'}})
+    assert loaded.activity_id[-1] == 0
+
+
+def test_load_rejects_other_files(tmpdir):
+    path = tmpdir.join('meow')
+    path.write('meow\n')
+
+    with pytest.raises(ValueError):
+        EventColumns.load(path.strpath)
+
+
+def test_to_numpy():
+    numpy = pytest.importorskip('numpy')
+    columns = EventColumns()
+    columns.append(columns.add_run('workflow_id', 'run_id'), {'eventId': 1, 'eventType': 'TimerFired', 'eventTimestamp': 1})
+
+    arrays = columns.to_numpy()
+
+    assert arrays['timestamp'].dtype == numpy.int64
+    assert arrays['event_type'].tolist() == [EVENT_TYPE_CODES['TimerFired']]
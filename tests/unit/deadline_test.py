@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import mock
+import pytest
+
+from py_swf.deadline import budget_counter
+from py_swf.deadline import Deadline
+from py_swf.errors import DeadlineExceeded
+
+
+@pytest.fixture
+def clock():
+    return mock.Mock(return_value=1000.0)
+
+
+@pytest.fixture
+def deadline(clock):
+    return Deadline(10, clock=clock)
+
+
+def test_deadline(deadline, clock):
+    clock.return_value = 1004.0
+
+    assert deadline.started == 1000.0
+    assert deadline.expires_at == 1010.0
+    assert deadline.elapsed() == 4.0
+    assert deadline.remaining() == 6.0
+    assert deadline.used() == 0.4
+    assert not deadline.expired(margin=6)
+    assert deadline.expired(margin=7)
+    assert deadline.can_finish(5, margin=1)
+    assert not deadline.can_finish(5, margin=2)
+
+
+def test_check(deadline, clock):
+    deadline.check(margin=10)
+
+    clock.return_value = 1009.5
+    with pytest.raises(DeadlineExceeded):
+        deadline.check(margin=1)
+
+
+def test_without_timeout(clock):
+    deadline = Deadline(None, started=900.0, clock=clock)
+
+    assert deadline.expires_at is None
+    assert deadline.remaining() == float('inf')
+    assert deadline.used() == 0.0
+    assert not deadline.expired(margin=3600)
+    deadline.check(margin=3600)
+
+
+@pytest.mark.parametrize(('fraction', 'counter'), [
+    (0.1, 'budget_under_50'),
+    (0.5, 'budget_under_75'),
+    (0.8, 'budget_under_90'),
+    (0.95, 'budget_under_100'),
+    (1.0, 'late'),
+    (2.5, 'late'),
+])
+def test_budget_counter(fraction, counter):
+    assert budget_counter(fraction) == counter
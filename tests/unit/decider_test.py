@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import time
+
+import mock
+import pytest
+
+from py_swf.clients.decision import _STICKY_ACTIVITY_CONTROL
+from py_swf.clients.decision import build_continue_as_new
+from py_swf.clients.decision import build_start_timer
+from py_swf.clients.decision import build_workflow_complete
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.decision import DecisionTask
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import StickyConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.decider import ContinueAsNewPolicy
+from py_swf.decider import Decider
+from py_swf.decider import DecisionResponse
+from py_swf.decider import task_start_to_close_timeout
+from py_swf.errors import DeadlineExceeded
+from py_swf.fake_swf import FakeSWFClient
+
+
+def started_events(timeout='10'):
+    return [
+        {
+            'eventId': 3,
+            'eventType': 'DecisionTaskStarted',
+            'decisionTaskStartedEventAttributes': {'scheduledEventId': 2},
+        },
+        {
+            'eventId': 2,
+            'eventType': 'DecisionTaskScheduled',
+            'decisionTaskScheduledEventAttributes': {'startToCloseTimeout': timeout},
+        },
+    ]
+
+
+def timer_started_event(event_id, control):
+    return {
+        'eventId': event_id,
+        'eventType': 'TimerStarted',
+        'timerStartedEventAttributes': {'timerId': 'timer', 'control': control},
+    }
+
+
+def make_task(events=None, name='workflow', version='1.0'):
+    return DecisionTask(
+        events=started_events() if events is None else events,
+        task_token='task_token',
+        workflow_id='workflow_id',
+        workflow_run_id='run_id',
+        workflow_type={'name': name, 'version': version},
+    )
+
+
+@pytest.fixture
+def decision_client():
+    return mock.Mock(tracer=None, sticky_config=None)
+
+
+@pytest.fixture
+def clock():
+    return mock.Mock(return_value=1000.0)
+
+
+@pytest.fixture
+def decider(decision_client, clock):
+    return Decider(decision_client, clock=clock)
+
+
+class TestTaskStartToCloseTimeout(object):
+
+    def test_raw_events(self):
+        assert task_start_to_close_timeout(started_events()) == 10.0
+
+    def test_none(self):
+        assert task_start_to_close_timeout(started_events('NONE')) is None
+
+    def test_missing(self):
+        assert task_start_to_close_timeout([]) is None
+
+
+class TestContinueAsNewPolicy(object):
+
+    def test_max_events(self):
+        assert ContinueAsNewPolicy(mock.Mock(), max_events=2).should_continue(mock.Mock(), make_task())
+        assert not ContinueAsNewPolicy(mock.Mock(), max_events=3).should_continue(mock.Mock(), make_task())
+
+    def test_max_payload_bytes(self):
+        events = started_events()
+        events[0]['decisionTaskStartedEventAttributes']['identity'] = 'not a payload'
+        events.append({
+            'eventId': 1,
+            'eventType': 'WorkflowExecutionStarted',
+            'workflowExecutionStartedEventAttributes': {'input': '\u00e9t\u00e9'},
+        })
+
+        assert ContinueAsNewPolicy(mock.Mock(), max_payload_bytes=4).should_continue(mock.Mock(), make_task(events))
+        assert not ContinueAsNewPolicy(mock.Mock(), max_payload_bytes=5).should_continue(mock.Mock(), make_task(events))
+
+    def test_without_thresholds(self):
+        assert not ContinueAsNewPolicy(mock.Mock()).should_continue(mock.Mock(), make_task())
+        assert not ContinueAsNewPolicy(mock.Mock(), max_events=0).should_continue(mock.Mock(), make_task([]))
+
+    def test_payload_bytes_of_whole_history(self):
+        fake_swf = FakeSWFClient(poll_timeout=0.01)
+        WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), fake_swf).start_workflow(
+            'x' * 100, 'workflow_id', 'workflow', '1.0',
+        )
+        decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+        decision_client.finish_decision(decision_client.poll().task_token, [build_start_timer('timer', 0, control='y' * 10)])
+        task = decision_client.poll()
+        # Only the latest page of a long history comes with the task.
+        events, _ = decision_client.get_execution_history_page(task.workflow_id, task.workflow_run_id, maximum_page_size=3)
+        task = task._replace(events=events)
+        policy = ContinueAsNewPolicy(mock.Mock(), max_payload_bytes=100)
+
+        assert policy.history_payload_bytes(decision_client, task) == 110
+        assert policy.should_continue(decision_client, task)
+
+    def test_payload_bytes_are_counted_once_per_run(self):
+        decision_client = mock.Mock()
+        decision_client.walk_execution_history.return_value = iter([
+            {'eventId': 1, 'eventType': 'WorkflowExecutionStarted', 'workflowExecutionStartedEventAttributes': {'input': 'meow'}},
+        ])
+        policy = ContinueAsNewPolicy(mock.Mock(), max_payload_bytes=10)
+
+        assert policy.history_payload_bytes(decision_client, make_task(started_events())) == 4
+        later_events = [timer_started_event(5, 'woof'), timer_started_event(4, 'purr')] + started_events()
+        assert policy.history_payload_bytes(decision_client, make_task(later_events)) == 12
+        assert decision_client.walk_execution_history.call_count == 1
+        kwargs = decision_client.walk_execution_history.call_args[1]
+        assert [kwargs['predicate']({'eventId': event_id}) for event_id in (2, 1)] == [False, True]
+        assert kwargs['stop']({'eventId': 1})
+
+    def test_decisions(self):
+        task = make_task()
+        carry_over = mock.Mock(return_value='state')
+        policy = ContinueAsNewPolicy(carry_over, max_events=2, task_start_to_close_timeout=30)
+
+        assert policy.decisions(task) == [build_continue_as_new('state', task_start_to_close_timeout=30)]
+        carry_over.assert_called_once_with(task)
+
+
+class TestDecide(object):
+
+    def test_responds_with_decisions(self, decider, decision_client):
+        decisions = [build_workflow_complete('done')]
+        decider.register('workflow', '1.0', lambda task: decisions)
+
+        decider.decide(make_task())
+
+        decision_client.finish_decision.assert_called_once_with(
+            'task_token',
+            decisions,
+            execution_context=None,
+            deadline=1010.0,
+        )
+        assert decider.stats.get('decided') == 1
+
+    def test_schedules_sticky_activities_again(self, decider, decision_client):
+        decision_client.sticky_config = StickyConfig(
+            task_list='task_list-host', schedule_to_start_timeout=5, route_activities=True,
+        )
+        decision_client.decision_config = DecisionConfig(
+            domain='domain',
+            task_list='task_list',
+            schedule_to_close_timeout=600,
+            schedule_to_start_timeout=300,
+            start_to_close_timeout=60,
+            heartbeat_timeout=60,
+        )
+        events = [
+            {
+                'eventId': 6,
+                'eventType': 'ActivityTaskTimedOut',
+                'activityTaskTimedOutEventAttributes': {'scheduledEventId': 5, 'timeoutType': 'SCHEDULE_TO_START'},
+            },
+            {
+                'eventId': 5,
+                'eventType': 'ActivityTaskScheduled',
+                'activityTaskScheduledEventAttributes': {
+                    'activityId': 'activity_id',
+                    'activityType': {'name': 'activity', 'version': '1.0'},
+                    'taskList': {'name': 'task_list-host'},
+                    'control': _STICKY_ACTIVITY_CONTROL,
+                },
+            },
+        ]
+        decider.register('workflow', '1.0', lambda task: DecisionResponse(decisions=[build_workflow_complete('done')],
+                                                                          execution_context='meow'))
+
+        decider.decide(make_task(started_events() + events))
+
+        (_, decisions), kwargs = decision_client.finish_decision.call_args
+        assert [decision['decisionType'] for decision in decisions] == ['ScheduleActivityTask', 'CompleteWorkflowExecution']
+        assert decisions[0]['scheduleActivityTaskDecisionAttributes']['taskList'] == {'name': 'task_list'}
+        assert kwargs['execution_context'] == 'meow'
+
+    def test_responds_with_execution_context(self, decider, decision_client):
+        decider.register('workflow', '1.0', lambda task: DecisionResponse(decisions=[], execution_context='meow'))
+
+        decider.decide(make_task())
+
+        assert decision_client.finish_decision.call_args[1]['execution_context'] == 'meow'
+
+    def test_dispatches_by_version(self, decider, decision_client):
+        handler = mock.Mock(return_value=[])
+        decider.register('workflow', '1.0', mock.Mock())
+        decider.register('workflow', '2.0', handler)
+
+        task = make_task(version='2.0')
+        decider.decide(task)
+
+        handler.assert_called_once_with(task)
+
+    def test_unhandled_workflow_type(self, decider, decision_client):
+        decider.decide(make_task(name='meow'))
+
+        assert not decision_client.finish_decision.called
+        assert decider.stats.get('unhandled') == 1
+
+    def test_handler_error(self, decider, decision_client):
+        error = ValueError('meow')
+        decider.on_error = mock.Mock()
+        decider.register('workflow', '1.0', mock.Mock(side_effect=error))
+        task = make_task()
+
+        decider.decide(task)
+
+        assert not decision_client.finish_decision.called
+        assert decider.stats.get('handler_errors') == 1
+        decider.on_error.assert_called_once_with(task, error)
+
+    def test_continues_as_new(self, decider, decision_client):
+        handler = mock.Mock()
+        decider.register(
+            'workflow',
+            '1.0',
+            handler,
+            continue_as_new=ContinueAsNewPolicy(lambda task: 'state', max_events=2),
+        )
+
+        decider.decide(make_task())
+
+        assert not handler.called
+        assert decision_client.finish_decision.call_args[0][1] == [build_continue_as_new('state')]
+        assert decider.stats.get('continued_as_new') == 1
+
+    def test_decides_when_carry_over_declines(self, decider, decision_client):
+        decider.register(
+            'workflow',
+            '1.0',
+            lambda task: [],
+            continue_as_new=ContinueAsNewPolicy(lambda task: None, max_events=2),
+        )
+
+        decider.decide(make_task())
+
+        assert decision_client.finish_decision.call_args[0][1] == []
+        assert decider.stats.get('continued_as_new') == 0
+
+    def test_tracks_budget(self, decider, clock):
+        clock.side_effect = [1000.0, 1015.0]
+        decider.register('workflow', '1.0', lambda task: [])
+
+        decider.decide(make_task())
+
+        assert decider.stats.max_budget_used == 1.5
+        assert decider.stats.get('late') == 1
+
+    def test_counts_budget_buckets(self, decider, clock):
+        clock.side_effect = [1000.0, 1008.0]
+        decider.register('workflow', '1.0', lambda task: [])
+
+        decider.decide(make_task())
+
+        assert decider.stats.get('budget_under_90') == 1
+        assert decider.stats.get('late') == 0
+
+    def test_sets_task_deadline(self, decider):
+        deadlines = []
+        decider.register('workflow', '1.0', lambda task: deadlines.append(task.deadline) or [])
+
+        decider.decide(make_task(), received=995.0)
+
+        assert deadlines[0].expires_at == 1005.0
+        assert deadlines[0].remaining() == 5.0
+
+    def test_hands_back_when_handler_exceeds_deadline(self, decider, decision_client, clock):
+        def handler(task):
+            clock.return_value = 1009.5
+            task.deadline.check(margin=1)
+
+        decider.on_error = mock.Mock()
+        decider.register('workflow', '1.0', handler)
+
+        decider.decide(make_task())
+
+        assert not decision_client.finish_decision.called
+        decision_client.hand_back.assert_called_once_with('task_token')
+        assert decider.stats.get('deadline_exceeded') == 1
+        assert isinstance(decider.on_error.call_args[0][1], DeadlineExceeded)
+
+    def test_does_not_hand_back_after_timeout(self, decider, decision_client, clock):
+        def handler(task):
+            clock.return_value = 1011.0
+            task.deadline.check()
+
+        decider.register('workflow', '1.0', handler)
+
+        decider.decide(make_task())
+
+        assert not decision_client.hand_back.called
+        assert decider.stats.get('deadline_exceeded') == 1
+
+    def test_min_remaining(self, decider, decision_client):
+        handler = mock.Mock()
+        decider.min_remaining = 3
+        decider.register('workflow', '1.0', handler)
+
+        decider.decide(make_task(), received=992.0)
+
+        assert not handler.called
+        decision_client.hand_back.assert_called_once_with('task_token')
+        assert decider.stats.get('expired') == 1
+
+    def test_default_timeout(self, decider, decision_client):
+        decider.default_timeout = 5
+        decider.register('workflow', '1.0', lambda task: [])
+
+        decider.decide(make_task(events=[]))
+
+        assert decision_client.finish_decision.call_args[1]['deadline'] == 1005.0
+
+
+def test_decides_workflows_concurrently():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    workflow_client = WorkflowClient(
+        WorkflowClientConfig(
+            domain='domain',
+            task_list='task_list',
+            execution_start_to_close_timeout=60,
+            task_start_to_close_timeout=10,
+        ),
+        fake_swf,
+    )
+    decision_client = DecisionClient(
+        DecisionConfig(
+            domain='domain',
+            task_list='task_list',
+            schedule_to_close_timeout=5,
+            schedule_to_start_timeout=5,
+            start_to_close_timeout=5,
+            heartbeat_timeout=5,
+        ),
+        fake_swf,
+    )
+    for i in range(10):
+        workflow_client.start_workflow('input', 'workflow_{0}'.format(i), 'workflow', '1.0')
+
+    decider = Decider(decision_client, num_pollers=3)
+    decider.register('workflow', '1.0', lambda task: [build_workflow_complete(task.workflow_id)])
+    decider.start()
+    give_up = time.time() + 5
+    while decider.stats.get('decided') < 10 and time.time() < give_up:
+        time.sleep(0.01)
+    decider.stop()
+
+    assert decider.join(timeout=5)
+    assert fake_swf.count_open_workflow_executions(domain='domain', startTimeFilter={'oldestDate': 0})['count'] == 0
+    assert decider.stats.max_budget_used < 1
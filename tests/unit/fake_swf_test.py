@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from botocore.exceptions import ClientError
+
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.admin import WorkflowRegistrar
+from py_swf.clients.decision import build_start_child_workflow
+from py_swf.clients.decision import build_start_timer
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import StickyConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.errors import NoTaskFound
+from py_swf.fake_swf import FakeSWFClient
+
+
+@pytest.fixture
+def fake_swf():
+    return FakeSWFClient(poll_timeout=0.01)
+
+
+@pytest.fixture
+def workflow_client(fake_swf):
+    return WorkflowClient(
+        WorkflowClientConfig(
+            domain='domain',
+            task_list='task_list',
+            execution_start_to_close_timeout=60,
+            task_start_to_close_timeout=10,
+        ),
+        fake_swf,
+    )
+
+
+@pytest.fixture
+def decision_client(fake_swf):
+    return DecisionClient(
+        DecisionConfig(
+            domain='domain',
+            task_list='task_list',
+            schedule_to_close_timeout=5,
+            schedule_to_start_timeout=5,
+            start_to_close_timeout=5,
+            heartbeat_timeout=5,
+        ),
+        fake_swf,
+    )
+
+
+@pytest.fixture
+def activity_task_client(fake_swf):
+    return ActivityTaskClient(ActivityTaskConfig(domain='domain', task_list='task_list'), fake_swf)
+
+
+def event_types(events):
+    return [event.eventType for event in events]
+
+
+def test_workflow(workflow_client, decision_client, activity_task_client, fake_swf):
+    run_id = workflow_client.start_workflow('workflow_input', 'workflow_id', 'workflow', '1.0')
+
+    decision_task = decision_client.poll(identity='decider')
+    assert decision_task.workflow_id == 'workflow_id'
+    assert decision_task.workflow_run_id == run_id
+    assert decision_task.workflow_type == {'name': 'workflow', 'version': '1.0'}
+    assert event_types(decision_task.events) == [
+        'DecisionTaskStarted',
+        'DecisionTaskScheduled',
+        'WorkflowExecutionStarted',
+    ]
+    assert decision_task.events[2].workflowExecutionStartedEventAttributes.input == 'workflow_input'
+    decision_client.finish_decision_with_activity(decision_task.task_token, 'activity_id', 'activity', '1.0', 'meow')
+
+    activity_task = activity_task_client.poll()
+    assert activity_task.activity_id == 'activity_id'
+    assert activity_task.type == 'activity'
+    assert activity_task.input == 'meow'
+    assert activity_task.workflow_run_id == run_id
+    activity_task_client.finish(activity_task.task_token, 'woof')
+
+    decision_task = decision_client.poll()
+    assert event_types(decision_task.events)[:4] == [
+        'DecisionTaskStarted',
+        'DecisionTaskScheduled',
+        'ActivityTaskCompleted',
+        'ActivityTaskStarted',
+    ]
+    assert decision_task.events[2].activityTaskCompletedEventAttributes.result == 'woof'
+    decision_client.finish_workflow(decision_task.task_token, 'done')
+
+    assert workflow_client.count_open_workflow_executions(datetime(2016, 1, 1)).count == 0
+    assert workflow_client.count_closed_workflow_executions(
+        oldest_start_date=datetime(2016, 1, 1),
+        close_status='COMPLETED',
+    ).count == 1
+
+
+def test_polls_time_out(decision_client, activity_task_client):
+    with pytest.raises(NoTaskFound):
+        decision_client.poll()
+    with pytest.raises(NoTaskFound):
+        activity_task_client.poll()
+
+
+def test_poll_blocks_until_a_task_arrives(workflow_client, decision_client, fake_swf):
+    fake_swf.poll_timeout = 5
+    decision_tasks = []
+    poller = threading.Thread(target=lambda: decision_tasks.append(decision_client.poll()))
+    poller.start()
+
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    poller.join(5)
+
+    assert len(decision_tasks) == 1
+
+
+def test_history_pagination(workflow_client, decision_client, activity_task_client):
+    run_id = workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_task = decision_client.poll()
+    decision_client.finish_decision_with_activity(decision_task.task_token, 'activity_id', 'activity', '1.0', 'meow')
+    activity_task_client.fail(activity_task_client.poll().task_token, 'reason')
+
+    history = list(decision_client.walk_execution_history('workflow_id', run_id, reverse_order=False, maximum_page_size=2))
+
+    assert event_types(history) == [
+        'WorkflowExecutionStarted',
+        'DecisionTaskScheduled',
+        'DecisionTaskStarted',
+        'DecisionTaskCompleted',
+        'ActivityTaskScheduled',
+        'ActivityTaskStarted',
+        'ActivityTaskFailed',
+        'DecisionTaskScheduled',
+    ]
+    assert [event.eventId for event in history] == list(range(1, 9))
+
+
+def test_reverse_pages_are_not_shifted_by_new_events(workflow_client, decision_client, activity_task_client, fake_swf):
+    run_id = workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_task = decision_client.poll()
+    decision_client.finish_decision_with_activity(decision_task.task_token, 'activity_id', 'activity', '1.0', 'meow')
+    execution = {'workflowId': 'workflow_id', 'runId': run_id}
+
+    first = fake_swf.get_workflow_execution_history(domain='domain', execution=execution, maximumPageSize=3, reverseOrder=True)
+    activity_task_client.fail(activity_task_client.poll().task_token, 'reason')
+    second = fake_swf.get_workflow_execution_history(
+        domain='domain',
+        execution=execution,
+        nextPageToken=first['nextPageToken'],
+        maximumPageSize=3,
+        reverseOrder=True,
+    )
+
+    assert [event['eventId'] for event in first['events'] + second['events']] == [5, 4, 3, 2, 1]
+    assert 'nextPageToken' not in second
+
+
+def test_invalid_decisions_are_rejected_as_a_whole(workflow_client, decision_client, fake_swf):
+    run_id = workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_task = decision_client.poll()
+    timer = {'decisionType': 'StartTimer', 'startTimerDecisionAttributes': {'timerId': 't', 'startToFireTimeout': '60'}}
+
+    for invalid in ({'decisionType': 'Meow'}, {'decisionType': 'RecordMarker', 'recordMarkerDecisionAttributes': {}}):
+        with pytest.raises(ClientError) as e:
+            fake_swf.respond_decision_task_completed(taskToken=decision_task.task_token, decisions=[timer, invalid])
+        assert e.value.response['Error']['Code'] == 'ValidationException'
+
+    assert event_types(decision_client.walk_execution_history('workflow_id', run_id)) == [
+        'DecisionTaskStarted',
+        'DecisionTaskScheduled',
+        'WorkflowExecutionStarted',
+    ]
+    # The task is still open, and can be responded to.
+    fake_swf.respond_decision_task_completed(taskToken=decision_task.task_token, decisions=[timer])
+
+
+def test_decision_scheduled_while_deciding_is_delivered_after_completion(
+    workflow_client,
+    decision_client,
+    activity_task_client,
+    fake_swf,
+):
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    first = decision_client.poll()
+    fake_swf.respond_decision_task_completed(
+        taskToken=first.task_token,
+        decisions=[{'decisionType': 'StartTimer', 'startTimerDecisionAttributes': {'timerId': 't', 'startToFireTimeout': '0'}}],
+    )
+    second = decision_client.poll()
+    decision_client.finish_decision_with_activity(second.task_token, 'activity_id', 'activity', '1.0', 'meow')
+    assert 'TimerFired' in event_types(second.events)
+
+    with pytest.raises(NoTaskFound):
+        decision_client.poll()
+
+
+def test_duplicate_workflow_id(workflow_client):
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    with pytest.raises(ClientError) as e:
+        workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    assert e.value.response['Error']['Code'] == 'WorkflowExecutionAlreadyStartedFault'
+
+
+def test_terminate_workflow(workflow_client, decision_client):
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_task = decision_client.poll()
+    workflow_client.terminate_workflow('workflow_id', 'reason')
+
+    with pytest.raises(ClientError):
+        decision_client.finish_workflow(decision_task.task_token, 'done')
+    assert workflow_client.count_closed_workflow_executions(
+        oldest_start_date=datetime(2016, 1, 1),
+        close_status='TERMINATED',
+    ).count == 1
+
+
+def test_count_filters(workflow_client):
+    workflow_client.start_workflow('input', 'workflow_a', 'workflow', '1.0')
+    workflow_client.start_workflow('input', 'workflow_b', 'other_workflow', '1.0')
+
+    assert workflow_client.count_open_workflow_executions(datetime(2016, 1, 1)).count == 2
+    assert workflow_client.count_open_workflow_executions(datetime(2016, 1, 1), workflow_name='workflow').count == 1
+    assert workflow_client.count_open_workflow_executions(datetime(2016, 1, 1), workflow_id='workflow_b').count == 1
+    assert workflow_client.count_open_workflow_executions(datetime(2016, 1, 1), datetime(2016, 1, 2)).count == 0
+
+
+def test_pending_task_counts(workflow_client, fake_swf):
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+
+    assert fake_swf.count_pending_decision_tasks(domain='domain', taskList={'name': 'task_list'})['count'] == 1
+    assert fake_swf.count_pending_activity_tasks(domain='domain', taskList={'name': 'task_list'})['count'] == 0
+
+
+def test_registration(fake_swf):
+    workflow_registrar = WorkflowRegistrar(fake_swf)
+    manifest = {
+        'domains': [{'name': 'domain'}],
+        'activity_types': [{'domain': 'domain', 'name': 'activity', 'version': '1.0'}],
+    }
+
+    assert len(workflow_registrar.register_manifest(manifest).registered) == 2
+    assert len(workflow_registrar.register_manifest(manifest).already_registered) == 2
+
+    fake_swf.deprecate_activity_type(domain='domain', activityType={'name': 'activity', 'version': '1.0'})
+    result = workflow_registrar.register_manifest(manifest)
+    assert result.deprecated == [('activity_type', 'domain', 'activity', '1.0')]
+    assert result.already_registered == [('domain', 'domain')]
+
+
+def test_types_of_unknown_domain(fake_swf):
+    with pytest.raises(ClientError) as excinfo:
+        fake_swf.list_activity_types(domain='domain', registrationStatus='REGISTERED')
+    assert excinfo.value.response['Error']['Code'] == 'UnknownResourceFault'
+
+    with pytest.raises(ClientError):
+        fake_swf.register_workflow_type(domain='domain', name='workflow', version='1.0')
+
+
+def test_sticky_task_list_falls_back_after_schedule_to_start_timeout(workflow_client, decision_client, fake_swf):
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_task = decision_client.poll()
+    fake_swf.respond_decision_task_completed(
+        taskToken=decision_task.task_token,
+        decisions=[{'decisionType': 'StartTimer', 'startTimerDecisionAttributes': {
+            'timerId': 'timer', 'startToFireTimeout': '0',
+        }}],
+        taskList={'name': 'task_list-host'},
+        taskListScheduleToStartTimeout='0.05',
+    )
+    assert fake_swf.count_pending_decision_tasks(domain='domain', taskList={'name': 'task_list-host'})['count'] == 1
+
+    fake_swf.poll_timeout = 5
+    decision_task = decision_client.poll()
+
+    assert event_types(decision_task.events)[:3] == [
+        'DecisionTaskStarted',
+        'DecisionTaskScheduled',
+        'DecisionTaskTimedOut',
+    ]
+    assert decision_task.events[2].decisionTaskTimedOutEventAttributes.timeoutType == 'SCHEDULE_TO_START'
+    assert fake_swf.count_pending_decision_tasks(domain='domain', taskList={'name': 'task_list-host'})['count'] == 0
+
+
+def test_sticky_task_is_not_held_up_by_shared_poll(workflow_client, fake_swf):
+    decision_client = DecisionClient(
+        DecisionConfig('domain', 'task_list', 5, 5, 5, 5),
+        fake_swf,
+        sticky_config=StickyConfig(task_list='task_list-host', schedule_to_start_timeout=5, route_activities=False),
+    )
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_client.finish_decision(decision_client.poll().task_token, [build_start_timer('timer', 0)])
+
+    # The shared task list is empty: polling it alone would wait for the whole long-poll.
+    fake_swf.poll_timeout = 5
+    start = time.time()
+    decision_task = decision_client.poll()
+
+    assert time.time() - start < 2
+    assert decision_task.events[2].eventType == 'TimerFired'
+
+
+def test_continue_as_new(workflow_client, decision_client):
+    run_id = workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_client.continue_as_new(decision_client.poll().task_token, 'state', workflow_type_version='2.0')
+
+    task = decision_client.poll()
+    assert task.workflow_id == 'workflow_id'
+    assert task.workflow_run_id != run_id
+    assert task.workflow_type == {'name': 'workflow', 'version': '2.0'}
+    started = task.events[-1].workflowExecutionStartedEventAttributes
+    assert started.input == 'state'
+    assert started.continuedExecutionRunId == run_id
+    assert started.executionStartToCloseTimeout == '60'
+
+    old_events = list(decision_client.walk_execution_history('workflow_id', run_id))
+    assert old_events[0].eventType == 'WorkflowExecutionContinuedAsNew'
+    assert old_events[0].workflowExecutionContinuedAsNewEventAttributes.newExecutionRunId == task.workflow_run_id
+    assert workflow_client.count_closed_workflow_executions(close_status='CONTINUED_AS_NEW').count == 1
+
+
+def test_child_workflow(workflow_client, decision_client, fake_swf):
+    parent_run_id = workflow_client.start_workflow('input', 'parent', 'parent', '1.0')
+    decision_client.finish_decision(
+        decision_client.poll().task_token,
+        [build_start_child_workflow('child', 'child', '1.0', 'child_input', task_list='children')],
+    )
+
+    task = decision_client.poll()
+    assert event_types(task.events)[:4] == [
+        'DecisionTaskStarted',
+        'DecisionTaskScheduled',
+        'ChildWorkflowExecutionStarted',
+        'StartChildWorkflowExecutionInitiated',
+    ]
+    child_execution = task.events[2].childWorkflowExecutionStartedEventAttributes.workflowExecution
+    assert child_execution.workflowId == 'child'
+
+    decision_client.finish_decision(task.task_token, [])
+    child_decision_client = DecisionClient(decision_client.decision_config._replace(task_list='children'), fake_swf)
+    child_task = child_decision_client.poll()
+    assert child_task.workflow_id == 'child'
+    started = child_task.events[-1].workflowExecutionStartedEventAttributes
+    assert started.input == 'child_input'
+    assert started.parentWorkflowExecution.runId == parent_run_id
+    child_decision_client.finish_workflow(child_task.task_token, 'child_result')
+
+    task = decision_client.poll()
+    assert task.workflow_id == 'parent'
+    completed = task.events[2].childWorkflowExecutionCompletedEventAttributes
+    assert task.events[2].eventType == 'ChildWorkflowExecutionCompleted'
+    assert completed.result == 'child_result'
+    assert completed.workflowExecution.runId == child_execution.runId
+
+
+def test_child_workflow_already_running(workflow_client, decision_client):
+    workflow_client.start_workflow('input', 'parent', 'parent', '1.0')
+    workflow_client.start_workflow('input', 'child', 'child', '1.0')
+    decision_client.finish_decision(
+        decision_client.poll().task_token,
+        [build_start_child_workflow('child', 'child', '1.0', 'child_input')],
+    )
+
+    assert decision_client.poll().workflow_id == 'child'
+    task = decision_client.poll()
+    failed = task.events[2].startChildWorkflowExecutionFailedEventAttributes
+    assert failed.cause == 'WORKFLOW_ALREADY_RUNNING'
+    assert failed.workflowId == 'child'
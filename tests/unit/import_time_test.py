@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Guards against import time regressions. Short-lived tools and forked workers import py_swf without necessarily
+talking to SWF, so importing it must stay cheap.
+"""
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+
+IMPORT_TIME_BUDGET_SECONDS = 0.2
+
+MEASURE_IMPORTS = """
+import json, sys, time
+start = time.time()
+import {modules}
+elapsed = time.time() - start
+print(json.dumps(dict(
+    elapsed=elapsed,
+    heavy_modules=sorted(name for name in ('boto3', 'botocore', 'multiprocessing') if name in sys.modules),
+)))
+"""
+
+
+def measure_imports(*modules):
+    # json is imported before timing starts, so that it doesn't count against the budget.
+    output = subprocess.check_output([
+        sys.executable,
+        '-c',
+        MEASURE_IMPORTS.format(modules=', '.join(modules)),
+    ])
+    return json.loads(output.decode('utf-8'))
+
+
+@pytest.mark.parametrize('modules', [
+    ('py_swf.errors', 'py_swf.config_definitions'),
+    ('py_swf.clients.decision', 'py_swf.clients.activity_task'),
+    ('py_swf.clients.workflow', 'py_swf.clients.admin', 'py_swf.retry'),
+])
+def test_imports_are_fast(modules):
+    result = measure_imports(*modules)
+
+    assert result['heavy_modules'] == []
+    assert result['elapsed'] < IMPORT_TIME_BUDGET_SECONDS
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import socket
+
+import mock
+import pytest
+
+from py_swf.instrumentation import CallRecord
+from py_swf.instrumentation import HistogramSink
+from py_swf.instrumentation import MultiSink
+from py_swf.instrumentation import request_size
+from py_swf.instrumentation import response_size
+from py_swf.instrumentation import StatsdSink
+
+
+def call_record(duration=0.001, outcome='ok', **kwargs):
+    fields = dict(
+        api_name='poll_for_decision_task',
+        domain='domain',
+        task_list='task_list',
+        duration=duration,
+        request_bytes=10,
+        response_bytes=100,
+        event_count=3,
+        outcome=outcome,
+    )
+    fields.update(kwargs)
+    return CallRecord(**fields)
+
+
+def test_multi_sink():
+    sinks = [mock.Mock(), mock.Mock()]
+    record = call_record()
+
+    MultiSink(sinks).record(record)
+
+    for sink in sinks:
+        sink.record.assert_called_once_with(record)
+
+
+class TestHistogramSink:
+
+    def test_snapshot(self):
+        sink = HistogramSink()
+        for _ in range(98):
+            sink.record(call_record(duration=0.001))
+        sink.record(call_record(duration=0.5))
+        sink.record(call_record(duration=0.01, outcome='no_task', event_count=None))
+
+        snapshot = sink.snapshot()
+
+        ok = snapshot[('poll_for_decision_task', 'ok')]
+        assert ok['count'] == 99
+        assert ok['max'] == 0.5
+        assert ok['total'] == pytest.approx(0.598)
+        assert ok['event_count'] == 297
+        assert ok['request_bytes'] == 990
+        # Percentiles are bucketed within a factor of two.
+        assert 0.001 <= ok['p50'] < 0.002
+        assert ok['p99'] == 0.5
+        assert snapshot[('poll_for_decision_task', 'no_task')]['event_count'] == 0
+
+    def test_reset(self):
+        sink = HistogramSink()
+        sink.record(call_record())
+        sink.reset()
+
+        assert sink.snapshot() == {}
+
+
+class TestStatsdSink:
+
+    @pytest.fixture
+    def listener(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.settimeout(5)
+        yield listener
+        listener.close()
+
+    def test_sends_metrics(self, listener):
+        sink = StatsdSink(port=listener.getsockname()[1], prefix='swf')
+
+        sink.record(call_record(duration=0.0125, response_bytes=None))
+        sink.close()
+
+        packet = listener.recv(65536).decode('utf-8')
+        assert packet.split('\n') == [
+            'swf.poll_for_decision_task.ok:12.500|ms',
+            'swf.poll_for_decision_task.request_bytes:10|h',
+            'swf.poll_for_decision_task.event_count:3|h',
+        ]
+
+    def test_ignores_send_errors(self):
+        sink = StatsdSink()
+        sink._socket = mock.Mock(**{'sendto.side_effect': socket.error})
+
+        sink.record(call_record())
+
+
+def test_request_size():
+    assert request_size(dict(taskToken='abc', decisions=[{'input': 'de', 'heartbeatTimeout': 5}])) == 5
+
+
+@pytest.mark.parametrize(('response', 'expected'), [
+    ({'ResponseMetadata': {'HTTPHeaders': {'content-length': '123'}}}, 123),
+    ({}, None),
+    (None, None),
+])
+def test_response_size(response, expected):
+    assert response_size(response) == expected
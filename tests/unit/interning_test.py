@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+
+from py_swf.interning import StringTable
+
+
+def fresh(value):
+    """A copy of a string that isn't the same object, like those decoded from separate responses."""
+    return ''.join(list(value))
+
+
+def test_intern():
+    table = StringTable()
+    first = table.intern(fresh('ActivityTaskScheduled'))
+
+    assert table.intern(fresh('ActivityTaskScheduled')) is first
+    assert len(table) == 1
+
+
+def test_leaves_other_values():
+    table = StringTable(max_length=5)
+    now = datetime.datetime.now()
+
+    assert table.intern(12) == 12
+    assert table.intern(now) is now
+    assert table.intern(None) is None
+    assert table.intern('too long') == 'too long'
+    assert len(table) == 0
+
+
+def test_stops_growing_when_full():
+    table = StringTable(max_size=1)
+    first = table.intern(fresh('meow'))
+
+    assert table.intern(fresh('woof')) == 'woof'
+    assert table.intern(fresh('meow')) is first
+    assert len(table) == 1
+
+
+def test_intern_raw():
+    table = StringTable()
+    events = [
+        {fresh('eventType'): fresh('TimerFired'), 'attributes': {'timerId': fresh('timer')}, 'eventId': 2},
+        {fresh('eventType'): fresh('TimerFired'), 'attributes': {'timerId': fresh('timer')}, 'eventId': 1},
+    ]
+
+    interned = table.intern_raw(events)
+
+    assert interned == events
+    assert interned[0]['eventType'] is interned[1]['eventType']
+    assert interned[0]['attributes']['timerId'] is interned[1]['attributes']['timerId']
+    first_key, = [key for key in interned[0] if key == 'eventType']
+    second_key, = [key for key in interned[1] if key == 'eventType']
+    assert first_key is second_key
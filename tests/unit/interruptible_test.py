@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import mock
+import pytest
+
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.activity_task import HAND_BACK_REASON
+from py_swf.clients.decision import DecisionClient
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.config_definitions import DecisionConfig
+from py_swf.errors import NoTaskFound
+from py_swf.errors import PollInterrupted
+from py_swf.fake_swf import FakeSWFClient
+from py_swf.interruptible import _Poll
+from py_swf.interruptible import InterruptiblePoller
+
+
+@pytest.fixture
+def client():
+    return mock.Mock()
+
+
+@pytest.fixture
+def poller(client):
+    return InterruptiblePoller(client, check_interval=0.01)
+
+
+def blocking_poll(client, task):
+    release = threading.Event()
+
+    def poll(**kwargs):
+        release.wait(5)
+        return task
+    client.poll.side_effect = poll
+    return release
+
+
+def test_returns_task(poller, client):
+    assert poller.poll(identity='meow') is client.poll.return_value
+    client.poll.assert_called_once_with(identity='meow')
+
+
+def test_raises_poll_errors(poller, client):
+    client.poll.side_effect = NoTaskFound('meow')
+
+    with pytest.raises(NoTaskFound):
+        poller.poll()
+
+
+def test_shut_down_before_polling(poller, client):
+    poller.shutdown_now()
+
+    with pytest.raises(PollInterrupted):
+        poller.poll()
+    assert not client.poll.called
+
+
+def test_interrupts_poll_and_hands_back_its_task(poller, client):
+    task = mock.Mock()
+    release = blocking_poll(client, task)
+    threading.Timer(0.05, poller.shutdown_now).start()
+
+    start = time.time()
+    with pytest.raises(PollInterrupted):
+        poller.poll()
+    assert time.time() - start < 1
+    assert not client.hand_back.called
+
+    release.set()
+    assert poller.wait_for_abandoned_polls(timeout=5)
+    client.hand_back.assert_called_once_with(task.task_token)
+    assert poller.handed_back == 1
+
+
+def test_poll_completing_as_it_is_abandoned_is_forgotten(poller, client):
+    release = blocking_poll(client, mock.Mock())
+    abandon = _Poll.abandon
+
+    def abandon_then_complete(poll):
+        abandoned = abandon(poll)
+        release.set()
+        assert poll.finished.wait(5)
+        return abandoned
+
+    threading.Timer(0.05, poller.shutdown_now).start()
+    with mock.patch.object(_Poll, 'abandon', abandon_then_complete):
+        with pytest.raises(PollInterrupted):
+            poller.poll()
+
+    assert poller._abandoned_polls == set()
+    assert poller.handed_back == 1
+
+
+def test_wait_for_abandoned_polls_times_out(poller, client):
+    blocking_poll(client, mock.Mock())
+    threading.Timer(0.05, poller.shutdown_now).start()
+    with pytest.raises(PollInterrupted):
+        poller.poll()
+
+    assert not poller.wait_for_abandoned_polls(timeout=0.01)
+
+
+def test_reports_hand_back_errors(client):
+    on_error = mock.Mock()
+    poller = InterruptiblePoller(client, on_error=on_error)
+    task = mock.Mock()
+    error = ValueError('meow')
+    client.hand_back.side_effect = error
+
+    poller.hand_back(task)
+
+    on_error.assert_called_once_with(task, error)
+    assert poller.handed_back == 0
+
+
+class TestHandBack(object):
+
+    @pytest.fixture
+    def fake_swf(self):
+        fake_swf = FakeSWFClient(poll_timeout=0.01)
+        fake_swf.start_workflow_execution(
+            domain='domain',
+            workflowId='workflow_id',
+            workflowType={'name': 'workflow', 'version': '1.0'},
+            taskList={'name': 'task_list'},
+            taskStartToCloseTimeout='10',
+        )
+        return fake_swf
+
+    @pytest.fixture
+    def decision_client(self, fake_swf):
+        return DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), fake_swf)
+
+    def test_decision_task_is_rescheduled(self, decision_client):
+        decision_client.hand_back(decision_client.poll().task_token)
+
+        events = decision_client.poll(use_raw_event_history=True).events
+        assert [event['eventType'] for event in events[:4]] == [
+            'DecisionTaskStarted',
+            'DecisionTaskScheduled',
+            'TimerFired',
+            'TimerStarted',
+        ]
+
+    def test_activity_task_is_failed(self, fake_swf, decision_client):
+        decision_client.finish_decision_with_activity(decision_client.poll().task_token, 'id', 'activity', '1.0', '')
+        activity_task_client = ActivityTaskClient(ActivityTaskConfig('domain', 'task_list'), fake_swf)
+
+        activity_task_client.hand_back(activity_task_client.poll().task_token, details='shutting down')
+
+        events = decision_client.poll(use_raw_event_history=True).events
+        assert events[2]['activityTaskFailedEventAttributes']['reason'] == HAND_BACK_REASON
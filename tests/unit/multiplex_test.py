@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import collections
+import threading
+import time
+
+import mock
+import pytest
+
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.errors import NoTaskFound
+from py_swf.fake_swf import FakeSWFClient
+from py_swf.multiplex import MultiplexedPoller
+from py_swf.multiplex import TaskListSource
+from py_swf.tracing import InMemoryExporter
+from py_swf.tracing import Tracer
+
+
+def make_source(name, pending=0, priority=0, weight=1):
+    client = mock.Mock(tracer=None, **{'count_pending.return_value': pending})
+    return TaskListSource(name, client, mock.Mock(), priority=priority, weight=weight)
+
+
+def pick(poller, times):
+    return collections.Counter(poller.next_source().name for _ in range(times))
+
+
+@pytest.fixture
+def clock():
+    return mock.Mock(return_value=1000.0)
+
+
+def test_invalid_weight():
+    with pytest.raises(ValueError):
+        make_source('meow', weight=0)
+
+
+def test_idle_sources_share_by_weight(clock):
+    poller = MultiplexedPoller([make_source('a', weight=3), make_source('b')], clock=clock)
+
+    assert pick(poller, 8) == {'a': 6, 'b': 2}
+
+
+def test_highest_priority_source_with_work_first(clock):
+    poller = MultiplexedPoller(
+        [make_source('low', pending=5), make_source('high', pending=2, priority=1), make_source('idle', priority=2)],
+        clock=clock,
+    )
+
+    assert [poller.next_source().name for _ in range(4)] == ['high', 'high', 'low', 'low']
+
+
+def test_source_with_new_work_does_not_catch_up(clock):
+    a = make_source('a')
+    b = make_source('b')
+    poller = MultiplexedPoller([a, b], clock=clock)
+    a.client.count_pending.return_value = 100
+    poller._pending['a'] = 100
+    pick(poller, 10)
+
+    b.client.count_pending.return_value = 100
+    clock.return_value += poller.refresh_interval
+
+    assert pick(poller, 10) == {'a': 5, 'b': 5}
+
+
+def test_pending_counts_are_cached(clock):
+    source = make_source('a', pending=1)
+    poller = MultiplexedPoller([source], refresh_interval=1.0, clock=clock)
+
+    pick(poller, 3)
+    assert source.client.count_pending.call_count == 1
+
+    clock.return_value += 1
+    poller.next_source()
+    assert source.client.count_pending.call_count == 2
+
+
+def test_empty_poll_clears_pending_count(clock):
+    source = make_source('a', pending=100)
+    source.client.poll.side_effect = NoTaskFound('meow')
+    poller = MultiplexedPoller([source], num_workers=1, clock=clock)
+
+    poller.start()
+    give_up = time.time() + 5
+    while not poller.stats().get(('a', 'empty_polls')) and time.time() < give_up:
+        time.sleep(0.01)
+    poller.stop()
+    assert poller.join(timeout=5)
+
+    assert poller.stats()[('a', 'empty_polls')] >= 1
+    assert poller._pending['a'] == 0
+    assert source.client.count_pending.call_count == 1
+
+
+def test_count_errors_are_reported(clock):
+    source = make_source('a')
+    error = ValueError('meow')
+    source.client.count_pending.side_effect = error
+    on_error = mock.Mock()
+
+    assert MultiplexedPoller([source], on_error=on_error, clock=clock).next_source() is source
+    on_error.assert_called_once_with(source, None, error)
+
+
+def schedule_activities(fake_swf, workflow_id, task_list, count):
+    fake_swf.start_workflow_execution(
+        domain='domain',
+        workflowId=workflow_id,
+        workflowType={'name': 'workflow', 'version': '1.0'},
+        taskList={'name': 'decisions'},
+    )
+    decision = fake_swf.poll_for_decision_task(domain='domain', taskList={'name': 'decisions'})
+    fake_swf.respond_decision_task_completed(
+        taskToken=decision['taskToken'],
+        decisions=[
+            {
+                'decisionType': 'ScheduleActivityTask',
+                'scheduleActivityTaskDecisionAttributes': {
+                    'activityType': {'name': 'activity', 'version': '1.0'},
+                    'activityId': '{0}-{1}'.format(workflow_id, i),
+                    'input': 'input',
+                    'taskList': {'name': task_list},
+                },
+            }
+            for i in range(count)
+        ],
+    )
+
+
+def test_serves_several_task_lists():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    handled = collections.defaultdict(list)
+    lock = threading.Lock()
+
+    def handler(client):
+        def handle(task):
+            with lock:
+                handled[task.activity_id].append(task)
+            client.finish(task.task_token, 'done')
+        return handle
+
+    sources = []
+    for name in ('urgent', 'bulk'):
+        client = ActivityTaskClient(ActivityTaskConfig(domain='domain', task_list=name), fake_swf)
+        sources.append(TaskListSource(name, client, handler(client), priority=int(name == 'urgent')))
+        schedule_activities(fake_swf, name, name, 3)
+
+    poller = MultiplexedPoller(sources, num_workers=2, refresh_interval=0)
+    poller.start()
+    give_up = time.time() + 5
+    while len(handled) < 6 and time.time() < give_up:
+        time.sleep(0.01)
+    poller.stop()
+
+    assert poller.join(timeout=5)
+    assert len(handled) == 6
+    stats = poller.stats()
+    assert stats[('urgent', 'tasks')] == stats[('bulk', 'tasks')] == 3
+
+
+def test_traces_handlers():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    exporter = InMemoryExporter()
+    client = ActivityTaskClient(ActivityTaskConfig(domain='domain', task_list='bulk'), fake_swf, tracer=Tracer(exporter))
+    handled = threading.Event()
+
+    def handle(task):
+        client.finish(task.task_token, 'done')
+        handled.set()
+
+    schedule_activities(fake_swf, 'bulk', 'bulk', 1)
+    poller = MultiplexedPoller([TaskListSource('bulk', client, handle)], num_workers=1, refresh_interval=0)
+    poller.start()
+    assert handled.wait(5)
+    poller.stop()
+    assert poller.join(timeout=5)
+
+    spans = dict((span.name, span) for span in exporter.spans)
+    assert spans['handle_task'].parent_span_id == spans['poll_for_activity_task'].context.span_id
+    assert spans['handle_task'].attributes == {'source': 'bulk'}
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+import json
+
+import mock
+import pytest
+from botocore.exceptions import ClientError
+
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.errors import NoTaskFound
+from py_swf.fake_swf import FakeSWFClient
+from py_swf.recording import read_recording
+from py_swf.recording import RecordingClient
+from py_swf.recording import ReplayClient
+from py_swf.recording import ReplayExhausted
+
+
+decision_config = DecisionConfig(
+    domain='domain',
+    task_list='task_list',
+    schedule_to_close_timeout=5,
+    schedule_to_start_timeout=5,
+    start_to_close_timeout=5,
+    heartbeat_timeout=5,
+)
+
+
+workflow_client_config = WorkflowClientConfig(
+    domain='domain',
+    task_list='task_list',
+    execution_start_to_close_timeout=60,
+    task_start_to_close_timeout=10,
+)
+
+
+@pytest.fixture(params=['recording.ndjson', 'recording.ndjson.gz'])
+def path(request, tmpdir):
+    return tmpdir.join(request.param).strpath
+
+
+def record_decision(path):
+    boto_client = RecordingClient(FakeSWFClient(poll_timeout=0.01), path)
+    WorkflowClient(workflow_client_config, boto_client).start_workflow('input', 'workflow_id', 'workflow', '1.0')
+    decision_client = DecisionClient(decision_config, boto_client)
+    task = decision_client.poll(identity='decider')
+    decision_client.finish_decision_with_activity(task.task_token, 'activity_id', 'activity', '1.0', 'meow')
+    boto_client.close()
+    return task
+
+
+def test_records_calls(path):
+    record_decision(path)
+
+    entries = list(read_recording(path))
+
+    assert [entry['op'] for entry in entries] == [
+        'start_workflow_execution',
+        'poll_for_decision_task',
+        'respond_decision_task_completed',
+    ]
+    for entry in entries:
+        assert entry['duration'] >= 0
+        assert 'ResponseMetadata' not in entry['response']
+    assert isinstance(entries[1]['response']['events'][0]['eventTimestamp'], datetime.datetime)
+
+
+def test_replays_decision_task(path):
+    recorded_task = record_decision(path)
+    boto_client = ReplayClient(path)
+    decision_client = DecisionClient(decision_config, boto_client)
+
+    assert decision_client.poll(identity='decider') == recorded_task
+    decision_client.finish_decision_with_activity(recorded_task.task_token, 'activity_id', 'activity', '1.0', 'meow')
+
+    assert boto_client.calls[-1][0] == 'respond_decision_task_completed'
+    with pytest.raises(NoTaskFound):
+        decision_client.poll(identity='decider')
+    assert boto_client.remaining() == 1
+
+
+def test_replays_with_scaled_timing(tmpdir):
+    recording = tmpdir.join('recording.ndjson')
+    recording.write('\n'.join(
+        json.dumps(dict(op='list_domains', t=t, duration=1.0, request={}, response={'domainInfos': []}))
+        for t in (0.0, 10.0, 12.0)
+    ))
+    sleep = mock.Mock()
+    boto_client = ReplayClient(recording.strpath, speed=2.0, sleep=sleep, clock=mock.Mock(side_effect=[100.0, 101.0, 110.0]))
+
+    for _ in range(3):
+        boto_client.list_domains()
+
+    # Responses are due 0.5, 5.5 and 6.5 seconds after the first call; the last call is already late.
+    assert sleep.call_args_list == [mock.call(0.5), mock.call(4.5)]
+
+
+def test_replays_errors(tmpdir):
+    path = tmpdir.join('recording.ndjson').strpath
+    recording = RecordingClient(FakeSWFClient(), path)
+    with pytest.raises(ClientError):
+        recording.terminate_workflow_execution(domain='domain', workflowId='missing')
+    recording.close()
+    boto_client = ReplayClient(path)
+
+    with pytest.raises(ClientError) as excinfo:
+        boto_client.terminate_workflow_execution(domain='domain', workflowId='missing')
+    assert excinfo.value.response['Error']['Code'] == 'UnknownResourceFault'
+
+    with pytest.raises(ReplayExhausted):
+        boto_client.terminate_workflow_execution(domain='domain', workflowId='missing')
+
+
+def test_records_only_given_ops(tmpdir):
+    path = tmpdir.join('recording.ndjson').strpath
+    recording = RecordingClient(FakeSWFClient(), path, ops=['count_open_workflow_executions'])
+    recording.list_domains(registrationStatus='REGISTERED')
+    recording.count_open_workflow_executions(domain='domain', startTimeFilter={'oldestDate': datetime.datetime(2020, 1, 1)})
+    recording.close()
+
+    entry, = read_recording(path)
+    assert entry['op'] == 'count_open_workflow_executions'
+    assert entry['request']['startTimeFilter']['oldestDate'].year == 2020
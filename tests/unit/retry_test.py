@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import mock
+import pytest
+from botocore.exceptions import ClientError
+from botocore.exceptions import EndpointConnectionError
+
+from py_swf.retry import RetryPolicy
+from py_swf.retry import RetryStats
+
+
+def client_error(code, status=400):
+    return ClientError(
+        error_response={'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation_name='meowing',
+    )
+
+
+@pytest.fixture
+def sleep():
+    return mock.Mock()
+
+
+@pytest.fixture
+def clock():
+    return mock.Mock(return_value=1000.0)
+
+
+@pytest.fixture
+def retry_policy(sleep, clock):
+    return RetryPolicy(
+        max_attempts=3,
+        base_delay=1,
+        max_delay=5,
+        sleep=sleep,
+        clock=clock,
+        random_uniform=lambda low, high: high,
+    )
+
+
+def test_returns_result_without_retrying(retry_policy, sleep):
+    func = mock.Mock(return_value='meow')
+
+    assert retry_policy.call(func, 'api', cat='dog') == 'meow'
+
+    func.assert_called_once_with(cat='dog')
+    assert not sleep.called
+    assert retry_policy.stats.get('api', 'calls') == 1
+    assert retry_policy.stats.get('api', 'retries') == 0
+
+
+def test_retries_throttling_with_decorrelated_jitter(retry_policy, sleep):
+    func = mock.Mock(side_effect=[client_error('ThrottlingException'), client_error('ThrottlingException'), 'meow'])
+
+    assert retry_policy.call(func, 'api') == 'meow'
+
+    assert func.call_count == 3
+    assert sleep.call_args_list == [mock.call(3), mock.call(5)]
+    assert retry_policy.stats.get('api', 'throttled') == 2
+    assert retry_policy.stats.get('api', 'retries') == 2
+    assert retry_policy.stats.get('api', 'attempts') == 3
+
+
+@pytest.mark.parametrize('error', [
+    client_error('InternalFailure'),
+    client_error('SomethingElse', status=503),
+    EndpointConnectionError(endpoint_url='http://swf'),
+])
+def test_retries_transient_errors(retry_policy, error):
+    func = mock.Mock(side_effect=[error, 'meow'])
+
+    assert retry_policy.call(func, 'api') == 'meow'
+    assert retry_policy.stats.get('api', 'transient_errors') == 1
+
+
+def test_does_not_retry_transient_errors_when_disabled(sleep):
+    retry_policy = RetryPolicy(retry_transient_errors=False, sleep=sleep)
+    func = mock.Mock(side_effect=client_error('InternalFailure'))
+
+    with pytest.raises(ClientError):
+        retry_policy.call(func, 'api')
+    assert func.call_count == 1
+
+
+@pytest.mark.parametrize('error', [
+    client_error('UnknownResourceFault'),
+    client_error('LimitExceededFault'),
+    client_error('LimitExceededException'),
+    ValueError(),
+])
+def test_does_not_retry_other_errors(retry_policy, error):
+    func = mock.Mock(side_effect=error)
+
+    with pytest.raises(type(error)):
+        retry_policy.call(func, 'api')
+    assert func.call_count == 1
+
+
+def test_gives_up_when_budget_exhausted(retry_policy):
+    func = mock.Mock(side_effect=client_error('ThrottlingException'))
+
+    with pytest.raises(ClientError):
+        retry_policy.call(func, 'api')
+
+    assert func.call_count == 3
+    assert retry_policy.stats.get('api', 'budget_exhausted') == 1
+
+
+def test_per_api_budget(retry_policy):
+    retry_policy.max_attempts_by_api['poll_for_decision_task'] = 1
+    func = mock.Mock(side_effect=client_error('ThrottlingException'))
+
+    with pytest.raises(ClientError):
+        retry_policy.call(func, 'poll_for_decision_task')
+    assert func.call_count == 1
+
+
+def test_gives_up_before_deadline(retry_policy, sleep):
+    func = mock.Mock(side_effect=client_error('ThrottlingException'))
+
+    with pytest.raises(ClientError):
+        retry_policy.call(func, 'respond_activity_task_completed', deadline=1002.0)
+
+    assert func.call_count == 1
+    assert not sleep.called
+    assert retry_policy.stats.get('respond_activity_task_completed', 'deadline_exceeded') == 1
+
+
+def test_stats_total():
+    stats = RetryStats()
+    stats.increment('a', 'retries')
+    stats.increment('b', 'retries', 2)
+    stats.increment('b', 'calls')
+
+    assert stats.total('retries') == 3
+    assert stats.snapshot() == {('a', 'retries'): 1, ('b', 'retries'): 2, ('b', 'calls'): 1}
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import datetime
+import pickle
+
+import pytest
+
+from py_swf._encoding import utc
+from py_swf.clients.activity_task import ActivityTask
+from py_swf.clients.decision import DecisionTask
+from py_swf.clients.decision import nametuplefy
+from py_swf.deadline import Deadline
+from py_swf.serialization import dumps_task
+from py_swf.serialization import loads_task
+
+
+def raw_events(count=50):
+    return [
+        {
+            'eventId': event_id,
+            'eventType': 'ActivityTaskScheduled',
+            'eventTimestamp': datetime.datetime(2016, 5, 26, 12, 0, event_id % 60, tzinfo=utc),
+            'activityTaskScheduledEventAttributes': {
+                'activityId': 'activity-{0}'.format(event_id),
+                'activityType': {'name': 'activity', 'version': '1.0'},
+                'input': '{"été": 1}',
+                'taskList': {'name': 'task_list'},
+                'decisionTaskCompletedEventId': event_id - 1,
+            },
+        }
+        for event_id in range(count, 0, -1)
+    ]
+
+
+def decision_task(events):
+    task = DecisionTask(events, 'task_token', 'workflow_id', 'run_id', {'name': 'workflow', 'version': '1.0'})
+    task.deadline = Deadline(10.0, started=1000.0)
+    return task
+
+
+@pytest.mark.parametrize('convert', [lambda events: events, nametuplefy])
+def test_decision_task(convert):
+    task = decision_task(convert(raw_events()))
+
+    loaded = loads_task(dumps_task(task))
+
+    assert loaded == task
+    assert type(loaded.events[0]) is type(task.events[0])
+    assert (loaded.deadline.timeout, loaded.deadline.started) == (10.0, 1000.0)
+
+
+def test_activity_task():
+    task = ActivityTask('activity_id', 'activity', '1.0', 'input', 'task_token', 'workflow_id', 'run_id')
+
+    loaded = loads_task(dumps_task(task))
+
+    assert loaded == task
+    assert isinstance(loaded, ActivityTask)
+    assert loaded.deadline is None
+
+
+def test_smaller_than_pickle():
+    task = decision_task(nametuplefy(raw_events()))
+
+    assert len(dumps_task(task)) * 5 < len(pickle.dumps(task, pickle.HIGHEST_PROTOCOL))
+
+
+def test_pickle():
+    task = decision_task(nametuplefy(raw_events(2)))
+
+    unpickled = pickle.loads(pickle.dumps(task))
+
+    assert unpickled == task
+    assert unpickled.deadline.expires_at == 1010.0
+
+
+@pytest.mark.parametrize('data', [b'', b'X\x01', b'D\x02', b'D\x01not zlib'])
+def test_rejects_other_data(data):
+    with pytest.raises(ValueError):
+        loads_task(data)
+
+
+def test_rejects_corrupt_data():
+    data = dumps_task(decision_task(raw_events()))
+
+    with pytest.raises(ValueError):
+        loads_task(data[:-10])
+
+
+def test_reports_version_found():
+    with pytest.raises(ValueError) as excinfo:
+        loads_task(b'A\x07')
+    assert 'version 7' in str(excinfo.value)
+
+
+def test_rejects_other_objects():
+    with pytest.raises(TypeError):
+        dumps_task(('not', 'a', 'task'))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import mock
+import pytest
+
+from py_swf.clients.decision import build_activity_task
+from py_swf.clients.decision import build_start_timer
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.errors import NoTaskFound
+from py_swf.fake_swf import FakeSWFClient
+from py_swf.sharding import ROUND_ROBIN
+from py_swf.sharding import ShardedTaskList
+
+
+class TestShardedTaskList(object):
+
+    def test_shards(self):
+        assert ShardedTaskList('meow', 3).shards == ['meow-0', 'meow-1', 'meow-2']
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            ShardedTaskList('meow', 0)
+        with pytest.raises(ValueError):
+            ShardedTaskList('meow', 2, strategy='meow')
+
+    def test_hash_is_stable(self):
+        task_list = ShardedTaskList('meow', 8)
+
+        assert task_list.pick('workflow_id') == task_list.pick('workflow_id')
+        assert len(set(task_list.pick('workflow_{0}'.format(i)) for i in range(100))) == 8
+
+    def test_round_robin(self):
+        task_list = ShardedTaskList('meow', 3, strategy=ROUND_ROBIN)
+
+        assert [task_list.pick('workflow_id') for _ in range(4)] == ['meow-0', 'meow-1', 'meow-2', 'meow-0']
+
+    def test_polls_cover_shards_evenly(self):
+        task_list = ShardedTaskList('meow', 3)
+
+        assert [task_list.next_poll() for _ in range(6)] == ['meow-0', 'meow-1', 'meow-2'] * 2
+
+    def test_grow(self):
+        task_list = ShardedTaskList('meow', 2)
+
+        task_list.resize(3)
+
+        assert task_list.polled_shards == ['meow-0', 'meow-1', 'meow-2']
+
+    def test_shrink_drains_retired_shards(self):
+        task_list = ShardedTaskList('meow', 3, drain_empty_polls=2)
+
+        task_list.resize(1)
+        assert task_list.shards == ['meow-0']
+        assert task_list.polled_shards == ['meow-0', 'meow-1', 'meow-2']
+
+        task_list.report_poll('meow-1', False)
+        task_list.report_poll('meow-1', True)
+        task_list.report_poll('meow-1', False)
+        task_list.report_poll('meow-2', False)
+        task_list.report_poll('meow-2', False)
+        assert task_list.polled_shards == ['meow-0', 'meow-1']
+
+        task_list.report_poll('meow-1', False)
+        task_list.report_poll('meow-0', False)
+        assert task_list.polled_shards == ['meow-0']
+
+    def test_drain_seconds(self):
+        clock = mock.Mock(return_value=1000.0)
+        task_list = ShardedTaskList('meow', 2, drain_empty_polls=1, drain_seconds=60, clock=clock)
+
+        task_list.resize(1)
+        task_list.report_poll('meow-1', False)
+        assert task_list.polled_shards == ['meow-0', 'meow-1']
+        assert task_list.is_retired('meow-1')
+        assert not task_list.is_retired('meow-0')
+
+        clock.return_value = 1060.0
+        task_list.report_poll('meow-1', False)
+        assert task_list.polled_shards == ['meow-0']
+        assert not task_list.is_retired('meow-1')
+
+    def test_regrow_stops_draining(self):
+        task_list = ShardedTaskList('meow', 2, drain_empty_polls=1)
+
+        task_list.resize(1)
+        task_list.resize(2)
+        task_list.report_poll('meow-1', False)
+
+        assert task_list.polled_shards == ['meow-0', 'meow-1']
+
+
+def test_build_activity_task_picks_shard():
+    decision_config = mock.Mock(task_list=ShardedTaskList('meow', 4))
+
+    decision = build_activity_task('activity_id', 'activity', '1.0', 'input', decision_config, 1, 1, 1, 1)
+
+    expected = decision_config.task_list.pick('activity_id')
+    assert decision['scheduleActivityTaskDecisionAttributes']['taskList'] == {'name': expected}
+
+
+def test_workflows_spread_over_shards_are_all_decided():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    task_list = ShardedTaskList('task_list', 3)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', task_list, 60, 10), fake_swf)
+    decision_client = DecisionClient(DecisionConfig('domain', task_list, 5, 5, 5, 5), fake_swf)
+    for i in range(9):
+        workflow_client.start_workflow('input', 'workflow_{0}'.format(i), 'workflow', '1.0')
+
+    workflow_ids = set()
+    for _ in range(30):
+        try:
+            workflow_ids.add(decision_client.poll().workflow_id)
+        except NoTaskFound:
+            pass
+
+    assert workflow_ids == set('workflow_{0}'.format(i) for i in range(9))
+
+
+def test_workflows_move_off_retired_shards():
+    fake_swf = FakeSWFClient(poll_timeout=0.01)
+    task_list = ShardedTaskList('task_list', 2, drain_empty_polls=1)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', task_list, 60, 10), fake_swf)
+    decision_client = DecisionClient(DecisionConfig('domain', task_list, 5, 5, 5, 5), fake_swf)
+    workflow_ids = ['workflow_{0}'.format(i) for i in range(6)]
+    for workflow_id in workflow_ids:
+        workflow_client.start_workflow('input', workflow_id, 'workflow', '1.0')
+    assert set(task_list.pick(workflow_id) for workflow_id in workflow_ids) == set(task_list.shards)
+
+    task_list.resize(1)
+    # Every workflow waits on a timer, whose decision task is scheduled once the retired shard may have drained.
+    waiting = set()
+    while len(waiting) < len(workflow_ids):
+        try:
+            task = decision_client.poll()
+        except NoTaskFound:
+            continue
+        decision_client.finish_decision(task.task_token, [build_start_timer('timer', 1)])
+        waiting.add(task.workflow_id)
+    while task_list.polled_shards != ['task_list-0']:
+        with pytest.raises(NoTaskFound):
+            decision_client.poll()
+
+    closed = set()
+    for _ in range(300):
+        try:
+            task = decision_client.poll()
+        except NoTaskFound:
+            continue
+        decision_client.finish_workflow(task.task_token, 'done')
+        closed.add(task.workflow_id)
+        if closed == waiting:
+            break
+
+    assert closed == waiting
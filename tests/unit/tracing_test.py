@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import json
+
+import pytest
+
+from py_swf.clients.activity_task import ActivityTaskClient
+from py_swf.clients.decision import DecisionClient
+from py_swf.clients.workflow import WorkflowClient
+from py_swf.config_definitions import ActivityTaskConfig
+from py_swf.config_definitions import DecisionConfig
+from py_swf.config_definitions import WorkflowClientConfig
+from py_swf.decider import Decider
+from py_swf.fake_swf import FakeSWFClient
+from py_swf.tracing import extract
+from py_swf.tracing import extract_from_events
+from py_swf.tracing import InMemoryExporter
+from py_swf.tracing import inject
+from py_swf.tracing import JsonLinesExporter
+from py_swf.tracing import MAX_PAYLOAD_LENGTH
+from py_swf.tracing import task_span
+from py_swf.tracing import TraceContext
+from py_swf.tracing import Tracer
+
+
+@pytest.fixture
+def context():
+    return TraceContext(trace_id='4bf92f3577b34da6a3ce929d0e0e4736', span_id='00f067aa0ba902b7')
+
+
+@pytest.fixture
+def exporter():
+    return InMemoryExporter()
+
+
+@pytest.fixture
+def tracer(exporter):
+    return Tracer(exporter)
+
+
+def test_inject_and_extract(context):
+    payload = inject('{"cat": "meow"}', context)
+
+    assert payload == 'traceparent:00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01\n{"cat": "meow"}'
+    assert extract(payload) == (context, '{"cat": "meow"}')
+
+
+@pytest.mark.parametrize('payload', [None, '', 'meow', 'traceparent:garbage\nmeow'])
+def test_extract_without_header(payload):
+    assert extract(payload) == (None, payload)
+
+
+def test_inject_none(context):
+    assert inject(None, context) is None
+    assert inject('meow', None) == 'meow'
+
+
+def test_inject_keeps_payload_within_limit(context):
+    payload = 'm' * (MAX_PAYLOAD_LENGTH - 10)
+
+    assert inject(payload, context) == payload
+    assert extract(inject('m' * 10, context)) == (context, 'm' * 10)
+
+
+def test_clients_without_tracer_strip_headers(tracer):
+    boto_client = FakeSWFClient(poll_timeout=0)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), boto_client, tracer=tracer)
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), boto_client)
+    activity_task_client = ActivityTaskClient(ActivityTaskConfig('domain', 'task_list'), boto_client)
+    traced_decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), boto_client, tracer=tracer)
+
+    workflow_client.start_workflow('workflow_input', 'workflow_id', 'workflow', '1.0')
+    decision_task = decision_client.poll()
+    assert decision_task.events[-1].workflowExecutionStartedEventAttributes.input == 'workflow_input'
+    events, _ = decision_client.get_execution_history_page('workflow_id', decision_task.workflow_run_id)
+    assert events[-1].workflowExecutionStartedEventAttributes.input == 'workflow_input'
+    tracer.track(decision_task.task_token, tracer.start_span('decide').context)
+    traced_decision_client.finish_decision_with_activity(decision_task.task_token, 'activity_id', 'activity', '1.0', 'input')
+
+    assert activity_task_client.poll().input == 'input'
+
+
+def test_extract_from_events_does_not_modify_events(context):
+    other_context = TraceContext(trace_id='a' * 32, span_id='b' * 16)
+    events = [
+        {'eventId': 3, 'activityTaskCompletedEventAttributes': {'result': inject('result', context)}},
+        {'eventId': 2, 'activityTaskStartedEventAttributes': {'identity': 'worker'}},
+        {'eventId': 1, 'workflowExecutionStartedEventAttributes': {'input': inject('input', other_context)}},
+    ]
+
+    found, stripped = extract_from_events(events)
+
+    assert found == context
+    assert stripped[0]['activityTaskCompletedEventAttributes']['result'] == 'result'
+    assert stripped[1] is events[1]
+    assert stripped[2]['workflowExecutionStartedEventAttributes']['input'] == 'input'
+    assert events[0]['activityTaskCompletedEventAttributes']['result'] != 'result'
+
+
+class TestTracer:
+
+    def test_spans(self, tracer, exporter):
+        with tracer.span('outer', attributes=dict(cat='meow')) as outer:
+            with tracer.span('inner', parent=outer.context) as inner:
+                pass
+
+        assert exporter.spans == [inner, outer]
+        assert inner.context.trace_id == outer.context.trace_id
+        assert inner.parent_span_id == outer.context.span_id
+        assert outer.parent_span_id is None
+        assert outer.attributes == dict(cat='meow')
+        assert len(outer.context.trace_id) == 32
+        assert len(outer.context.span_id) == 16
+        assert outer.duration >= 0
+
+    def test_span_records_errors(self, tracer, exporter):
+        with pytest.raises(ValueError):
+            with tracer.span('broken'):
+                raise ValueError('meow')
+
+        assert exporter.spans[0].attributes['error'] == 'ValueError: meow'
+
+    def test_finish_twice(self, tracer, exporter):
+        span = tracer.start_span('span')
+        span.finish()
+        span.finish()
+
+        assert len(exporter.spans) == 1
+
+    def test_tracked_tasks_are_bounded(self, exporter, context):
+        tracer = Tracer(exporter, max_tracked_tasks=2)
+        for task_token in ('a', 'b', 'c'):
+            tracer.track(task_token, context)
+
+        assert tracer.context_for('a') is None
+        assert tracer.untrack('c') == context
+        assert tracer.context_for('c') is None
+
+
+def test_json_lines_exporter(tmpdir, tracer):
+    path = tmpdir.join('spans.json').strpath
+    tracer.exporter = JsonLinesExporter(path)
+    with tracer.span('span', attributes=dict(cat='meow')) as span:
+        pass
+    tracer.exporter.close()
+
+    exported = json.loads(open(path).read())
+    assert exported['name'] == 'span'
+    assert exported['span_id'] == span.context.span_id
+    assert exported['attributes'] == dict(cat='meow')
+
+
+def test_trace_follows_workflow(tracer, exporter):
+    boto_client = FakeSWFClient(poll_timeout=0)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), boto_client, tracer=tracer)
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), boto_client, tracer=tracer)
+    activity_task_client = ActivityTaskClient(ActivityTaskConfig('domain', 'task_list'), boto_client, tracer=tracer)
+
+    workflow_client.start_workflow('workflow_input', 'workflow_id', 'workflow', '1.0')
+
+    decision_task = decision_client.poll()
+    assert decision_task.events[-1].workflowExecutionStartedEventAttributes.input == 'workflow_input'
+    with tracer.span('decide', parent=tracer.context_for(decision_task.task_token)):
+        pass
+    decision_client.finish_decision_with_activity(decision_task.task_token, 'activity_id', 'activity', '1.0', 'input')
+
+    activity_task = activity_task_client.poll()
+    assert activity_task.input == 'input'
+    activity_task_client.finish(activity_task.task_token, 'result')
+
+    decision_task = decision_client.poll()
+    assert decision_task.events[2].activityTaskCompletedEventAttributes.result == 'result'
+    decision_client.finish_workflow(decision_task.task_token, 'done')
+
+    assert [span.name for span in exporter.spans] == [
+        'start_workflow_execution',
+        'poll_for_decision_task',
+        'decide',
+        'respond_decision_task_completed',
+        'poll_for_activity_task',
+        'respond_activity_task_completed',
+        'poll_for_decision_task',
+        'respond_decision_task_completed',
+    ]
+    assert len(set(span.context.trace_id for span in exporter.spans)) == 1
+    parents = [span.parent_span_id for span in exporter.spans]
+    span_ids = [span.context.span_id for span in exporter.spans]
+    # Each span is the child of the one before it, except that the response to a decision task is a sibling of
+    # the handler's span: both are children of the poll that received the task.
+    assert parents == [None, span_ids[0], span_ids[1], span_ids[1], span_ids[3], span_ids[4], span_ids[5], span_ids[6]]
+
+
+def test_task_span_without_tracer():
+    with task_span(None, 'decide', 'task_token') as span:
+        assert span is None
+
+
+@pytest.mark.parametrize('fails', [False, True])
+def test_decider_traces_handlers(tracer, exporter, fails):
+    boto_client = FakeSWFClient(poll_timeout=0)
+    workflow_client = WorkflowClient(WorkflowClientConfig('domain', 'task_list', 60, 10), boto_client)
+    decision_client = DecisionClient(DecisionConfig('domain', 'task_list', 5, 5, 5, 5), boto_client, tracer=tracer)
+    workflow_client.start_workflow('input', 'workflow_id', 'workflow', '1.0')
+
+    def handler(task):
+        if fails:
+            raise ValueError('meow')
+        return []
+
+    decider = Decider(decision_client)
+    decider.register('workflow', '1.0', handler)
+    decider.decide(decision_client.poll())
+
+    poll, decide = exporter.spans[:2]
+    assert [poll.name, decide.name] == ['poll_for_decision_task', 'decide']
+    assert decide.parent_span_id == poll.context.span_id
+    assert decide.context.trace_id == poll.context.trace_id
+    assert decide.attributes['workflow_id'] == 'workflow_id'
+    assert decide.attributes['workflow_type'] == 'workflow:1.0'
+    assert ('error' in decide.attributes) == fails